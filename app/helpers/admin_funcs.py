@@ -1,8 +1,11 @@
 from fastapi.responses import RedirectResponse, FileResponse
 from starlette.responses import StreamingResponse
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
-from app.models import Researchers, Publications, Journals
+from app.models import Researchers, Publications, Journals, ProfileFingerprint, OpenAlexLookup
+from app.scrapers.helpers.journal_matching import carry_over_match_cache
+from app.helpers.stats_funcs import refresh_stats
 from pathlib import Path
 
 import pandas as pd
@@ -123,35 +126,76 @@ def download_clarivate_template():
 def download_UWA_staff_field_template():
     return FileResponse("app/files/upload_templates/UWA_staff_field_template.csv", media_type="text/csv", filename="UWA_staff_field_template.csv")
 
-def replace_ABDC_rankings(file_path="app/files/uploads_current/ABDC_upload.csv"):
+# ABDC list column -> Journals column
+ABDC_COLUMNS = {
+    "Journal Title": "name",
+    "rating": "abdc_rank",
+    "Publisher": "publisher",
+    "ISSN": "ISSN",
+    "ISSN Online": "eISSN",
+    "FoR": "FoR",
+    "Year Inception": "year_of_inception",
+}
+ABDC_INTEGER_COLUMNS = ["FoR", "year_of_inception"]
+
+def read_ABDC_rankings(file_path):
+    """The ABDC list as Journals rows ({column: value}, None where a cell is empty)."""
     df = pd.read_csv(file_path)
     # Strip whitespace from column names and values
     df.columns = [col.strip() for col in df.columns]
+    journals = df[list(ABDC_COLUMNS)].rename(columns=ABDC_COLUMNS)
+    for column in ABDC_INTEGER_COLUMNS:
+        # Empty cells make pandas read whole-number columns as floats
+        if pd.api.types.is_numeric_dtype(journals[column]):
+            journals[column] = journals[column].astype("Int64")
+    journals = journals.astype(object).where(journals.notna(), None)
+    return journals.to_dict("records")
+
+def remap_publication_journals(session, old_journals, new_journals):
+    """
+    Points publications linked to an old journal row at the new row with the same name, or at none if the
+    new list doesn't have it. old_journals/new_journals: (id, name) pairs. Returns how many changed. Caller commits.
+    """
+    old_names = {journal_id: name for journal_id, name in old_journals}
+    new_ids = {}
+    for journal_id, name in new_journals:
+        new_ids.setdefault(name, journal_id)
+    changes = []
+    for pub_id, journal_id in session.query(Publications.id, Publications.journal_id).filter(Publications.journal_id.isnot(None)):
+        new_id = new_ids.get(old_names.get(journal_id))
+        if new_id != journal_id:
+            changes.append({"id": pub_id, "journal_id": new_id})
+    session.bulk_update_mappings(Publications, changes)
+    return len(changes)
+
+def replace_ABDC_rankings(file_path="app/files/uploads_current/ABDC_upload.csv"):
+    """
+    Replaces the Journals table with the ABDC list in file_path. The old rows are deleted and the new ones
+    inserted with one executemany in the same transaction, so the site keeps serving the old list until
+    the new one is committed, and a failed upload leaves it as it was.
+    """
+    rows = read_ABDC_rankings(file_path)
 
     session = SessionLocal()
     try:
-        # Remove all existing data from Journals table
+        old_journals = session.query(Journals.id, Journals.name).all()
         session.query(Journals).delete()
+        session.execute(insert(Journals), rows)
+        new_journals = session.query(Journals.id, Journals.name).all()
+        # SQLite reuses the deleted ids, so publications are pointed at their journal's new row by name
+        remapped = remap_publication_journals(session, old_journals, new_journals)
+        # Keep cached journal matches that the new list can't change
+        carry_over_match_cache(session, old_journals, new_journals)
+        refresh_stats(session)
         session.commit()
-        # Add new data
-        for _, row in df.iterrows():
-            journal = Journals(
-                name=row['Journal Title'],
-                abdc_rank=row['rating'],
-                publisher=row['Publisher'],
-                ISSN=row['ISSN'],
-                eISSN=row['ISSN Online'],
-                FoR=row['FoR'],
-                year_of_inception=row['Year Inception']
-            )
-            session.add(journal)
-        session.commit()
+        print(f"Replaced the ABDC list with {len(rows)} journals ({remapped} publications relinked)")
     finally:
         session.close()
 
 def import_clarivate(jif_csv_path):
     session = SessionLocal()
     try:
+        changed_journals = set()
         with open(jif_csv_path, newline='', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
@@ -179,9 +223,19 @@ def import_clarivate(jif_csv_path):
 
                 journal = session.query(Journals).filter_by(ISSN=issn).first()
                 if journal:
+                    if (journal.JIF, journal.JIF_5_year, journal.citation_percentage) != (jif, jif_5, citation_pct):
+                        changed_journals.add(journal.id)
                     journal.JIF = jif
                     journal.JIF_5_year = jif_5
                     journal.citation_percentage = citation_pct
+        # Only researchers publishing in a journal whose metrics changed need their stats recomputed
+        dirty = set()
+        changed_journals = list(changed_journals)
+        for start in range(0, len(changed_journals), 500):
+            dirty.update(r_id for (r_id,) in session.query(Publications.researcher_id).filter(
+                Publications.journal_id.in_(changed_journals[start:start + 500])
+            ).distinct())
+        refresh_stats(session, dirty)
         session.commit()
     finally:
         session.close()
@@ -193,10 +247,14 @@ def update_UWA_staff_fields(file_path="app/files/uploads_current/UWA_staff_field
 
     session = SessionLocal()
     try:
+        dirty = set()
         for _, row in df.iterrows():
             researcher = session.query(Researchers).filter_by(name=row['Name']).first()
             if researcher:
+                if researcher.field != row['Field']:
+                    dirty.add(researcher.id)
                 researcher.field = row['Field']
+        refresh_stats(session, dirty)
         session.commit()
     finally:
         session.close()
@@ -248,9 +306,11 @@ def reupload_master_spreadsheet(file_path="app/files/uploads_current/master_spre
     session = SessionLocal()
     try:
         # Remove all existing data
+        session.query(OpenAlexLookup).delete()
         session.query(Publications).delete()
         session.query(Researchers).delete()
         session.query(Journals).delete()
+        session.query(ProfileFingerprint).delete()  # they describe the publications being replaced
         session.commit()
 
         # Insert Journals
@@ -310,6 +370,7 @@ def reupload_master_spreadsheet(file_path="app/files/uploads_current/master_spre
                 journal_id=int(row['journal_id']) if row['journal_id'] else None
             )
             session.add(pub)
+        refresh_stats(session)
         session.commit()
     finally:
         session.close()
@@ -0,0 +1,88 @@
+import datetime
+import os
+import threading
+from app.database import SessionLocal
+from app.models import DataVersion
+
+# Per-process caches of data loaded from the database, keyed by the shared Data_Version counter.
+# Every uvicorn worker keeps its own copy, but since every change bumps the counter in the database,
+# all workers notice an upload on their next request and each reloads at most once per version.
+_CACHE = {}  # name -> (version, value)
+_LOCKS = {}
+_LOCKS_GUARD = threading.Lock()
+_METRICS = {}  # name -> {"hits": int, "misses": int}
+
+
+def utcnow():
+    """Naive UTC, the way every timestamp column is stored."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def get_data_version(db):
+    """Returns (version, updated_at) of the ranking data; (0, None) before anything has been written."""
+    row = db.query(DataVersion.version, DataVersion.updated_at).filter(DataVersion.id == 1).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def current_data_version():
+    """get_data_version with its own short-lived session, for request handlers."""
+    db = SessionLocal()
+    try:
+        return get_data_version(db)
+    finally:
+        db.close()
+
+
+def bump_data_version(db):
+    """Marks the ranking data as changed. Runs inside the caller's transaction, so it commits with the change."""
+    updated = db.query(DataVersion).filter(DataVersion.id == 1).update(
+        {DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: utcnow()},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(DataVersion(id=1, version=1, updated_at=utcnow()))
+
+
+def _lock_for(name):
+    with _LOCKS_GUARD:
+        return _LOCKS.setdefault(name, threading.Lock())
+
+
+def get_cached(name, loader):
+    """
+    Returns loader(db) for the current data version, reusing this process's copy while the version is unchanged.
+    Concurrent requests that miss on the same version wait for one load instead of each running the loader.
+    """
+    metrics = _METRICS.setdefault(name, {"hits": 0, "misses": 0})
+    db = SessionLocal()
+    try:
+        version, _ = get_data_version(db)
+        entry = _CACHE.get(name)
+        if entry is not None and entry[0] == version:
+            metrics["hits"] += 1
+            return entry[1]
+        with _lock_for(name):
+            entry = _CACHE.get(name)
+            if entry is not None and entry[0] == version:
+                metrics["hits"] += 1
+                return entry[1]
+            metrics["misses"] += 1
+            value = loader(db)
+            _CACHE[name] = (version, value)
+            return value
+    finally:
+        db.close()
+
+
+def cache_metrics():
+    """Hit/miss counts and cached versions for this worker process."""
+    version, updated_at = current_data_version()
+    return {
+        "pid": os.getpid(),
+        "data_version": version,
+        "data_updated_at": updated_at.isoformat() + "Z" if updated_at else None,
+        "caches": {
+            name: {**counts, "cached_version": _CACHE[name][0] if name in _CACHE else None}
+            for name, counts in _METRICS.items()
+        },
+    }
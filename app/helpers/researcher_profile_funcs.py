@@ -9,7 +9,7 @@ def get_researcher_profile(researcher_id):
             db.query(Researchers).filter(Researchers.id == researcher_id).first()
         )
         if not researcher:
-            return HTMLResponse(content="Researcher not found", status_code=404)
+            return None, []
 
         publications = (
             db.query(Publications, Journals)
@@ -41,3 +41,10 @@ def get_researcher_profile(researcher_id):
         return researcher_data, pub_list
     finally:
         db.close()
+
+def researcher_exists(researcher_id):
+    db = SessionLocal()
+    try:
+        return db.query(Researchers.id).filter(Researchers.id == researcher_id).first() is not None
+    finally:
+        db.close()
@@ -1,108 +1,127 @@
 from fastapi import Request
-from app.database import SessionLocal
-from app.models import Researchers, Publications, Journals
-import math
-
-def filter_researchers(request, researcher_list):
-    field = request.query_params.get("field", "")
-    level = request.query_params.get("level", "")
-    university = request.query_params.get("university", "")
-    name = request.query_params.get("name", "").strip().lower()
-    filtered = researcher_list
-    if university:
-        filtered = [r for r in filtered if (r["university"] or "").lower() == university.lower()]
-    if field:
-        filtered = [r for r in filtered if (r["field"] or "").lower() == field.lower()]
-    if level:
-        filtered = [r for r in filtered if (r["level"] or "").upper() == level.upper()]
-    if name:
-        filtered = [r for r in filtered if name in (r["name"] or "").lower()]
-    return filtered
-
-def get_researcher_data(request: Request, RESEARCHER_STATS_CACHE):
-    sort_by = request.query_params.get("sort_by", "total_articles")
-
-    if RESEARCHER_STATS_CACHE is None:
-        db = SessionLocal()
+from urllib.parse import urlencode
+from app.helpers.stats_funcs import load_researcher_stats, competition_rank
+from app.helpers.cache_funcs import get_cached
+
+# sort_by query param -> (stat key, label shown in the table header)
+SORT_KEYS = {
+    "total_articles": ("total_articles", "Total Articles"),
+    "abdc_a_star_a": ("abdc_a_star_a", "A*/A Journals"),
+    "avg_jif": ("avg_jif", "Avg. JIF"),
+    "avg_jif_5": ("avg_jif5", "Avg. 5-Year JIF"),
+    "avg_citation": ("avg_citation", "Avg. Citation %"),
+}
+DEFAULT_SORT = "total_articles"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+RANKED_MEMO_SIZE = 256  # filter/sort combinations remembered per data version
+
+
+def build_researcher_index(db):
+    """
+    Loads the researcher stats once per data version and precomputes what every request needs:
+    lookup sets for the university/field/level filters and the ranking order for each sort key.
+    """
+    rows = load_researcher_stats(db)
+    index = {
+        "rows": rows,
+        "names": [(r["name"] or "").lower() for r in rows],
+        "by_university": {},
+        "by_field": {},
+        "by_level": {},
+        "order": {},
+        "ranked": {},  # memo of (sort_by, filters) -> [(rank, row position)]
+    }
+    for pos, r in enumerate(rows):
+        index["by_university"].setdefault((r["university"] or "").lower(), set()).add(pos)
+        index["by_field"].setdefault((r["field"] or "").lower(), set()).add(pos)
+        index["by_level"].setdefault((r["level"] or "").upper(), set()).add(pos)
+    for sort_by, (key, _) in SORT_KEYS.items():
+        # Stable sort, so ties keep Researchers.id order
+        index["order"][sort_by] = sorted(range(len(rows)), key=lambda pos: rows[pos][key] or 0, reverse=True)
+    return index
+
+
+def get_filters(request):
+    return {
+        "university": request.query_params.get("university", "").lower(),
+        "field": request.query_params.get("field", "").lower(),
+        "level": request.query_params.get("level", "").upper(),
+        "name": request.query_params.get("name", "").strip().lower(),
+    }
+
+
+def rank_researchers(index, sort_by, filters):
+    """Returns [(rank, row position)] for the filtered researchers, ranked within the filtered set."""
+    memo_key = (sort_by, filters["university"], filters["field"], filters["level"], filters["name"])
+    ranked = index["ranked"].get(memo_key)
+    if ranked is not None:
+        return ranked
+
+    candidates = None
+    for value, lookup in (
+        (filters["university"], index["by_university"]),
+        (filters["field"], index["by_field"]),
+        (filters["level"], index["by_level"]),
+    ):
+        if value:
+            matches = lookup.get(value, set())
+            candidates = matches if candidates is None else candidates & matches
+    order = index["order"][sort_by]
+    if candidates is not None:
+        order = [pos for pos in order if pos in candidates]
+    if filters["name"]:
+        order = [pos for pos in order if filters["name"] in index["names"][pos]]
+
+    key = SORT_KEYS[sort_by][0]
+    ranked = competition_rank(order, value_fn=lambda pos: index["rows"][pos][key])
+    if len(index["ranked"]) >= RANKED_MEMO_SIZE:
+        index["ranked"].clear()
+    index["ranked"][memo_key] = ranked
+    return ranked
+
+
+def get_page_params(request):
+    """Parses page/page_size; page_size=all returns every row on one page."""
+    page_size = request.query_params.get("page_size", str(DEFAULT_PAGE_SIZE))
+    if page_size != "all":
         try:
-            researchers = db.query(Researchers).all()
-            publications = db.query(Publications).all()
-            journals = {j.id: j for j in db.query(Journals).all()}
-            pubs_by_researcher = {}
-            for pub in publications:
-                pubs_by_researcher.setdefault(pub.researcher_id, []).append(pub)
-            researcher_list = []
-            for r in researchers:
-                pubs = pubs_by_researcher.get(r.id, [])
-                total_articles = len(pubs)
-                abdc_a_star_a = 0
-                jif_list = []
-                jif5_list = []
-                citation_list = []
-                for pub in pubs:
-                    journal = journals.get(pub.journal_id)
-                    if journal:
-                        if journal.abdc_rank in ["A*", "A"]:
-                            abdc_a_star_a += 1
-                        if journal.JIF is not None:
-                            jif_list.append(journal.JIF)
-                        if journal.JIF_5_year is not None:
-                            jif5_list.append(journal.JIF_5_year)
-                        if journal.citation_percentage is not None:
-                            citation_list.append(journal.citation_percentage)
-                avg_jif = round(sum(jif_list)/len(jif_list), 2) if jif_list else 0
-                avg_jif5 = round(sum(jif5_list)/len(jif5_list), 2) if jif5_list else 0
-                avg_citation = round(sum(citation_list)/len(citation_list), 2) if citation_list else 0
-                researcher_list.append({
-                    "id": str(r.id),
-                    "name": r.name,
-                    "field": r.field,
-                    "level": r.level,
-                    "university": r.university,
-                    "total_articles": total_articles,
-                    "abdc_a_star_a": abdc_a_star_a,
-                    "avg_jif": avg_jif,
-                    "avg_jif5": avg_jif5,
-                    "avg_citation": avg_citation,
-                })
-            RESEARCHER_STATS_CACHE = researcher_list
-        finally:
-            db.close()
-    else:
-        researcher_list = RESEARCHER_STATS_CACHE
-
-    researcher_list = filter_researchers(request, researcher_list)
-
-    # Add variable_value and variable_label for the selected stat
-    if sort_by == "total_articles":
-        variable_label = "Total Articles"
-        for r in researcher_list:
-            r["variable_value"] = r["total_articles"]
-        researcher_list.sort(key=lambda x: x["total_articles"], reverse=True)
-    elif sort_by == "abdc_a_star_a":
-        variable_label = "A*/A Journals"
-        for r in researcher_list:
-            r["variable_value"] = r["abdc_a_star_a"]
-        researcher_list.sort(key=lambda x: x["abdc_a_star_a"], reverse=True)
-    elif sort_by == "avg_jif":
-        variable_label = "Avg. JIF"
-        for r in researcher_list:
-            r["variable_value"] = r["avg_jif"]
-        researcher_list.sort(key=lambda x: x["avg_jif"], reverse=True)
-    elif sort_by == "avg_jif_5":
-        variable_label = "Avg. 5-Year JIF"
-        for r in researcher_list:
-            r["variable_value"] = r["avg_jif5"]
-        researcher_list.sort(key=lambda x: x["avg_jif5"], reverse=True)
-    elif sort_by == "avg_citation":
-        variable_label = "Avg. Citation %"
-        for r in researcher_list:
-            r["variable_value"] = r["avg_citation"]
-        researcher_list.sort(key=lambda x: x["avg_citation"], reverse=True)
-    else:
-        variable_label = "Total Articles"
-        for r in researcher_list:
-            r["variable_value"] = r["total_articles"]
-        researcher_list.sort(key=lambda x: x["total_articles"], reverse=True)
-
-    return researcher_list, variable_label, RESEARCHER_STATS_CACHE
\ No newline at end of file
+            page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = DEFAULT_PAGE_SIZE
+    try:
+        page = max(int(request.query_params.get("page", "1")), 1)
+    except ValueError:
+        page = 1
+    return page, page_size
+
+
+def get_researcher_data(request: Request):
+    sort_by = request.query_params.get("sort_by", DEFAULT_SORT)
+    if sort_by not in SORT_KEYS:
+        sort_by = DEFAULT_SORT
+    key, variable_label = SORT_KEYS[sort_by]
+
+    index = get_cached("researcher_index", build_researcher_index)
+    ranked = rank_researchers(index, sort_by, get_filters(request))
+
+    page, page_size = get_page_params(request)
+    total = len(ranked)
+    per_page = total if page_size == "all" else page_size
+    total_pages = max((total + per_page - 1) // per_page, 1) if per_page else 1
+    page = min(page, total_pages)
+    start = (page - 1) * per_page
+    researcher_list = [
+        {**index["rows"][pos], "variable_value": index["rows"][pos][key], "rank": rank}
+        for rank, pos in ranked[start:start + per_page]
+    ]
+
+    pagination = {
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "total_pages": total_pages,
+        # Current query string without page, for building the page links
+        "query": urlencode([(k, v) for k, v in request.query_params.multi_items() if k != "page"]),
+    }
+    return researcher_list, variable_label, pagination
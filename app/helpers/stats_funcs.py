@@ -0,0 +1,225 @@
+from sqlalchemy import func, case
+from app.models import Researchers, Publications, Journals, ResearcherStats, UniversityStats
+from app.helpers.cache_funcs import bump_data_version
+
+RESEARCHER_STATS_COLUMNS = (
+    "researcher_id", "name", "field", "level", "university",
+    "total_articles", "abdc_a_star_a", "avg_jif", "avg_jif5", "avg_citation",
+)
+UNIVERSITY_STATS_COLUMNS = (
+    "name", "position", "num_researchers", "accounting_count", "finance_count", "total_articles",
+    "accounting_articles", "finance_articles", "abdc_a_star_a", "avg_jif", "avg_jif5",
+)
+DIRTY_CHUNK_SIZE = 500
+
+
+def _averages(rows, width):
+    """
+    {key: [average of each value column, rounded to 2 places]} from (key, value, ...) rows in publication order.
+    Summed in Python in that order, as the ranking pages always did, so every refresh gives the same values
+    (SQLite's avg() sums in the query plan's order, which can round a half-cent value the other way).
+    """
+    totals = {}
+    for key, *values in rows:
+        sums = totals.setdefault(key, [[0, 0] for _ in range(width)])
+        for total, value in zip(sums, values):
+            if value is not None:
+                total[0] += value
+                total[1] += 1
+    return {key: [round(s / n, 2) if n else 0 for s, n in sums] for key, sums in totals.items()}
+
+
+def researcher_stats(db, researcher_ids=None):
+    """
+    Per-researcher ranking stats computed with one grouped query over Publications ⋈ Journals.
+    researcher_ids limits the query to those researchers (default: everyone).
+    Returns plain tuples, in Researchers.id order:
+    (id, name, field, level, university, total_articles, abdc_a_star_a, avg_jif, avg_jif5, avg_citation)
+    """
+    query = (
+        db.query(
+            Researchers.id,
+            Researchers.name,
+            Researchers.field,
+            Researchers.level,
+            Researchers.university,
+            func.count(Publications.id),
+            func.coalesce(func.sum(case((Journals.abdc_rank.in_(["A*", "A"]), 1), else_=0)), 0),
+        )
+        .select_from(Researchers)
+        .outerjoin(Publications, Publications.researcher_id == Researchers.id)
+        .outerjoin(Journals, Publications.journal_id == Journals.id)
+    )
+    values = (
+        db.query(Publications.researcher_id, Journals.JIF, Journals.JIF_5_year, Journals.citation_percentage)
+        .join(Journals, Publications.journal_id == Journals.id)
+    )
+    if researcher_ids is not None:
+        query = query.filter(Researchers.id.in_(researcher_ids))
+        values = values.filter(Publications.researcher_id.in_(researcher_ids))
+    rows = query.group_by(Researchers.id).order_by(Researchers.id)
+    averages = _averages(values.order_by(Publications.id), 3)
+    return [
+        (r_id, name, field, level, university, total, a_star_a, *averages.get(r_id, (0, 0, 0)))
+        for r_id, name, field, level, university, total, a_star_a in rows
+    ]
+
+
+def university_stats(db, universities=None):
+    """
+    Per-university ranking stats, including the Accounting/Finance splits, computed in the same
+    grouped query over Researchers ⋈ Publications ⋈ Journals.
+    universities limits the query to those universities (default: all of them).
+    Returns plain tuples, in order of each university's first researcher, whose id is the position:
+    (name, position, num_researchers, accounting_count, finance_count, total_articles, accounting_articles,
+     finance_articles, abdc_a_star_a, avg_jif, avg_jif5)
+    """
+    university = func.coalesce(Researchers.university, "Unknown")
+    is_accounting = Researchers.field == "Accounting"
+    is_finance = Researchers.field == "Finance"
+    has_publication = Publications.id.isnot(None)
+    query = (
+        db.query(
+            university,
+            func.min(Researchers.id),
+            func.count(func.distinct(Researchers.id)),
+            func.count(func.distinct(case((is_accounting, Researchers.id)))),
+            func.count(func.distinct(case((is_finance, Researchers.id)))),
+            func.count(Publications.id),
+            func.coalesce(func.sum(case((is_accounting & has_publication, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((is_finance & has_publication, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Journals.abdc_rank.in_(["A*", "A"]), 1), else_=0)), 0),
+        )
+        .select_from(Researchers)
+        .outerjoin(Publications, Publications.researcher_id == Researchers.id)
+        .outerjoin(Journals, Publications.journal_id == Journals.id)
+    )
+    values = (
+        db.query(university, Journals.JIF, Journals.JIF_5_year)
+        .select_from(Publications)
+        .join(Researchers, Publications.researcher_id == Researchers.id)
+        .join(Journals, Publications.journal_id == Journals.id)
+    )
+    if universities is not None:
+        query = query.filter(university.in_(universities))
+        values = values.filter(university.in_(universities))
+    rows = query.group_by(university).order_by(func.min(Researchers.id))
+    averages = _averages(values.order_by(Publications.id), 2)
+    return [
+        (name, position, num_researchers, accounting_count, finance_count, total_articles, accounting_articles,
+         finance_articles, a_star_a, *averages.get(name, (0, 0)))
+        for (name, position, num_researchers, accounting_count, finance_count, total_articles, accounting_articles,
+             finance_articles, a_star_a) in rows
+    ]
+
+
+def competition_rank(sorted_rows, value_fn):
+    out = []
+    prev = object()
+    rank = 0
+    for i, row in enumerate(sorted_rows, start=1):
+        val = value_fn(row) or 0
+        if val != prev:
+            rank = i
+            prev = val
+        out.append((rank, row))
+    return out
+
+
+# ------------------------
+# Materialized stats tables
+# ------------------------
+def _university_row(row):
+    stats = dict(zip(UNIVERSITY_STATS_COLUMNS, row))
+    stats["avg_articles_overall"] = round(stats["total_articles"]/stats["num_researchers"], 2) if stats["num_researchers"] else 0
+    stats["avg_articles_accounting"] = round(stats["accounting_articles"]/stats["accounting_count"], 2) if stats["accounting_count"] else 0
+    stats["avg_articles_finance"] = round(stats["finance_articles"]/stats["finance_count"], 2) if stats["finance_count"] else 0
+    return stats
+
+
+def refresh_stats(db, researcher_ids=None):
+    """
+    Recomputes Researcher_Stats and University_Stats from the current data.
+    researcher_ids is the dirty set: when given, only those researchers and the universities they
+    belong to (before and after the change) are recomputed; None rebuilds everything.
+    Also bumps the data version so every worker reloads its cached rankings.
+    Runs inside the caller's transaction so the stats commit together with the change that caused them.
+    """
+    db.flush()  # SessionLocal doesn't autoflush; make pending ORM changes visible to the aggregates
+    if researcher_ids is None:
+        db.query(ResearcherStats).delete(synchronize_session=False)
+        db.bulk_insert_mappings(ResearcherStats, [
+            dict(zip(RESEARCHER_STATS_COLUMNS, row)) for row in researcher_stats(db)
+        ])
+        db.query(UniversityStats).delete(synchronize_session=False)
+        db.bulk_insert_mappings(UniversityStats, [_university_row(row) for row in university_stats(db)])
+        bump_data_version(db)
+        return
+
+    dirty = sorted(set(researcher_ids))
+    if not dirty:
+        return
+    universities = set()
+    for start in range(0, len(dirty), DIRTY_CHUNK_SIZE):
+        chunk = dirty[start:start + DIRTY_CHUNK_SIZE]
+        # Old rows name the university a researcher may have just left (or been deleted from)
+        universities.update(u for (u,) in db.query(ResearcherStats.university).filter(ResearcherStats.researcher_id.in_(chunk)))
+        universities.update(u for (u,) in db.query(Researchers.university).filter(Researchers.id.in_(chunk)))
+        db.query(ResearcherStats).filter(ResearcherStats.researcher_id.in_(chunk)).delete(synchronize_session=False)
+        db.bulk_insert_mappings(ResearcherStats, [
+            dict(zip(RESEARCHER_STATS_COLUMNS, row)) for row in researcher_stats(db, chunk)
+        ])
+    universities = {u or "Unknown" for u in universities}
+    db.query(UniversityStats).filter(UniversityStats.name.in_(universities)).delete(synchronize_session=False)
+    db.bulk_insert_mappings(UniversityStats, [_university_row(row) for row in university_stats(db, universities)])
+    bump_data_version(db)
+    print(f"Refreshed stats for {len(dirty)} researchers across {len(universities)} universities")
+
+
+def ensure_stats(db):
+    """Builds the stats tables once for databases populated before they existed."""
+    if db.query(ResearcherStats).first() is None and db.query(Researchers).first() is not None:
+        print("Building researcher and university stats tables")
+        refresh_stats(db)
+        db.commit()
+
+
+def load_researcher_stats(db):
+    rows = db.query(ResearcherStats).order_by(ResearcherStats.researcher_id)
+    return [
+        {
+            "id": str(r.researcher_id),
+            "name": r.name,
+            "field": r.field,
+            "level": r.level,
+            "university": r.university,
+            "total_articles": r.total_articles,
+            "abdc_a_star_a": r.abdc_a_star_a,
+            "avg_jif": r.avg_jif,
+            "avg_jif5": r.avg_jif5,
+            "avg_citation": r.avg_citation,
+        }
+        for r in rows
+    ]
+
+
+def load_university_stats(db):
+    rows = db.query(UniversityStats).order_by(UniversityStats.position)
+    return [
+        {
+            "name": u.name,
+            "num_researchers": u.num_researchers,
+            "accounting_count": u.accounting_count,
+            "finance_count": u.finance_count,
+            "total_articles": u.total_articles,
+            "accounting_articles": u.accounting_articles,
+            "finance_articles": u.finance_articles,
+            "abdc_a_star_a": u.abdc_a_star_a,
+            "avg_jif": u.avg_jif,
+            "avg_jif5": u.avg_jif5,
+            "avg_articles_overall": u.avg_articles_overall,
+            "avg_articles_accounting": u.avg_articles_accounting,
+            "avg_articles_finance": u.avg_articles_finance,
+        }
+        for u in rows
+    ]
@@ -1,13 +1,17 @@
 # app/main.py
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
 from app.routes import router
-from app.database import Base, engine
+from app.database import Base, engine, SessionLocal
+from app.helpers.stats_funcs import ensure_stats
 from app import models  # Ensure models are imported so tables are created
 from starlette.middleware.sessions import SessionMiddleware
 
 # --- DB setup ---
 Base.metadata.create_all(bind=engine)
+with SessionLocal() as db:
+    ensure_stats(db)  # Precomputed ranking stats for databases populated before the stats tables existed
 
 # Templates (if you want to use them globally)
 templates = Jinja2Templates(directory="app/templates")
@@ -20,4 +24,6 @@ app.include_router(router)
 
 @app.exception_handler(404)
 async def not_found(request: Request, exc):
+    if request.url.path.startswith("/api/"):
+        return JSONResponse(content={"detail": getattr(exc, "detail", "Not Found")}, status_code=404)
     return templates.TemplateResponse("404.html", {"request": request}, status_code=404)
\ No newline at end of file
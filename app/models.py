@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, Float, DateTime
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -58,6 +58,69 @@ class Publications(Base):
     )
     journal = relationship("Journals", back_populates="publication")
 
+class JournalMatchCache(Base):
+    """Result of matching a scraped journal name against one version of the ABDC list."""
+    __tablename__ = "Journal_Match_Cache"
+    journal_name = Column(String, primary_key=True)
+    journal_id = Column(Integer, ForeignKey("Journals.id"), nullable=True)  # None = no match above threshold
+    score = Column(Integer, nullable=False)
+    threshold = Column(Integer, nullable=False)
+    matched_at = Column(DateTime, nullable=False)
+    abdc_version = Column(String, nullable=False)
+
+class ProfileFingerprint(Base):
+    """What a profile's publication listing looked like when it was last scraped in full, to skip it while unchanged."""
+    __tablename__ = "Profile_Fingerprints"
+    profile_url = Column(String, primary_key=True)
+    university = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False)  # "<publication count>:<latest year>:<hash>"
+    checked_at = Column(DateTime, nullable=False)  # UTC
+
+class OpenAlexLookup(Base):
+    """A publication OpenAlex had no link for when it was last looked up, so enrichment leaves it for a while."""
+    __tablename__ = "OpenAlex_Lookups"
+    publication_id = Column(Integer, ForeignKey("Publications.id"), primary_key=True)
+    checked_at = Column(DateTime, nullable=False)  # UTC
+
+class ResearcherStats(Base):
+    """Precomputed ranking stats per researcher, refreshed by every function that changes the data."""
+    __tablename__ = "Researcher_Stats"
+    researcher_id = Column(Integer, ForeignKey("Researchers.id"), primary_key=True)
+    name = Column(String, nullable=False)
+    field = Column(String, nullable=True)
+    level = Column(String, nullable=True)
+    university = Column(String, nullable=True)
+    total_articles = Column(Integer, nullable=False)
+    abdc_a_star_a = Column(Integer, nullable=False)
+    avg_jif = Column(Float, nullable=False)
+    avg_jif5 = Column(Float, nullable=False)
+    avg_citation = Column(Float, nullable=False)
+
+class UniversityStats(Base):
+    """Precomputed ranking stats per university, refreshed alongside ResearcherStats."""
+    __tablename__ = "University_Stats"
+    name = Column(String, primary_key=True)
+    position = Column(Integer, nullable=False)  # id of the university's first researcher, which orders the list
+    num_researchers = Column(Integer, nullable=False)
+    accounting_count = Column(Integer, nullable=False)
+    finance_count = Column(Integer, nullable=False)
+    total_articles = Column(Integer, nullable=False)
+    accounting_articles = Column(Integer, nullable=False)
+    finance_articles = Column(Integer, nullable=False)
+    abdc_a_star_a = Column(Integer, nullable=False)
+    avg_jif = Column(Float, nullable=False)
+    avg_jif5 = Column(Float, nullable=False)
+    avg_articles_overall = Column(Float, nullable=False)
+    avg_articles_accounting = Column(Float, nullable=False)
+    avg_articles_finance = Column(Float, nullable=False)
+
+class DataVersion(Base):
+    """Single-row counter bumped whenever the ranking data changes; workers compare it to know when to reload."""
+    __tablename__ = "Data_Version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False)  # UTC
+
 class Users(Base):
     __tablename__ = "Users"
     id = Column(Integer, primary_key=True, index=True)
@@ -1,12 +1,12 @@
-from fastapi import APIRouter, Request, Path, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi import APIRouter, Request, Path, UploadFile, File, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 from contextlib import redirect_stdout
 from app.scrapers.update import update_all
 from app.scrapers.helpers.util import match_journals
 from app.scripts.CSV_imports import print_issns_in_batches
 from app.helpers.researchers_funcs import get_researcher_data
-from app.helpers.researcher_profile_funcs import get_researcher_profile
+from app.helpers.researcher_profile_funcs import get_researcher_profile, researcher_exists
 from app.helpers.universities_funcs import get_university_data
 from app.helpers.admin_funcs import (
     download_master_csv,
@@ -20,7 +20,10 @@ from app.helpers.admin_funcs import (
     reupload_master_spreadsheet
 )
 from app.helpers.auth_funcs import authenticate_user
+from app.helpers.cache_funcs import cache_metrics, current_data_version
 
+from email.utils import format_datetime, parsedate_to_datetime
+import datetime
 import io
 import sys
 import threading
@@ -32,23 +35,6 @@ templates = Jinja2Templates(directory="app/templates")
 # --- New Global State Variable with 'logs' key ---
 # This dictionary now holds logs in addition to progress and messages.
 scraper_status_data = {"progress": 0, "message": "Not started", "logs": []}
-RESEARCHER_STATS_CACHE = None
-UNIVERSITY_STATS_CACHE = None
-
-#------------------------
-# Helper function
-#------------------------
-def competition_rank(sorted_rows, value_fn):
-    out = []
-    prev = object()
-    rank = 0
-    for i, row in enumerate(sorted_rows, start=1):
-        val = value_fn(row) or 0
-        if val != prev:
-            rank = i
-            prev = val
-        out.append((rank, row))
-    return out
 
 
 # ------------------------
@@ -78,26 +64,16 @@ def documentation(request: Request):
 # ------------------------
 @router.get("/researchers", response_class=HTMLResponse)
 def researchers(request: Request):
-    global RESEARCHER_STATS_CACHE
-    researcher_list, variable_label, RESEARCHER_STATS_CACHE = get_researcher_data(request, RESEARCHER_STATS_CACHE)
-    researcher_list = sorted(
-        researcher_list,
-        key=lambda d: d.get("variable_value") or 0,
-        reverse=True
-    )
-
-    ranked = competition_rank(
-        researcher_list,
-        value_fn=lambda d: d.get("variable_value") or 0
-    )
-    researchers_with_rank = [{**d, "rank": rk} for rk, d in ranked]
+    # Filtered, ranked and paginated server-side; only the requested page is rendered
+    researcher_list, variable_label, pagination = get_researcher_data(request)
 
     return templates.TemplateResponse(
         "researchers.html",
         {
             "request": request,
-            "researchers": researchers_with_rank, 
-            "variable_label": variable_label
+            "researchers": researcher_list,
+            "variable_label": variable_label,
+            "pagination": pagination
         }
     )
 
@@ -108,6 +84,8 @@ def researchers(request: Request):
 @router.get("/researchers/{researcher_id}", response_class=HTMLResponse)
 def researcher_profile(request: Request, researcher_id: int = Path(...)):
     researcher_data, pub_list = get_researcher_profile(researcher_id)
+    if researcher_data is None:
+        raise HTTPException(status_code=404, detail="Researcher not found")
     return templates.TemplateResponse(
         "researcher_profile.html",
         {"request": request, "researcher": researcher_data, "publications": pub_list},
@@ -119,25 +97,84 @@ def researcher_profile(request: Request, researcher_id: int = Path(...)):
 # ------------------------
 @router.get("/universities", response_class=HTMLResponse)
 def universities(request: Request):
-    global UNIVERSITY_STATS_CACHE
-    university_list, variable_label, UNIVERSITY_STATS_CACHE = get_university_data(request, UNIVERSITY_STATS_CACHE)
-
-    ranked = competition_rank(
-        sorted(university_list, key=lambda u: u.get("variable_value") or 0, reverse=True),
-        value_fn=lambda u: u.get("variable_value") or 0
-    )
-    universities_with_rank = [{**u, "rank": rk} for rk, u in ranked]
+    university_list, variable_label = get_university_data(request)
 
     return templates.TemplateResponse(
         "universities.html",
         {
             "request": request,
-            "universities": universities_with_rank,
+            "universities": university_list,
             "variable_label": variable_label
         }
     )
 
 
+# ------------------------
+# JSON API (conditional on the data version)
+# ------------------------
+def conditional_json(request: Request, build_content):
+    """
+    JSON response tagged with ETag/Last-Modified from the data version.
+    Answers 304 without building the content when the client already has the current version.
+    """
+    version, updated_at = current_data_version()
+    etag = f'"{version}-{int(updated_at.replace(tzinfo=datetime.timezone.utc).timestamp())}"' if updated_at else f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if updated_at:
+        headers["Last-Modified"] = format_datetime(updated_at.replace(tzinfo=datetime.timezone.utc, microsecond=0), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+    elif updated_at and request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+        except (TypeError, ValueError):
+            since = None
+        if since and updated_at.replace(tzinfo=datetime.timezone.utc, microsecond=0) <= since:
+            return Response(status_code=304, headers=headers)
+
+    return JSONResponse(content=build_content(), headers=headers)
+
+
+@router.get("/api/researchers")
+def api_researchers(request: Request):
+    """Same filters, sort_by and pagination as /researchers."""
+    def build():
+        researcher_list, variable_label, pagination = get_researcher_data(request)
+        return {
+            "researchers": researcher_list,
+            "variable_label": variable_label,
+            "pagination": {k: v for k, v in pagination.items() if k != "query"},
+        }
+    return conditional_json(request, build)
+
+
+@router.get("/api/researchers/{researcher_id}")
+def api_researcher_profile(request: Request, researcher_id: int = Path(...)):
+    # Checked before the ETag, which only says the data hasn't changed, not that this researcher is in it
+    if not researcher_exists(researcher_id):
+        raise HTTPException(status_code=404, detail="Researcher not found")
+
+    def build():
+        researcher_data, pub_list = get_researcher_profile(researcher_id)
+        if researcher_data is None:
+            raise HTTPException(status_code=404, detail="Researcher not found")
+        return {"researcher": {"id": researcher_id, **researcher_data}, "publications": pub_list}
+    return conditional_json(request, build)
+
+
+@router.get("/api/universities")
+def api_universities(request: Request):
+    """Same sort_by as /universities."""
+    def build():
+        university_list, variable_label = get_university_data(request)
+        return {"universities": university_list, "variable_label": variable_label}
+    return conditional_json(request, build)
+
+
 # ------------------------
 # Admin page
 # ------------------------
@@ -218,9 +255,6 @@ async def upload_master_csv(
         "The website will be temporarily unavailable while the CSV file is being processed."
     )
     reupload_master_spreadsheet(file_path)
-    global RESEARCHER_STATS_CACHE, UNIVERSITY_STATS_CACHE
-    RESEARCHER_STATS_CACHE = None  # Clear researcher cache to reflect updated data
-    UNIVERSITY_STATS_CACHE = None  # Clear university cache to reflect updated data
     return RedirectResponse(url="/admin", status_code=303)
 
 @router.post("/admin/upload/abdc")
@@ -245,9 +279,6 @@ async def upload_abdc(
     except Exception as e:
         request.session["flash"] += f"No clarivate data found, please upload clarivate data as well."
     match_journals(force=True)  # Re-match journals after ABDC update
-    global RESEARCHER_STATS_CACHE, UNIVERSITY_STATS_CACHE
-    RESEARCHER_STATS_CACHE = None  # Clear researcher cache to reflect updated journal data
-    UNIVERSITY_STATS_CACHE = None  # Clear university cache to reflect updated journal data
     return RedirectResponse(url="/admin", status_code=303)
 
 @router.post("/admin/upload/clarivate")
@@ -267,9 +298,6 @@ async def upload_clarivate(
         f"File '{clarivate_csv.filename}' uploaded successfully"
     )
     import_clarivate(file_path)
-    global RESEARCHER_STATS_CACHE, UNIVERSITY_STATS_CACHE
-    RESEARCHER_STATS_CACHE = None  # Clear researcher cache to reflect updated journal data
-    UNIVERSITY_STATS_CACHE = None  # Clear university cache to reflect updated journal data
     return RedirectResponse(url="/admin", status_code=303)
 
 @router.post("/admin/upload/uwa_staff_field")
@@ -289,11 +317,16 @@ async def upload_uwa_staff_field(
         f"File '{uwa_staff_field_csv.filename}' uploaded successfully."
     )
     update_UWA_staff_fields(file_path)
-    global RESEARCHER_STATS_CACHE, UNIVERSITY_STATS_CACHE
-    RESEARCHER_STATS_CACHE = None  # Clear researcher cache to reflect updated journal data
-    UNIVERSITY_STATS_CACHE = None  # Clear university cache to reflect updated journal data
     return RedirectResponse(url="/admin", status_code=303)
 
+@router.get("/admin/cache-stats")
+async def cache_stats(request: Request):
+    """Stats cache hits/misses and data version for the worker that serves this request."""
+    user = request.session.get("user")
+    if not user:
+        return RedirectResponse(url="/", status_code=303)
+    return JSONResponse(content=cache_metrics())
+
 @router.get("/admin/issn_batches")
 async def issn_batches(request: Request):
     user = request.session.get("user")
@@ -337,10 +370,10 @@ class FrontendLogHandler(io.StringIO):
         sys.__stdout__.write(s)
         sys.__stdout__.flush()
 
-def run_scraper_task():
+def run_scraper_task(resume=True):
     """
     This function runs in a separate thread and uses the FrontendLogHandler
-    to capture all print outputs.
+    to capture all print outputs. resume=False starts a new run instead of resuming a stopped one.
     """
     global scraper_status_data
     scraper_status_data['progress'] = 0
@@ -352,7 +385,7 @@ def run_scraper_task():
     try:
         # Redirect all standard output within this block to our handler
         with redirect_stdout(log_capture):
-            update_all(progress_callback=update_progress)
+            update_all(progress_callback=update_progress, resume=resume)
         
         if scraper_status_data.get('progress') != -1:
              scraper_status_data['message'] = 'Completed successfully!'
@@ -364,10 +397,12 @@ def run_scraper_task():
         scraper_status_data['progress'] = -1
         scraper_status_data['message'] = f"An error occurred: {e}"
 
-def update_progress(progress):
-    """Callback function to update the global progress status."""
+def update_progress(progress, scrapers=None):
+    """Callback function to update the global progress status, overall and per university."""
     global scraper_status_data
     scraper_status_data['progress'] = progress
+    if scrapers is not None:
+        scraper_status_data['scrapers'] = scrapers
 
 @router.post("/admin/run-scraper")
 async def run_scraper(request: Request):
@@ -379,10 +414,13 @@ async def run_scraper(request: Request):
     if any("run_scraper_task" in t.name for t in threading.enumerate()):
         return JSONResponse(content={"message": "Scraper is already running."}, status_code=409)
 
+    form = await request.form()
+    resume = form.get("restart") != "true"
+
     global scraper_status_data
     scraper_status_data = {"progress": 0, "message": "Not started", "logs": []}
     
-    thread = threading.Thread(target=run_scraper_task, name="run_scraper_task")
+    thread = threading.Thread(target=run_scraper_task, args=(resume,), name="run_scraper_task")
     thread.start()
     
     return JSONResponse(content={"message": "Scraper started"})
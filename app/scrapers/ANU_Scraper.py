@@ -1,39 +1,53 @@
-import undetected_chromedriver as uc
-from app.scrapers.helpers.big3_functions import scrape_publications, find_profile_urls
-import csv
-
-def scrape_ANU():
-    options = uc.ChromeOptions()
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1280,800")
-    options.add_argument("--lang=en-US,en")
-    # options.add_argument("--headless")  # Uncomment for headless mode
-    driver = uc.Chrome(options=options)
+from functools import partial
+from app.scrapers.helpers.big3_functions import scrape_publications, find_listings, make_driver, wait_summary, reset_wait_log
+from app.scrapers.helpers.driver_pool import DriverPool, DRIVER_POOL_SIZE
+from app.scrapers.helpers.row_sink import RowSink
+from app.scrapers.helpers.fingerprints import load_fingerprints
 
+def scrape_ANU(headless=False, pool_size=DRIVER_POOL_SIZE, direct_to_db=False):
+    reset_wait_log()
     profiles_urls = [
         ("https://researchportalplus.anu.edu.au/en/organisations/research-school-of-accounting/persons/", "Accounting" ), #accounting
         ("https://researchportalplus.anu.edu.au/en/organisations/research-school-of-finance-actuarial-studies-statistics/persons/", "Finance" ) #finance
     ]
     base = "https://researchportalplus.anu.edu.au"
-    pairs = []
-    for url, field in profiles_urls:
-        print(f"Finding profile URLs on: {url}")
-        found = find_profile_urls(url, base, driver)  # returns list[str]
-        pairs.extend((u, field) for u in found)
-    profile_urls = list(set(pairs))
-    print(f"Found {len(profile_urls)} profile URLs")
 
-    csv_header = ["Title", "Year", "Type", "Journal Name", "Article URL", "Researcher Name", "Profile URL", "Job Title", "Field"]
-    with open("app/files/temp/ANU_data.csv", mode="w", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_header)
+    known = load_fingerprints("ANU")
+    # A profile listed under two fields is scraped for each, and both scrapes fingerprint every field it's
+    # listed under, so neither overwrites the other's fingerprint with a different one
+    fields = {}  # profile URL -> its fields
 
-    for profile_url, field in profile_urls:
+    def scrape(driver, pair):
+        profile_url, field = pair
         print(f"Scraping profile: {profile_url} ({field})")
-        name, job_title, publications_info = scrape_publications(profile_url, driver)
-        print(f"Found {len(publications_info)} publications in {profile_url}")
-        for line in publications_info:
-            with open("app/files/temp/ANU_data.csv", mode="a", newline='', encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(line + [name, profile_url, job_title, field])  # Append fields
\ No newline at end of file
+        return scrape_publications(profile_url, driver, known.get(profile_url), details=tuple(fields[profile_url]))
+
+    with DriverPool(partial(make_driver, headless=headless), size=pool_size) as pool:
+        pairs = []
+        for (url, field), found in zip(profiles_urls, find_listings(pool, [url for url, _ in profiles_urls], base)):
+            pairs.extend((u, field) for u in found)
+        profile_urls = sorted(set(pairs))
+        for profile_url, field in profile_urls:
+            fields.setdefault(profile_url, []).append(field)
+        print(f"Found {len(profile_urls)} profile URLs")
+
+        with RowSink("ANU", direct_to_db=direct_to_db) as sink:
+            # A profile listed under two fields is scraped for each, so both make up its checkpoint
+            checkpoint_key = lambda pair: f"{pair[0]} ({pair[1]})"
+            profile_urls = sink.pending(profile_urls, key=checkpoint_key)
+            # Profiles are scraped in parallel but come back, and are written, in profile_urls order
+            for (profile_url, field), result in zip(profile_urls, pool.imap(scrape, profile_urls, url=lambda pair: pair[0])):
+                if result is None:
+                    continue
+                name, job_title, publications_info, fingerprint = result
+                if publications_info is None:
+                    print(f"Unchanged since the last scrape: {profile_url}")
+                    sink.done(checkpoint_key((profile_url, field)))
+                    continue
+                print(f"Found {len(publications_info)} publications in {profile_url}")
+                for line in publications_info:
+                    sink.write(line + [name, profile_url, job_title, field])  # Append fields
+                sink.fingerprint(profile_url, fingerprint)
+                sink.done(checkpoint_key((profile_url, field)))
+
+    print(wait_summary())
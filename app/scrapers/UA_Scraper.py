@@ -1,13 +1,18 @@
 import time
 import re
 from typing import List, Dict, Optional, Tuple
-from urllib.parse import urlparse
+from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import csv
+from functools import partial
+from app.scrapers.helpers.driver_pool import DriverPool, DRIVER_POOL_SIZE
+from app.scrapers.helpers.crawler import fetch_many
+from app.scrapers.helpers.row_sink import RowSink
+from app.scrapers.helpers.fingerprints import load_fingerprints, profile_fingerprint
+from app.scrapers.helpers.http_cache import cached_render
 
 # ========= CONFIG =========
 UNIVERSITY_NAME = "University of Adelaide"
@@ -40,20 +45,30 @@ def gentle_scroll(driver, steps: int = SCROLL_STEPS, pause: float = SCROLL_PAUSE
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
         time.sleep(pause)
 
+def _links(html: str, page_url: str, selector: str = "a[href]"):
+    """(absolute URL without fragment, link text) for the links matching selector in a page source."""
+    links = []
+    for a in BeautifulSoup(html, "lxml").select(selector):
+        href = a.get("href", "").strip()
+        if href:
+            links.append((urljoin(page_url, href).split("#")[0].rstrip("/"), a.get_text(" ", strip=True)))
+    return links
+
+def _render_index(driver, index_url: str) -> str:
+    driver.get(index_url)
+    wait_for_body(driver, INDEX_WAIT_SEC)
+    time.sleep(1.2)
+    gentle_scroll(driver)
+    return driver.page_source
+
 def collect_entry_links(pages_with_fields: List[Tuple[str, str]], driver) -> List[Tuple[str, str]]:
     """Return (entry_url, field) pairs discovered on index pages."""
     found: set[Tuple[str, str]] = set()
     for index_url, field in pages_with_fields:
         print(f"Index: {index_url} ({field})")
-        driver.get(index_url)
-        wait_for_body(driver, INDEX_WAIT_SEC)
-        time.sleep(1.2)
-        gentle_scroll(driver)
-        for a in driver.find_elements(By.CSS_SELECTOR, "a[href]"):
-            href = (a.get_attribute("href") or "").strip()
-            if not href or href.startswith("#"):
-                continue
-            href = href.split("#")[0].rstrip("/")
+        # Page sources come from the HTTP response cache when it has them, else from the browser
+        html = cached_render(index_url, lambda: _render_index(driver, index_url))
+        for href, _ in _links(html, index_url):
             netloc = urlparse(href).netloc
             if (
                 "researchers.adelaide.edu.au" in netloc
@@ -64,41 +79,33 @@ def collect_entry_links(pages_with_fields: List[Tuple[str, str]], driver) -> Lis
     print(f"Collected {len(found)} entry links (with fields).")
     return list(found)
 
-def resolve_to_profile(driver, entry_url: str, field: str) -> Optional[Tuple[str, str]]:
-    if "researchers.adelaide.edu.au" in entry_url and "/profile/" in entry_url and "?name=" not in entry_url:
-        return (entry_url.split("#")[0].rstrip("/"), field)
-
+def _render_entry(driver, entry_url: str) -> str:
     print(f"Getting {entry_url}")
     driver.get(entry_url)
     wait_for_body(driver, PROFILE_WAIT_SEC)
     time.sleep(0.8)
-    try:
-        links = driver.find_elements(By.CSS_SELECTOR, "a[href*='researchers.adelaide.edu.au/profile/']")
-        for link in links:
-            href = (link.get_attribute("href") or "").split("#")[0].rstrip("/")
-            if "/profile/" in href and "?name=" not in href:
-                return (href, field)
-    except Exception:
-        pass
-    locators = [
-        (By.XPATH, "//a[contains(., 'View My Researcher Profile')]"),
-        (By.PARTIAL_LINK_TEXT, "Researcher Profile")
-    ]
-    for locator in locators:
-        try:
-            el = driver.find_element(*locator)
-            href = (el.get_attribute("href") or "").split("#")[0].rstrip("/")
-            if "researchers.adelaide.edu.au" in href and "/profile/" in href and "?name=" not in href:
-                return (href, field)
-        except Exception:
-            pass
-    try:
-        for a in driver.find_elements(By.CSS_SELECTOR, "a[href*='researchers.adelaide.edu.au']"):
-            href = (a.get_attribute("href") or "").split("#")[0].rstrip("/")
-            if "/profile/" in href and "?name=" not in href:
-                return (href, field)
-    except Exception:
-        pass
+    return driver.page_source
+
+def _is_profile_href(href: str) -> bool:
+    return "researchers.adelaide.edu.au" in href and "/profile/" in href and "?name=" not in href
+
+def resolve_to_profile(driver, entry_url: str, field: str) -> Optional[Tuple[str, str]]:
+    if _is_profile_href(entry_url):
+        return (entry_url.split("#")[0].rstrip("/"), field)
+
+    html = cached_render(entry_url, lambda: _render_entry(driver, entry_url))
+    for href, _ in _links(html, entry_url, "a[href*='researchers.adelaide.edu.au/profile/']"):
+        if _is_profile_href(href):
+            return (href, field)
+    # The first link with the button's text, as the browser's locators found it
+    links = _links(html, entry_url)
+    for text in ["View My Researcher Profile", "Researcher Profile"]:
+        href = next((href for href, link_text in links if text in link_text), None)
+        if href and _is_profile_href(href):
+            return (href, field)
+    for href, _ in _links(html, entry_url, "a[href*='researchers.adelaide.edu.au']"):
+        if _is_profile_href(href):
+            return (href, field)
     return None
 
 def open_publications_journals(driver, profile_url: str) -> str:
@@ -132,6 +139,10 @@ def open_publications_journals(driver, profile_url: str) -> str:
     gentle_scroll(driver, steps=3)
     return driver.page_source
 
+def needs_browser(html: Optional[str]) -> bool:
+    """True if a page fetched over HTTP has no publication rows to parse (failed, or rendered by JS)."""
+    return not html or not BeautifulSoup(html, "lxml").select("li.c-accordion__item tbody tr")
+
 def parse_researcher_profile(html: str, profile_url : str):
     soup = BeautifulSoup(html, "lxml")
     # Extract Researcher Name
@@ -189,36 +200,61 @@ def parse_researcher_profile(html: str, profile_url : str):
             publications.append([title, year, pub_type, journal_name, article_url, researcher_name, profile_url, role])
     return publications
 
-def scrape_UA(headless: bool = False):
-    driver = make_driver(headless=headless)
-    try:
-        entry_pairs = collect_entry_links(STAFF_INDEX_PAGES_WITH_FIELDS, driver)
+def scrape_UA(headless: bool = False, pool_size: int = DRIVER_POOL_SIZE, direct_to_db: bool = False):
+    # POLITE_DELAY now spaces out page loads per host across the whole pool
+    with DriverPool(partial(make_driver, headless=headless), size=pool_size, host_delay=POLITE_DELAY) as pool:
+        entry_pairs = pool.run(lambda driver: collect_entry_links(STAFF_INDEX_PAGES_WITH_FIELDS, driver))
+        if entry_pairs is None:
+            # Carrying on would scrape nobody; failing leaves the run to be resumed
+            raise RuntimeError("Failed to collect the UA staff index")
+        entry_pairs = sorted(entry_pairs)
         profile_pairs_set: set[Tuple[str, str]] = set()
-        for entry_url, field in entry_pairs:
-            resolved = resolve_to_profile(driver, entry_url, field)
+
+        def resolve(driver, entry):
+            return resolve_to_profile(driver, entry[0], entry[1])
+
+        for (entry_url, field), resolved in zip(entry_pairs, pool.map(resolve, entry_pairs, url=lambda entry: entry[0])):
             if resolved:
                 profile_pairs_set.add((resolved[0].rstrip("/"), resolved[1]))
             else:
                 print("  ! No researcher profile found:", entry_url)
-        profile_pairs = list(profile_pairs_set)
+        profile_pairs = sorted(profile_pairs_set)
         print(f"Resolved {len(profile_pairs)} researcher profile URLs (with fields).")
-        csv_header = ["Title", "Year", "Type", "Journal Name", "Article URL", "Researcher Name", "Profile URL", "Job Title", "Field"]
-        with open("app/files/temp/UA_data.csv", mode="w", newline='', encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(csv_header)
-
-        for i, (profile_url, field) in enumerate(profile_pairs, 1):
-            print(f"[{i}/{len(profile_pairs)}] {profile_url} ({field})")
-            html = open_publications_journals(driver, profile_url)
-            publications = parse_researcher_profile(html, profile_url)
-            for row in publications:
-                with open("app/files/temp/UA_data.csv", mode="a", newline='', encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(row + [field])  # append field as a separate field
-
-            time.sleep(POLITE_DELAY)
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
\ No newline at end of file
+        def fetch(driver, pair):
+            def render():
+                html = open_publications_journals(driver, pair[0])
+                return html, not needs_browser(html)  # a page still missing publications isn't cached
+            return cached_render(pair[0], render)
+
+        known = load_fingerprints("UA")
+        # A profile listed under two fields is written for each, and both fingerprint every field it's
+        # listed under, so neither overwrites the other's fingerprint with a different one
+        fields = {}  # profile URL -> its fields
+        for profile_url, field in profile_pairs:
+            fields.setdefault(profile_url, []).append(field)
+        with RowSink("UA", direct_to_db=direct_to_db) as sink:
+            checkpoint_key = lambda pair: f"{pair[0]} ({pair[1]})"
+            profile_pairs = sink.pending(profile_pairs, key=checkpoint_key)  # leaves out profiles a stopped run already scraped
+            # Profile pages are fetched over HTTP first; only the ones without publication rows
+            # go through the browser pool. Either way they are written in profile_pairs order.
+            http_pages = fetch_many([profile_url for profile_url, _ in profile_pairs], host_delay=POLITE_DELAY)
+            browser_pairs = [pair for pair, html in zip(profile_pairs, http_pages) if needs_browser(html)]
+            print(f"Fetched {len(profile_pairs) - len(browser_pairs)} profiles over HTTP, {len(browser_pairs)} need the browser.")
+            browser_pages = iter(pool.imap(fetch, browser_pairs, url=lambda pair: pair[0]))
+            for i, ((profile_url, field), html) in enumerate(zip(profile_pairs, http_pages), 1):
+                print(f"[{i}/{len(profile_pairs)}] {profile_url} ({field})")
+                if needs_browser(html):
+                    html = next(browser_pages)
+                if html is None:
+                    continue
+                publications = parse_researcher_profile(html, profile_url)
+                fingerprint = profile_fingerprint(publications, *fields[profile_url])
+                if needs_browser(html):
+                    fingerprint = None  # still missing publications after the browser, so they may be incomplete
+                if fingerprint is None or fingerprint != known.get(profile_url):
+                    for row in publications:
+                        sink.write(row + [field])  # append field as a separate field
+                    sink.fingerprint(profile_url, fingerprint)
+                else:
+                    print("  unchanged since the last scrape")
+                sink.done(checkpoint_key((profile_url, field)))
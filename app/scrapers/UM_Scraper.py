@@ -1,13 +1,14 @@
 from selenium import webdriver
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
-from pyalex import Works, Authors, Institutions
+from app.scrapers.helpers.openalex import author_ids, institution_id, works_by_authors
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 import time
-import re
-import csv
+from concurrent.futures import ThreadPoolExecutor
+from app.scrapers.helpers.row_sink import RowSink
+from app.scrapers.helpers.classifier import name_without_nickname, nickname_with_surname
 
 links_to_scrape = [("https://fbe.unimelb.edu.au/about/academic-staff?queries_tags_query=4895953", "Finance"),
                    ("https://fbe.unimelb.edu.au/about/academic-staff?queries_tags_query=4895951", "Accounting")]
@@ -41,26 +42,6 @@ def find_researcher(academic, driver):
         academic["name"] = new_name
         return(new_name)
 
-def transform_name_firstlast(name):
-    # Remove anything inside parentheses including the parentheses themselves
-    cleaned_name = re.sub(r"\s*\(.*?\)\s*", " ", name)
-    # Collapse multiple spaces into one, and strip leading/trailing spaces
-    return re.sub(r"\s+", " ", cleaned_name).strip()
-
-#Uses nickname as first name
-def transform_name_nicknamelast(name):
-    # Look for "(nickname)" using regex
-    match = re.search(r"\((.*?)\)", name)
-    parts = name.split()
-    
-    if match:  
-        # nickname inside parentheses
-        nickname = match.group(1).strip()
-        last_name = parts[-1]  # last word is the surname
-        return(f"{nickname} {last_name}")
-    else:
-        return(name)
-
 def get_staff(url, driver, field):
     driver.get(url)
     
@@ -85,6 +66,7 @@ def get_staff(url, driver, field):
     return(staff)
 
 def clean_staff(staff_list):
+    # Which staff UM's listings are scraped for; titles and levels are standardized at ingest (see classifier.py)
     accepted_roles = ["Associate Professor", "Professor", "Senior Lecturer", "Lecturer", "Research Fellow"]
     rejected_roles = {"Assistant Lecturer", "Education-Focused", "Education Focused", "Education Focussed"}
     cleaned_staff_list = []
@@ -115,29 +97,27 @@ def get_works_openalex(academics):
     
     UniMelb_works = []
 
-    insts = Institutions().search("University of Melbourne").get()
-    print(f"{len(insts)} search result(s) found for the institution")
-    inst_id = insts[0]["id"].replace("https://openalex.org/", "")
+    inst_id = institution_id("University of Melbourne")
 
     count = 0
     skipped_academics = []
-    for academic in (a for a in academics if not a["scraped"]):
-        auths = Authors().search(academic["name"]).filter(affiliations={"institution": {"id": inst_id}}).get()
-        print(f"{len(auths)} search result(s) found for {academic['name']}")
-
-        try:
-            auth_id = auths[0]["id"].replace("https://openalex.org/", "")
-        except IndexError:
+    found = []
+    pending = [a for a in academics if not a["scraped"]]
+    # Looked up concurrently, within the OpenAlex rate limit
+    ids = author_ids([academic["name"] for academic in pending], inst_id)
+    for academic in pending:
+        auth_id = ids[academic["name"]]
+        if auth_id is None:
             print("Skipping due to no results")
             skipped_academics.append(academic["name"])
             continue
+        found.append((academic, auth_id))
 
-        pager = Works().filter(author={"id": auth_id}).paginate(per_page=200)
+    # Every found researcher's works, fetched in batches of authors; the pages hold all the fields used below
+    works_by_author = works_by_authors(auth_id for _, auth_id in found)
 
-        works = []
-        for page in pager:
-            for work in page:
-                works.append(work)
+    for academic, auth_id in found:
+        works = works_by_author[auth_id]
 
         print(f"{len(works)} work(s) found for {academic['name']}")
 
@@ -145,15 +125,12 @@ def get_works_openalex(academics):
         auth_works = {}
 
         for work in works:
-            work_id = work["id"].replace("https://openalex.org/", "")
-            this_work = Works()[work_id]
-
-            work_name = this_work["display_name"]
+            work_name = work["display_name"]
             try:
-                work_source = this_work["primary_location"]["source"]["display_name"]
-                work_date = this_work["publication_date"][:4]
-                work_type = this_work["type"]
-                work_link = this_work["doi"]
+                work_source = work["primary_location"]["source"]["display_name"]
+                work_date = work["publication_date"][:4]
+                work_type = work["type"]
+                work_link = work["doi"]
             except (TypeError, KeyError, ValueError):
                 continue
 
@@ -192,7 +169,7 @@ def get_works_website(academics, driver):
     for academic in (a for a in academics if not a["scraped"]):
         time.sleep(5)
         #Some researchers' names are different on the department page and Find and Expert. This only looks up if needed to avoid unnecessary requests
-        search_name = transform_name_firstlast(academic["name"])
+        search_name = name_without_nickname(academic["name"])
         attempts = 0
         while attempts < 2:
             try:
@@ -204,7 +181,7 @@ def get_works_website(academics, driver):
                 if attempts == 1:
                     print(f"Timeout waiting for publications to load for {academic['name']}. Trying nickname transformation")
                     # Try nickname transformation as fallback
-                    search_name = transform_name_nicknamelast(academic["name"])
+                    search_name = nickname_with_surname(academic["name"])
                     continue
                 
                 # If both transformations failed, try to find the researcher's actual name
@@ -213,7 +190,7 @@ def get_works_website(academics, driver):
                     new_name = find_researcher(academic, driver)
                     if new_name:
                         print(f"Found new name: {new_name}. Retrying with original transformation")
-                        search_name = transform_name_firstlast(new_name)
+                        search_name = name_without_nickname(new_name)
                         attempts = 0  # Reset attempts to try again
                         continue
                 except RuntimeError:
@@ -278,18 +255,25 @@ def get_works_website(academics, driver):
     return(all_works)
 
 
-def scrape_UM():
-    csv_header = ["Title", "Year", "Type", "Journal Name", "Article URL", "Researcher Name", "Profile URL", "Job Title", "Field", "Level"]
-    with open("app/files/temp/UM_data.csv", mode="w", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_header)
-
+def scrape_UM(direct_to_db=False):
     driver = uc.Chrome() #removed version_main=138
-    for url, field in links_to_scrape:
-        staff_list = get_staff(url, driver, field)
-
-        academic_list = clean_staff(staff_list)
-        with open("app/files/temp/UM_data.csv", mode="a", newline='', encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerows(get_works_website(academic_list, driver))
-            writer.writerows(get_works_openalex(academic_list))
+    # A listing's OpenAlex lookups run in the background while the browser scrapes the next listing.
+    # Rows still go out a listing at a time, so each checkpoint covers exactly its listing's rows.
+    with RowSink("UM", direct_to_db=direct_to_db) as sink, ThreadPoolExecutor(max_workers=1) as openalex:
+        previous = None  # (listing url, future of its OpenAlex rows)
+
+        def finish_previous():
+            if previous is not None:
+                sink.write_many(previous[1].result())
+                sink.done(previous[0])
+
+        # Staff are scraped a department listing at a time, so the listing is what gets checkpointed
+        for url, field in sink.pending(links_to_scrape, key=lambda link: link[0]):
+            staff_list = get_staff(url, driver, field)
+
+            academic_list = clean_staff(staff_list)
+            website_works = get_works_website(academic_list, driver)
+            finish_previous()
+            sink.write_many(website_works)
+            previous = (url, openalex.submit(get_works_openalex, academic_list))
+        finish_previous()
@@ -1,29 +1,21 @@
+import re
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 import time
-import csv
-import re
-from pyalex import Works, Authors, Institutions
 import undetected_chromedriver as uc
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from app.scrapers.helpers.crawler import fetch_many
+from app.scrapers.helpers.row_sink import RowSink
+from app.scrapers.helpers.fingerprints import load_fingerprints, profile_fingerprint
+from app.scrapers.helpers.enrichment import find_publication_urls
 
 
 # ---------------- OpenAlex Helpers ----------------
-def get_author_id(name):
-    try:
-        authors = Authors().search(name).get()
-        if authors:
-            author_id = authors[0]["id"]
-            # Extract just the ID part if needed
-            if author_id.startswith("https://openalex.org/"):
-                return author_id.split("/")[-1]
-        return None
-    except Exception as e:
-        print("Author lookup error:", e)
-        return None
-    
 def clean_name(name):
-    # Remove common academic and honorific titles from the start of the name
+    # Remove common academic and honorific titles from the start of the name, for the OpenAlex author search only;
+    # the name stored for the researcher is cleaned at ingest (see classifier.clean_name)
     return re.sub(
         r"^(Professor |Prof\.? |Associate Professor |A/Prof |Adjunct |Emeritus Professor |Scientia Professor |Dr |Mr |Mrs |Ms )",
         "",
@@ -31,153 +23,75 @@ def clean_name(name):
         flags=re.IGNORECASE
     ).strip()
 
-def get_ins_id(ins_name):
-    try:
-        insts = Institutions().search(ins_name).get()
-        if insts:
-            inst_id = insts[0]["id"]
-            if inst_id.startswith("https://openalex.org/"):
-                return inst_id.split("/")[-1]
-        return None
-    except Exception as e:
-        print("Institution lookup error:", e)
-        return None
-
-def clean_title(title):
-    # Remove all unwanted characters from the title
-    return re.sub(r"[\"'“”‘’:]", "", title)
-
-def openAlex(title, year, author_id = None, institution_id = None):
-    title = clean_title(title)
-    try:
-        # Convert year to yyyy-mm-dd
-        if year and year.isdigit() and len(year) == 4:
-            from_date = f"{year}-01-01"
-            to_date = f"{year}-12-31"
-        else:
-            from_date = None
-            to_date = None
-
-        query = Works().search(title)
-        if from_date and to_date:
-            query = query.filter(
-                from_publication_date=from_date,
-                to_publication_date=to_date
-            )
-
-        if author_id:
-            query = query.filter(author={"id": author_id})
-        if institution_id:
-            query = query.filter(institution={"id": institution_id})
-
-        results = query.get()
-        
-        if results:
-            # Get the OpenAlex ID and convert to a direct link
-            openalex_id = results[0]["id"]
-            if openalex_id.startswith("https://openalex.org/"):
-                return openalex_id
-            # If it's an API URL, extract the ID and build the link
-            match = re.search(r'W\d+', openalex_id)
-            if match:
-                return f"https://openalex.org/{match.group(0)}"
-        else:
-            return ""
-    except Exception as e:
-        print("Error:", e)
-        return ""
+def find_UNSW_links():
+    """
+    OpenAlex links for UNSW publications in the database without one. The scraper leaves them empty;
+    update.py runs this once the rows are written (see enrichment.py).
+    """
+    return find_publication_urls("UNSW", "UNSW Sydney", clean_name)
 
 
 # ---------------- Scraping Function ----------------
-def scraping(profile_url, driver):
-    driver.get(profile_url)
-    time.sleep(1)
-
+# Map section keywords to article types
+SECTIONS = {
+    "Journal Articles": "Journal",
+    "Other": "",
+    "Book Chapters": "",
+    "Books": "",
+    "Working Papers": "",
+    "Edited Books": ""
+}
+
+
+def _text(el):
+    return " ".join(el.get_text(" ").split()) if el is not None else ""
+
+
+def parse_profile_page(html, profile_url):
+    """
+    Parses a profile page (fetched over HTTP, or the browser's page source with the sections expanded).
+    Returns name, [title, year, type, journal, url] per publication, and role.
+    """
+    soup = BeautifulSoup(html, "lxml")
     publications_info = []
 
-    # Map section keywords to article types
-    sections = {
-        "Journal Articles": "Journal",
-        "Other": "",
-        "Book Chapters": "",
-        "Books": "",
-        "Working Papers": "",
-        "Edited Books": ""
-    }
-
-    buttons = driver.find_elements(By.CSS_SELECTOR, "button.accordion-item")
-
     # Researcher name
-    try:
-        name = driver.find_element(By.CSS_SELECTOR, "h1.profile-heading").text.strip()
-    except Exception:
-        name = ""
-
+    name = _text(soup.select_one("h1.profile-heading"))
     # Researcher role
-    try:
-        role = driver.find_element(By.CSS_SELECTOR, "h1.profile-heading + div").text.strip()
-    except Exception:
-        role = ""
-
-    # Author ID & Institution ID for OpenAlex to look up
-    author_id = get_author_id(clean_name(name))
-    institution_id = get_ins_id("UNSW Sydney")
+    role = _text(soup.select_one("h1.profile-heading + div"))
 
-    for btn in buttons:
-        for section, default_article_type in sections.items():
-            if section in btn.text:
-                if btn.get_attribute("aria-expanded") == "false":
-                    btn.click()
-                    time.sleep(3)  # Wait for the section to expand
-                # Only get publications under the currently expanded section
-                section_div = btn.find_element(By.XPATH, "./following-sibling::div")
-                publications = section_div.find_elements(By.CSS_SELECTOR, "div.publication-item")
+    for btn in soup.select("button.accordion-item"):
+        btn_text = _text(btn)
+        for section in SECTIONS:
+            if section in btn_text:
+                # Only get publications under this section
+                section_div = btn.find_next_sibling("div")
+                publications = section_div.select("div.publication-item") if section_div else []
 
                 for pub in publications:
-                    # Title
-                    try:
-                        if section == "Books":
-                            title = pub.find_element(By.CSS_SELECTOR, "i.rg-title").text.strip()
-                        else:
-                            title = pub.find_element(By.CSS_SELECTOR, "span.rg-title").text.strip()
-                        # Remove ' and " only at the start and end
-                        title = title.strip("'\"")
-                    except Exception:
-                        title = ""
+                    # Title; remove ' and " only at the start and end
+                    title_el = pub.select_one("i.rg-title" if section == "Books" else "span.rg-title")
+                    title = _text(title_el).strip("'\"")
                     # Skip empty publication items
                     if not title:
                         continue
-                    
+
                     # Year
-                    try:
-                        year = pub.find_element(By.CSS_SELECTOR, "span.rg-year").text.strip()
-                    except Exception:
-                        year = "N/A"
+                    year_el = pub.select_one("span.rg-year")
+                    year = _text(year_el) if year_el is not None else "N/A"
 
                     # Article Type
-                    try:
-                        article_type = pub.find_element(By.CSS_SELECTOR, "span.publication-category").text.strip()
-                    except Exception:
-                        article_type = ""
+                    article_type = _text(pub.select_one("span.publication-category"))
 
                     # Journal name
                     if article_type and "journal" in article_type.lower():
-                        try:
-                            journal = pub.find_element(By.CSS_SELECTOR, "i.rg-source-title").text.strip()
-                        except Exception:
-                            journal = ""
+                        journal = _text(pub.select_one("i.rg-source-title"))
                     else:
                         journal = ""
 
                     # Article URL
-                    try:
-                        pub_url = pub.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
-                    except Exception:
-                        pub_url = ""
-
-                    # If missing, check OpenAlex
-                    if not pub_url and title:
-                        pub_url = openAlex(title, year, author_id, institution_id)
+                    link = pub.select_one("a[href]")
+                    pub_url = urljoin(profile_url, link["href"]) if link is not None else ""
 
                     publications_info.append([title, year, article_type, journal, pub_url])
                     print(f"Found publication: {title} ({article_type})")
@@ -185,6 +99,37 @@ def scraping(profile_url, driver):
     return name, publications_info, role
 
 
+def needs_browser(html):
+    """
+    True if a profile fetched over HTTP can't be parsed as is: the fetch failed, it has no publication
+    sections, or a section came without its publications (collapsed, or only loaded when expanded).
+    """
+    if not html:
+        return True
+    soup = BeautifulSoup(html, "lxml")
+    buttons = [btn for btn in soup.select("button.accordion-item") if any(section in _text(btn) for section in SECTIONS)]
+    if not buttons:
+        return True
+    for btn in buttons:
+        section_div = btn.find_next_sibling("div")
+        if section_div is None or not section_div.select("div.publication-item"):
+            return True
+    return False
+
+
+def scraping(profile_url, driver):
+    """Loads a profile in the browser, expands its publication sections and returns the page source."""
+    driver.get(profile_url)
+    time.sleep(1)
+
+    for btn in driver.find_elements(By.CSS_SELECTOR, "button.accordion-item"):
+        if any(section in btn.text for section in SECTIONS) and btn.get_attribute("aria-expanded") == "false":
+            btn.click()
+            time.sleep(3)  # Wait for the section to expand
+
+    return driver.page_source
+
+
 # ---------------- Profile Scraping ----------------
 def profile(page_url, driver):
     driver.get(page_url)
@@ -202,7 +147,7 @@ def profile(page_url, driver):
 
 
 # ---------------- Main Function ----------------
-def scrape_UNSW():
+def scrape_UNSW(direct_to_db=False):
     driver = uc.Chrome()
     departments_urls = [
         ("https://www.unsw.edu.au/business/our-people#search=&filters=f.School%257CstaffSchool%3ASchool%2Bof%2BAccounting%252C%2BAuditing%2Band%2BTaxation&sort=metastaffLastName", "Accounting"),
@@ -225,18 +170,28 @@ def scrape_UNSW():
             start_rank += num_ranks
             time.sleep(1)
 
-    csv_header = ["Title", "Year", "Type", "Journal Name", "Article URL", "Researcher Name", "Profile URL", "Job Title", "Field"]
-    with open("app/files/temp/UNSW_data.csv", mode="w", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_header)
-
-    all_data = []
-    for url, fields in profile_urls:
-        name, publications_info, role = scraping(url, driver)
-        for pub in publications_info:
-            with open("app/files/temp/UNSW_data.csv", mode="a", newline='', encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(pub + [name, url, role, fields])  # Append fields
+    known = load_fingerprints("UNSW")
+    with RowSink("UNSW", direct_to_db=direct_to_db) as sink:
+        checkpoint_key = lambda pair: f"{pair[0]} ({pair[1]})"
+        profile_urls = sink.pending(profile_urls, key=checkpoint_key)  # leaves out profiles a stopped run already scraped
+        # Profile pages are fetched over HTTP first; the browser only loads the ones whose
+        # publication sections didn't all come with their publications (see needs_browser)
+        pages = fetch_many([url for url, _ in profile_urls])
+        for (url, fields), html in zip(profile_urls, pages):
+            if needs_browser(html):
+                html = scraping(url, driver)
+            name, publications_info, role = parse_profile_page(html, url)
+            fingerprint = profile_fingerprint(publications_info, name, role, fields)
+            if needs_browser(html):
+                fingerprint = None  # sections still collapsed in the browser, so publications may be missing
+            if fingerprint is not None and fingerprint == known.get(url):
+                print(f"Unchanged since the last scrape: {url}")
+            else:
+                # Publications without a link get one from OpenAlex after the rows are written (find_UNSW_links)
+                for pub in publications_info:
+                    sink.write(pub + [name, url, role, fields])  # Append fields
+                sink.fingerprint(url, fingerprint)
+            sink.done(checkpoint_key((url, fields)))
 
     driver.quit()
 
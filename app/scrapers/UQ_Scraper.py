@@ -1,14 +1,19 @@
 import time
 import re
-import csv
 from typing import List, Optional, Tuple
-from urllib.parse import urlparse
+from urllib.parse import urljoin, urlparse
 
 from bs4 import BeautifulSoup
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from functools import partial
+from app.scrapers.helpers.driver_pool import DriverPool, DRIVER_POOL_SIZE
+from app.scrapers.helpers.crawler import fetch_many
+from app.scrapers.helpers.row_sink import RowSink
+from app.scrapers.helpers.fingerprints import load_fingerprints, profile_fingerprint
+from app.scrapers.helpers.http_cache import cached_render
 
 # ========= CONFIG =========
 UNIVERSITY_NAME = "The University of Queensland"
@@ -69,55 +74,62 @@ def _is_uq_profile_url(href: str) -> bool:
     )
 
 
+def _profile_links(html: str, page_url: str) -> List[str]:
+    """UQ profile URLs linked from a page source, in page order."""
+    links = []
+    for a in BeautifulSoup(html, "lxml").select("a[href*='/profile/']"):
+        href = urljoin(page_url, a["href"].strip()).split("#")[0].rstrip("/")
+        if _is_uq_profile_url(href) and href not in links:
+            links.append(href)
+    return links
+
+
 # ---------- 抓入口 ----------
+def _render_index(driver, url: str) -> str:
+    driver.get(url)
+    wait_for_body(driver, INDEX_WAIT_SEC)
+    time.sleep(1.2)
+    gentle_scroll(driver)
+
+    try:
+        btn = driver.find_element(
+            By.XPATH,
+            "//button[contains(., 'Accept') or contains(., 'Agree') or contains(., 'accept')]"
+        )
+        btn.click()
+        time.sleep(0.6)
+    except Exception:
+        pass
+    return driver.page_source
+
+
 def collect_entry_links(pages: List[Tuple[str, str]], driver) -> List[Tuple[str, str]]:
     found = set()
     for url, dept in pages:
         print("Index:", url, "| Department:", dept)
-        driver.get(url)
-        wait_for_body(driver, INDEX_WAIT_SEC)
-        time.sleep(1.2)
-        gentle_scroll(driver)
-
-        try:
-            btn = driver.find_element(
-                By.XPATH,
-                "//button[contains(., 'Accept') or contains(., 'Agree') or contains(., 'accept')]"
-            )
-            btn.click()
-            time.sleep(0.6)
-        except Exception:
-            pass
-
-        for a in driver.find_elements(By.CSS_SELECTOR, "a[href*='/profile/']"):
-            href = (a.get_attribute("href") or "").strip()
-            if not href or href.startswith("#"):
-                continue
-            href = href.split("#")[0].rstrip("/")
-            if _is_uq_profile_url(href):
-                found.add((href, dept))
+        # Page sources come from the HTTP response cache when it has them, else from the browser
+        html = cached_render(url, lambda: _render_index(driver, url))
+        for href in _profile_links(html, url):
+            found.add((href, dept))
 
     print(f"Collected {len(found)} entry links.")
     return sorted(found)
 
 
+def _render_entry(driver, entry_url: str) -> str:
+    driver.get(entry_url)
+    wait_for_body(driver, PROFILE_WAIT_SEC)
+    time.sleep(0.8)
+    return driver.page_source
+
+
 def resolve_to_profile(driver, entry_with_dept: Tuple[str, str]) -> Optional[Tuple[str, str]]:
     entry_url, dept = entry_with_dept
     if _is_uq_profile_url(entry_url):
         return (entry_url.split("#")[0].rstrip("/"), dept)
 
-    driver.get(entry_url)
-    wait_for_body(driver, PROFILE_WAIT_SEC)
-    time.sleep(0.8)
-
-    try:
-        for a in driver.find_elements(By.CSS_SELECTOR, "a[href*='/profile/']"):
-            href = (a.get_attribute("href") or "").split("#")[0].rstrip("/")
-            if _is_uq_profile_url(href):
-                return (href, dept)
-    except Exception:
-        pass
-    return None
+    links = _profile_links(cached_render(entry_url, lambda: _render_entry(driver, entry_url)), entry_url)
+    return (links[0], dept) if links else None
 
 
 def open_publications_journals(driver, profile_url: str) -> str:
@@ -148,6 +160,20 @@ def _map_pubtype(h3_text: str) -> str:
     return PUBTYPE_MAP.get(key, h3_text or "Journals")
 
 
+def needs_browser(html: Optional[str]) -> bool:
+    """True if a page fetched over HTTP can't be parsed as is: the fetch failed,
+    publications are behind a load/show more button, or none were rendered."""
+    if not html:
+        return True
+    soup = BeautifulSoup(html, "lxml")
+    main = soup.select_one("div.medium-9.columns") or soup
+    for btn in main.find_all("button"):
+        label = btn.get_text(strip=True).lower()
+        if "load" in label or "show" in label:
+            return True
+    return not main.select("div.indexed_content__item div.meta")
+
+
 def parse_researcher_profile(html: str, profile_url: str):
     soup = BeautifulSoup(html, "lxml")
 
@@ -231,14 +257,16 @@ def parse_researcher_profile(html: str, profile_url: str):
     return publications
 
 
-def scrape_UQ(headless: bool = False):
-    driver = make_driver(headless=headless)
-    try:
-        entries = collect_entry_links(STAFF_INDEX_PAGES, driver)
+def scrape_UQ(headless: bool = False, pool_size: int = DRIVER_POOL_SIZE, direct_to_db: bool = False):
+    # POLITE_DELAY now spaces out page loads per host across the whole pool
+    with DriverPool(partial(make_driver, headless=headless), size=pool_size, host_delay=POLITE_DELAY) as pool:
+        entries = pool.run(lambda driver: collect_entry_links(STAFF_INDEX_PAGES, driver))
+        if entries is None:
+            # Carrying on would scrape nobody; failing leaves the run to be resumed
+            raise RuntimeError("Failed to collect the UQ staff index")
         print("Entry URLs:", len(entries))
         profiles = set()
-        for entry in entries:
-            res= resolve_to_profile(driver, entry)
+        for entry, res in zip(entries, pool.map(resolve_to_profile, entries, url=lambda entry: entry[0])):
             if res:
                 prof_url, dept = res
                 profiles.add((prof_url.rstrip("/"), dept))
@@ -248,23 +276,42 @@ def scrape_UQ(headless: bool = False):
         profiles_sorted = sorted(profiles, key=lambda x: x[0])
         print(f"Resolved {len(profiles_sorted)} researcher profile URLs.")
 
-        csv_header = ["Title", "Year", "Type", "Journal Name", "Article URL", "Researcher Name", "Profile URL", "Job Title", "Field"]
-        with open("app/files/temp/UQ_data.csv", mode="w", newline='', encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(csv_header)
-        for i, (profile_url, dept) in enumerate(profiles_sorted, 1):
-            print(f"[{i}/{len(profiles_sorted)}] {profile_url} | Dept: {dept}")
-            html = open_publications_journals(driver, profile_url)
-            publications = parse_researcher_profile(html, profile_url)
-            print(f"  parsed {len(publications)} pubs")
-            for row in publications:
-                with open("app/files/temp/UQ_data.csv", mode="a", newline='', encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(row + [dept])  # append department as a separate field
-
-            time.sleep(POLITE_DELAY)
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
\ No newline at end of file
+        def fetch(driver, profile):
+            def render():
+                html = open_publications_journals(driver, profile[0])
+                return html, not needs_browser(html)  # a page still missing publications isn't cached
+            return cached_render(profile[0], render)
+
+        known = load_fingerprints("UQ")
+        # A profile listed under two departments is written for each, and both fingerprint every department it's
+        # listed under, so neither overwrites the other's fingerprint with a different one
+        departments = {}  # profile URL -> its departments
+        for profile_url, dept in profiles_sorted:
+            departments.setdefault(profile_url, []).append(dept)
+        with RowSink("UQ", direct_to_db=direct_to_db) as sink:
+            checkpoint_key = lambda profile: f"{profile[0]} | Dept: {profile[1]}"
+            profiles_sorted = sink.pending(profiles_sorted, key=checkpoint_key)  # leaves out profiles a stopped run already scraped
+            # Profile pages are fetched over HTTP first; only the ones that need scrolling or clicking
+            # go through the browser pool. Either way they are written in profiles_sorted order.
+            http_pages = fetch_many([profile_url for profile_url, _ in profiles_sorted], host_delay=POLITE_DELAY)
+            browser_profiles = [profile for profile, html in zip(profiles_sorted, http_pages) if needs_browser(html)]
+            print(f"Fetched {len(profiles_sorted) - len(browser_profiles)} profiles over HTTP, {len(browser_profiles)} need the browser.")
+            browser_pages = iter(pool.imap(fetch, browser_profiles, url=lambda profile: profile[0]))
+            for i, ((profile_url, dept), html) in enumerate(zip(profiles_sorted, http_pages), 1):
+                print(f"[{i}/{len(profiles_sorted)}] {profile_url} | Dept: {dept}")
+                if needs_browser(html):
+                    html = next(browser_pages)
+                if html is None:
+                    continue
+                publications = parse_researcher_profile(html, profile_url)
+                print(f"  parsed {len(publications)} pubs")
+                fingerprint = profile_fingerprint(publications, *departments[profile_url])
+                if needs_browser(html):
+                    fingerprint = None  # still missing publications after the browser, so they may be incomplete
+                if fingerprint is None or fingerprint != known.get(profile_url):
+                    for row in publications:
+                        sink.write(row + [dept])  # append department as a separate field
+                    sink.fingerprint(profile_url, fingerprint)
+                else:
+                    print("  unchanged since the last scrape")
+                sink.done(checkpoint_key((profile_url, dept)))
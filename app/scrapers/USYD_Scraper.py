@@ -1,12 +1,17 @@
 # app/scrapers/USYD_journals.py
-import csv, re, time
-from typing import List, Tuple
+import re, time
+from typing import List, Optional, Tuple
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import undetected_chromedriver as uc
+from urllib.parse import urljoin
+from bs4 import BeautifulSoup
+from app.scrapers.helpers.crawler import fetch_many
+from app.scrapers.helpers.row_sink import RowSink
+from app.scrapers.helpers.fingerprints import load_fingerprints, profile_fingerprint
 
 
 # URLS 
@@ -189,11 +194,10 @@ def is_empty_title(s: str) -> bool:
 def parse_profile(driver, researcher_name: str, profile_url: str, researcher_role: str, field: str):
 
     """
-    Parse a single profile:
+    Parse a single profile in the browser:
       - open page,
       - expand the 'By Type' tab (#home),
-      - iterate 'li' items,
-      - extract title/year/type/journal/url and return rows for this researcher.
+      - parse the rendered page with parse_profile_html.
     """
     driver.get(profile_url)
     wait_css(driver, "body")
@@ -208,52 +212,83 @@ def parse_profile(driver, researcher_name: str, profile_url: str, researcher_rol
     # expand **By Type** only
     click_expand_all_in_pane(driver, "#home")
 
-    # Only the active "By Type" pane to avoid duplicates from "By Year"
-    items = driver.find_elements(By.CSS_SELECTOR, "#home ul.pubType li")
-    if not items:
+    if not driver.find_elements(By.CSS_SELECTOR, "#home ul.pubType li"):
         time.sleep(0.5)  # some pages hydrate slowly
-        items = driver.find_elements(By.CSS_SELECTOR, "#home ul.pubType li")
+
+    return parse_profile_html(driver.page_source, researcher_name, profile_url, researcher_role, field)
+
+def _pub_type(li) -> str:
+    # section heading: ancestor::tr[1]//p/strong, else preceding::p[strong][1]/strong
+    tr = li.find_parent("tr")
+    strong = tr.select_one("p > strong") if tr is not None else None
+    if strong is None:
+        p = li.find_previous(lambda tag: tag.name == "p" and tag.find("strong", recursive=False) is not None)
+        strong = p.find("strong", recursive=False) if p is not None else None
+    return clean_spaces(strong.get_text()) if strong is not None else ""
+
+def needs_browser(html: Optional[str]) -> bool:
+    """True if a profile fetched over HTTP can't be parsed as is: the fetch failed, the 'By Type' tab (#home)
+    has no publications, or one of its sections is collapsed or came without its publications."""
+    if not html:
+        return True
+    soup = BeautifulSoup(html, "lxml")
+    pane = soup.select_one("#home")
+    if pane is None or not pane.select("ul.pubType li"):
+        return True
+    for toggle in pane.select("[aria-expanded='false'][aria-controls]"):
+        target = soup.find(id=toggle["aria-controls"])
+        if target is None or not target.select("li"):
+            return True
+    headings = pane.find_all(lambda tag: tag.name == "p" and tag.find("strong", recursive=False) is not None)
+    for heading in headings:
+        # a section's items are in the heading's table row, or between it and the next heading
+        tr = heading.find_parent("tr")
+        if tr is not None:
+            if not tr.select("ul.pubType li"):
+                return True
+            continue
+        has_items = False
+        for sibling in heading.find_next_siblings():
+            if sibling in headings:
+                break
+            if sibling.select("ul.pubType li") or (sibling.name == "ul" and "pubType" in (sibling.get("class") or []) and sibling.find("li")):
+                has_items = True
+                break
+        if not has_items:
+            return True
+    return False
+
+def parse_profile_html(html: str, researcher_name: str, profile_url: str, researcher_role: str, field: str):
+    """
+    Parse a profile page (fetched over HTTP, or the browser's page source):
+      - iterate the 'li' items of the 'By Type' tab (#home),
+      - extract title/year/type/journal/url and return rows for this researcher.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    # Only the active "By Type" pane to avoid duplicates from "By Year"
+    items = soup.select("#home ul.pubType li")
 
     results = []
 
     for li in items:
-        raw_text = clean_spaces(li.text)
+        raw_text = clean_spaces(li.get_text())
 
         # pub_type (section heading)
-        try:
-            pub_type = clean_spaces(li.find_element(
-                By.XPATH, "ancestor::tr[1]//p/strong"
-            ).text)
-        except Exception:
-            try:
-                pub_type = clean_spaces(li.find_element(
-                    By.XPATH, "preceding::p[strong][1]/strong"
-                ).text)
-            except Exception:
-                pub_type = ""
+        pub_type = _pub_type(li)
 
         # Year
         m_year = re.search(r"\b(19|20)\d{2}\b", raw_text)
         year = m_year.group(0) if m_year else ""
 
         # DOI / URL
-        article_url = ""
-        for a in li.find_elements(By.CSS_SELECTOR, "a[href]"):
-            href = (a.get_attribute("href") or "").strip()
-            if "doi.org" in href:
-                article_url = href
-                break
+        hrefs = [urljoin(profile_url, a["href"].strip()) for a in li.select("a[href]") if a["href"].strip()]
+        article_url = next((href for href in hrefs if "doi.org" in href), "")
         if not article_url:
             # fallback: any external link that isn't on sydney.edu.au
-            for a in li.find_elements(By.CSS_SELECTOR, "a[href]"):
-                href = (a.get_attribute("href") or "").strip()
-                if href and "sydney.edu.au" not in href:
-                    article_url = href
-                    break
+            article_url = next((href for href in hrefs if "sydney.edu.au" not in href), "")
 
         # emphasis candidates: title/journal/book often italicized
-        em_els = li.find_elements(By.CSS_SELECTOR, "em, i, cite")
-        em_texts = [clean_spaces(e.text) for e in em_els if clean_spaces(e.text)]
+        em_texts = [clean_spaces(e.get_text()) for e in li.select("em, i, cite") if clean_spaces(e.get_text())]
         first_em = em_texts[0] if em_texts else ""
         last_em  = em_texts[-1] if em_texts else ""
 
@@ -302,34 +337,45 @@ def parse_profile(driver, researcher_name: str, profile_url: str, researcher_rol
 
     return results
 
-def scrape_USYD(urls: List[str] = URLS, *, print_names: bool = False) -> List[List[str]]:
-    """Collect and return CSV rows only (no header, no writing)."""
+def scrape_USYD(urls: List[str] = URLS, *, print_names: bool = False, direct_to_db: bool = False):
+    """Scrape every researcher listed on urls into the USYD row sink."""
     d = make_driver()
-    csv_header = ["Title", "Year", "Type", "Journal Name", "Article URL", "Researcher Name", "Profile URL", "Job Title", "Field"]
-    with open("app/files/temp/USYD_data.csv", mode="w", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_header)
-
     try:
-        for url, fields in urls:
-            researchers = get_researchers(d, url)
-            if print_names:
-                print(len(researchers), "researchers found on", url, "\n")
-                for name, _ in researchers:
-                    print(name)
-            for r_name, r_url, r_role in researchers:
-                try:
-                    lines = parse_profile(d, r_name, r_url, r_role, fields)
-                    for i in range(len(lines)):
-                        job_title_split = lines[i][-2].split('\n')
-                        if len(job_title_split) > 1:
-                            lines[i][-2] = job_title_split[0].strip()
-                    with open("app/files/temp/USYD_data.csv", mode="a", newline='', encoding="utf-8") as f:
-                        writer = csv.writer(f)
-                        writer.writerows(lines)  # write all rows for this researcher
-                except Exception as e:
-                    print(f"Failed on {r_name}: {e}")
-                time.sleep(0.25)
+        known = load_fingerprints("USYD")
+        with RowSink("USYD", direct_to_db=direct_to_db) as sink:
+            for url, fields in urls:
+                researchers = get_researchers(d, url)
+                if print_names:
+                    print(len(researchers), "researchers found on", url, "\n")
+                    for name, _ in researchers:
+                        print(name)
+                # Profile pages are fetched over HTTP first; the browser only loads the ones whose
+                # publications didn't all come with the page (see needs_browser)
+                checkpoint_key = lambda researcher: f"{researcher[1]} ({fields})"
+                researchers = sink.pending(researchers, key=checkpoint_key)  # leaves out profiles a stopped run already scraped
+                pages = fetch_many([r_url for _, r_url, _ in researchers])
+                for (r_name, r_url, r_role), html in zip(researchers, pages):
+                    try:
+                        complete = True
+                        if needs_browser(html):
+                            lines = parse_profile(d, r_name, r_url, r_role, fields)
+                            complete = not needs_browser(d.page_source)  # sections may still be collapsed
+                            time.sleep(0.25)
+                        else:
+                            lines = parse_profile_html(html, r_name, r_url, r_role, fields)
+                        for i in range(len(lines)):
+                            job_title_split = lines[i][-2].split('\n')
+                            if len(job_title_split) > 1:
+                                lines[i][-2] = job_title_split[0].strip()
+                        fingerprint = profile_fingerprint(lines) if complete else None
+                        if fingerprint is not None and fingerprint == known.get(r_url):
+                            print(f"Unchanged since the last scrape: {r_name}")
+                        else:
+                            sink.write_many(lines)  # write all rows for this researcher
+                            sink.fingerprint(r_url, fingerprint)
+                        sink.done(checkpoint_key((r_name, r_url, r_role)))
+                    except Exception as e:
+                        print(f"Failed on {r_name}: {e}")
     finally:
         try:
             d.quit()
@@ -1,43 +1,53 @@
-import undetected_chromedriver as uc
+from functools import partial
 import pandas as pd
-import csv
-from app.scrapers.helpers.big3_functions import scrape_publications, find_profile_urls
+from app.scrapers.helpers.big3_functions import scrape_publications, find_listings, make_driver, wait_summary, reset_wait_log
+from app.scrapers.helpers.pure_http import name_from_profile_url
+from app.scrapers.helpers.driver_pool import DriverPool, DRIVER_POOL_SIZE
+from app.scrapers.helpers.row_sink import RowSink
+from app.scrapers.helpers.fingerprints import load_fingerprints
 
-def scrape_UWA():
+def scrape_UWA(headless=False, pool_size=DRIVER_POOL_SIZE, direct_to_db=False):
+    reset_wait_log()
     # Load classification CSV
     df = pd.read_csv("app/files/uploads_current/UWA_staff_field_upload.csv", encoding="latin1")
     field_lookup = dict(zip(df["Name"], df["Field"]))
 
-    options = uc.ChromeOptions()
-    # options.add_argument("--no-sandbox")
-    # options.add_argument("--disable-gpu")
-    # options.add_argument("--window-size=1280,800")
-    # options.add_argument("--lang=en-US,en")
-    # options.add_argument("--headless")  # Uncomment for headless mode
-    driver = uc.Chrome()
-    print("Chrome launched!")
     profiles_url = "https://www.uwa.edu.au/schools/business/accounting-and-finance"
     base = "https://research-repository.uwa.edu.au"
 
-    profile_urls = find_profile_urls(profiles_url, base, driver)
-    print(f"Found {len(profile_urls)} profile URLs")
+    known = load_fingerprints("UWA")
 
-    csv_header = ["Title", "Year", "Type", "Journal Name", "Article URL", "Researcher Name", "Profile URL", "Job Title", "Field"]
-    with open("app/files/temp/UWA_data.csv", mode="w", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_header)
-
-    for profile_url in profile_urls:
+    def scrape(driver, profile_url):
         print(f"Scraping profile: {profile_url}")
-        name, job_title, publications_info = scrape_publications(profile_url, driver)
-        
-        # Lookup field in csv
-        print('Getting fields from "UWA Accounting Finance Staff_YW.csv"')
-        field = field_lookup.get(name, None)
-        print(f"Researcher: {name}, Field: {field}")
-
-        print(f"Found {len(publications_info)} publications in {profile_url}")
-        for line in publications_info:
-            with open("app/files/temp/UWA_data.csv", mode="a", newline='', encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(line + [name, profile_url, job_title, field])  # Append fields
\ No newline at end of file
+        # The field comes from the uploaded staff list, so a new upload changes the fingerprint too
+        field = field_lookup.get(name_from_profile_url(profile_url), None)
+        return scrape_publications(profile_url, driver, known.get(profile_url), details=(field,))
+
+    with DriverPool(partial(make_driver, headless=headless), size=pool_size) as pool:
+        profile_urls = sorted(find_listings(pool, [profiles_url], base)[0])
+        print(f"Found {len(profile_urls)} profile URLs")
+
+        with RowSink("UWA", direct_to_db=direct_to_db) as sink:
+            profile_urls = sink.pending(profile_urls)  # leaves out profiles a stopped run already scraped
+            # Profiles are scraped in parallel but come back, and are written, in profile_urls order
+            for profile_url, result in zip(profile_urls, pool.imap(scrape, profile_urls, url=lambda url: url)):
+                if result is None:
+                    continue
+                name, job_title, publications_info, fingerprint = result
+                if publications_info is None:
+                    print(f"Unchanged since the last scrape: {profile_url}")
+                    sink.done(profile_url)
+                    continue
+
+                # Lookup field in csv
+                print('Getting fields from "UWA Accounting Finance Staff_YW.csv"')
+                field = field_lookup.get(name, None)
+                print(f"Researcher: {name}, Field: {field}")
+
+                print(f"Found {len(publications_info)} publications in {profile_url}")
+                for line in publications_info:
+                    sink.write(line + [name, profile_url, job_title, field])  # Append fields
+                sink.fingerprint(profile_url, fingerprint)
+                sink.done(profile_url)
+
+    print(wait_summary())
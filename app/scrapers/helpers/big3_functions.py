@@ -1,105 +1,197 @@
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+import undetected_chromedriver as uc
 import time
+from bs4 import BeautifulSoup
+from app.scrapers.helpers.pure_http import (
+    NeedsBrowser, find_profile_urls_http, scrape_publications_http, name_from_profile_url,
+    parse_profile_links, parse_job_title, parse_publications,
+)
+from app.scrapers.helpers.fingerprints import profile_fingerprint
+from app.scrapers.helpers.http_cache import cached_render
+
+# "http": fetch pages with plain HTTP and only use the browser for pages that need it; "browser": always Selenium
+FETCH_MODE = "http"
+FETCH_COUNTS = {"http": 0, "browser": 0}  # listings and profiles scraped by each backend in the current scrape
+
+WAIT_TIMEOUT = 20  # max seconds to wait for a page's content before treating it as empty
+LISTING_WAIT_TIMEOUT = 8  # listing pages wait no longer than the fixed sleep they replaced
+PUBLICATION_SELECTOR = "div.rendering_researchoutput_portal-short"
+PERSON_LINK_SELECTOR = "a[href*='/en/persons/']"
+PERSON_HEADER_SELECTOR = "div.header.person-details"  # rendered on a person's profile and publication pages
+# Rendered on every organisation listing page, including the empty one past the last page of people
+LISTING_RENDERED_SELECTOR = "div.header.organisation-details, .empty-results"
+# The fixed sleeps the waits replaced, used to report the time saved
+FIXED_DELAYS = {"listing": 8, "profile": 2, "publications": 10}
+WAIT_LOG = []  # (kind, url, seconds waited, outcome) for every page load in the current scrape (see reset_wait_log)
+LISTING_ATTEMPTS = 3  # tries at a listing page before the scrape fails instead of leaving out everyone it lists
+
+def make_driver(headless=False):
+    """Chrome set up the way the big 3 (Pure portal) scrapers use it."""
+    options = uc.ChromeOptions()
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1280,800")
+    options.add_argument("--lang=en-US,en")
+    if headless:
+        options.add_argument("--headless=new")
+    return uc.Chrome(options=options)
+
+def wait_for_page(driver, kind, url, content_selector, rendered_selector=None, timeout=None):
+    """
+    Waits until content_selector matches ("content"), or until rendered_selector matches without it,
+    meaning the page loaded but has nothing to scrape ("empty"). Gives up after timeout seconds ("timeout").
+    timeout defaults to WAIT_TIMEOUT. Every wait is recorded in WAIT_LOG.
+    """
+    def ready(d):
+        if d.find_elements(By.CSS_SELECTOR, content_selector):
+            return "content"
+        if rendered_selector and d.find_elements(By.CSS_SELECTOR, rendered_selector):
+            return "empty"
+        return False
+
+    start = time.monotonic()
+    try:
+        outcome = WebDriverWait(driver, timeout or WAIT_TIMEOUT, poll_frequency=0.25).until(ready)
+    except TimeoutException:
+        outcome = "timeout"
+    WAIT_LOG.append((kind, url, time.monotonic() - start, outcome))
+    return outcome
+
+def reset_wait_log():
+    """Starts WAIT_LOG and FETCH_COUNTS afresh. Scraper processes are reused across universities, so each scrape calls this first."""
+    WAIT_LOG.clear()
+    for backend in FETCH_COUNTS:
+        FETCH_COUNTS[backend] = 0
+
+def wait_summary():
+    """One line per kind of page: loads, time actually waited, and what the old fixed sleeps would have cost."""
+    totals = {}
+    for kind, _, seconds, outcome in WAIT_LOG:
+        total = totals.setdefault(kind, {"loads": 0, "waited": 0.0, "timeouts": 0})
+        total["loads"] += 1
+        total["waited"] += seconds
+        total["timeouts"] += outcome == "timeout"
+    return "\n".join(
+        f"Waits on {kind} pages: {t['loads']} loads, {t['waited']:.1f}s waited "
+        f"(fixed sleeps: {t['loads'] * FIXED_DELAYS.get(kind, 0)}s), {t['timeouts']} timeouts"
+        for kind, t in totals.items()
+    ) + f"\nFetched over HTTP: {FETCH_COUNTS['http']}, through the browser: {FETCH_COUNTS['browser']}"
 
 def find_profile_urls(page_url, base, driver):
+    """Finds all researcher profile URLs on all paginated pages, over HTTP when possible, else with Selenium."""
+    if FETCH_MODE == "http":
+        try:
+            profile_urls = find_profile_urls_http(page_url, base)
+            FETCH_COUNTS["http"] += 1
+            return profile_urls
+        except NeedsBrowser as e:
+            print(f"Falling back to the browser for {page_url}: {e}")
+    FETCH_COUNTS["browser"] += 1
+    return _find_profile_urls_browser(page_url, base, driver)
+
+def find_listings(pool, listing_urls, base):
+    """
+    The profile URLs on each of listing_urls, found in parallel on a DriverPool, in listing_urls order.
+    A listing whose job failed is retried up to LISTING_ATTEMPTS times in all; if it still fails this raises,
+    since carrying on would drop every researcher it lists.
+    """
+    def find(driver, url):
+        print(f"Finding profile URLs on: {url}")
+        return find_profile_urls(url, base, driver)
+
+    found = pool.map(find, listing_urls, url=lambda url: url)
+    for attempt in range(2, LISTING_ATTEMPTS + 1):
+        failed = [i for i, urls in enumerate(found) if urls is None]
+        if not failed:
+            break
+        print(f"Retrying {len(failed)} listings that failed (attempt {attempt} of {LISTING_ATTEMPTS})")
+        for i, urls in zip(failed, pool.map(find, [listing_urls[i] for i in failed], url=lambda url: url)):
+            found[i] = urls
+    missing = [url for url, urls in zip(listing_urls, found) if urls is None]
+    if missing:
+        raise RuntimeError(f"Failed to load the listings {', '.join(missing)} after {LISTING_ATTEMPTS} attempts")
+    return found
+
+def _rendered_soup(driver, kind, url, content_selector, rendered_selector=None, timeout=None):
+    """
+    (the page as the browser renders it, parsed; wait_for_page's outcome, or "cached").
+    Loads it and waits only when the HTTP response cache doesn't have its page source, so cached pages
+    never start the browser. Pages whose wait timed out aren't cached, so only loaded pages come back "cached".
+    """
+    outcome = "cached"
+
+    def render():
+        nonlocal outcome
+        driver.get(url)
+        outcome = wait_for_page(driver, kind, url, content_selector, rendered_selector, timeout)
+        return driver.page_source, outcome != "timeout"
+    return BeautifulSoup(cached_render(url, render), "lxml"), outcome
+
+def _find_profile_urls_browser(page_url, base, driver):
     """Finds all researcher profile URLs on all paginated pages using Selenium by matching href prefix."""
-    profile_urls = set()
+    profile_urls = []
     page = 0
     while True:
         paged_url = f"{page_url}?page={page}"
-        driver.get(paged_url)
-        time.sleep(8)
-        a_tags = driver.find_elements(By.TAG_NAME, "a")
-        found_on_page = 0
-        for a in a_tags:
-            href = a.get_attribute("href")
-            if href and href.startswith(f"{base}/en/persons/"):
-                if href not in profile_urls:
-                    print(f"Found profile URL: {href}")
-                    profile_urls.add(href)
-                    found_on_page += 1
-        if found_on_page == 0:
+        # The page past the last one renders without person links, which ends the loop
+        soup, _ = _rendered_soup(driver, "listing", paged_url, PERSON_LINK_SELECTOR, LISTING_RENDERED_SELECTOR,
+                                 timeout=min(WAIT_TIMEOUT, LISTING_WAIT_TIMEOUT))
+        links = [u for u in parse_profile_links(soup, paged_url, base) if u not in profile_urls]
+        if not links:
             break
+        for href in links:
+            print(f"Found profile URL: {href}")
+        profile_urls.extend(links)
         page += 1
-    return list(profile_urls)
+    return profile_urls
 
-def scrape_publications(profile_url, driver):
+def scrape_publications(profile_url, driver, known_fingerprint=None, details=()):
     """
-    Finds publication info for a given researcher
-    Returns: (name, job_title, publications_info) where publications_info is a list of [Title, Date, Type, Journal, Article URL]
+    Finds publication info for a given researcher, over HTTP when possible, else with Selenium.
+    Returns: (name, job_title, publications_info, fingerprint) where publications_info is a list of [Title, Date, Type, Journal, Article URL]
+    The fingerprint is taken from the job title, the first publications page (newest first) and any details the
+    caller writes alongside (the field). If it equals known_fingerprint the profile hasn't changed, so the other
+    pages aren't loaded and publications_info is None. The fingerprint is None if a page didn't load, so the
+    publications may be incomplete (see RowSink.fingerprint).
     """
-    driver.get(profile_url)
-    time.sleep(2)
-    # Try to get name robustly
-    try:
-        # Extract name from profile_url, e.g. https://research.monash.edu/en/persons/viet-nga-cao
-        name_part = profile_url.rstrip('/').split('/')[-1]  # 'viet-nga-cao'
-        name = ' '.join(word.capitalize() for word in name_part.split('-'))
-    except Exception:
-        name = ""
-    # Try to get job title
-    try:
-        titles = [e.text.strip() for e in driver.find_elements(By.CSS_SELECTOR, "span.job-title") if e.text.strip()]
-        job_title = " ".join(dict.fromkeys(titles)) if titles else ""
-        if job_title == "":
-            # Try to get <p> under div.header.person-details
-            try:
-                job_title = driver.find_element(
-                    By.CSS_SELECTOR, "div.header.person-details > div.rendering_person_persontitlerendererportal > p"
-                ).text.strip()
-            except Exception:
-                job_title = ""
-    except Exception:
-        # Try to get <p> under div.header.person-details if span.job-title fails
+    if FETCH_MODE == "http":
         try:
-            job_title = driver.find_element(
-                By.CSS_SELECTOR, "div.header.person-details > div.rendering_person_persontitlerendererportal > p"
-            ).text.strip()
-        except Exception:
-            job_title = ""
+            result = scrape_publications_http(profile_url, known_fingerprint, details)
+            FETCH_COUNTS["http"] += 1
+            return result
+        except NeedsBrowser as e:
+            print(f"Falling back to the browser for {profile_url}: {e}")
+    FETCH_COUNTS["browser"] += 1
+    return _scrape_publications_browser(profile_url, driver, known_fingerprint, details)
+
+def _scrape_publications_browser(profile_url, driver, known_fingerprint=None, details=()):
+    soup, outcome = _rendered_soup(driver, "profile", profile_url, PERSON_HEADER_SELECTOR)
+    outcomes = [outcome]
+    # Name from profile_url, e.g. https://research.monash.edu/en/persons/viet-nga-cao
+    name = name_from_profile_url(profile_url)
+    job_title = parse_job_title(soup)
     publications_info = []
     page = 0
     while True:
         if page == 0: page_url = f"{profile_url}/publications/"
         else: page_url = f"{profile_url}/publications/?page={page}"
-        driver.get(page_url)
-        time.sleep(10)
-        publication_divs = driver.find_elements(By.CSS_SELECTOR, "div.rendering_researchoutput_portal-short")
-        if not publication_divs:
+        soup, outcome = _rendered_soup(driver, "publications", page_url, PUBLICATION_SELECTOR, rendered_selector=PERSON_HEADER_SELECTOR)
+        outcomes.append(outcome)
+        found = parse_publications(soup, page_url)
+        if page == 0:
+            fingerprint = profile_fingerprint(found, job_title, *details)
+            if fingerprint == known_fingerprint and "timeout" not in outcomes:
+                return name, job_title, None, fingerprint
+        if not found:
             break
-        for div in publication_divs:
-            # Title and URL (new structure)
-            try:
-                a_tag = div.find_element(By.CSS_SELECTOR, "h3.title a")
-                pub_title = a_tag.find_element(By.CSS_SELECTOR, "span").text.strip()
-                publication_url = a_tag.get_attribute("href")
-            except Exception:
-                pub_title = ""
-                publication_url = ""
-            # Year
-            try:
-                date_span = div.find_element(By.CSS_SELECTOR, "span.date")
-                year = date_span.text.strip()[-4:]
-            except Exception:
-                year = ""
-            # Type
-            try:
-                type_span = div.find_element(By.CSS_SELECTOR, "span.type_classification_parent")
-                type_val = type_span.text.strip()
-                if type_val[-2:] == ' ›':
-                    type_val = type_val[:-2]
-            except Exception:
-                type_val = ""
-            # Journal
-            try:
-                if "Contribution to journal" in type_val:
-                    journal_span = div.find_element(By.CSS_SELECTOR, "span.journal a span")
-                    journal = journal_span.text.strip()[:-1] # Remove trailing full stop
-                else:
-                    journal = ""
-            except Exception:
-                journal = ""
-            publications_info.append([pub_title, year, type_val, journal, publication_url])
-            print(f"Found publication: {pub_title}")
+        for pub in found:
+            print(f"Found publication: {pub[0]}")
+        publications_info.extend(found)
         page += 1
-    return name, job_title, publications_info
\ No newline at end of file
+    # Complete only if every page loaded and the last one rendered without publications (a cached page loaded before)
+    if "timeout" in outcomes or outcomes[-1] not in ("empty", "cached"):
+        print(f"Pages of {profile_url} didn't load; its publications may be incomplete")
+        fingerprint = None
+    return name, job_title, publications_info, fingerprint
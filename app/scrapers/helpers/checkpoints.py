@@ -0,0 +1,130 @@
+import datetime
+import json
+import os
+import shutil
+
+# Checkpoints of a scraper run, so a run that stops part-way can pick up where it left off.
+# run.json names the run in progress; <university>.jsonl is appended to as the run goes:
+#   {"run": run_id}                                   first line, ties the file to the run
+#   {"profile": url, "rows": n, "offset": bytes}      a profile's rows are safely in <university>_data.csv.part
+#                                                     (plus "fingerprints" of profiles scraped in full, if any)
+#   {"complete": true, "rows": n}                     the scrape finished and the CSV was renamed into place
+#   {"written": true}                                 update_all's database stage has all of its rows
+# The whole directory is removed once every university of the run is done.
+# run.json also counts, per university, the attempts of the run it didn't finish.
+CHECKPOINT_DIR = "app/files/temp/checkpoints"
+RUN_MAX_AGE = datetime.timedelta(hours=24)  # an older run is started over rather than resumed
+RUN_MAX_FAILURES = 3  # attempts a university can fail before the run is given up on
+
+
+def _run_path():
+    return os.path.join(CHECKPOINT_DIR, "run.json")
+
+
+def active_run():
+    """The run in progress as {"run_id", "started_at", "universities"}, or None."""
+    try:
+        with open(_run_path(), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def start_run(universities, resume=True):
+    """Resumes the run in progress if it covers the same universities, otherwise starts a new one."""
+    run = active_run()
+    now = datetime.datetime.now()
+    if resume and run is not None and sorted(run["universities"]) == sorted(universities):
+        if now - datetime.datetime.fromisoformat(run["started_at"]) <= RUN_MAX_AGE:
+            print(f"Resuming the scraper run started at {run['started_at']}")
+            return run
+        print(f"The scraper run started at {run['started_at']} is too old to resume, starting over")
+    finish_run()
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    run = {"run_id": now.strftime("%Y%m%d%H%M%S%f"), "started_at": now.isoformat(timespec="seconds"),
+           "universities": list(universities), "failures": {}}
+    _save_run(run)
+    return run
+
+
+def _save_run(run):
+    with open(_run_path(), "w", encoding="utf-8") as f:
+        json.dump(run, f)
+
+
+def record_failures(run, universities):
+    """
+    Counts a failed attempt for each of universities in run.json. Returns True once every one of them has
+    failed RUN_MAX_FAILURES times, when resuming the run again is not worth it.
+    """
+    failures = run.setdefault("failures", {})
+    for university in universities:
+        failures[university] = failures.get(university, 0) + 1
+    _save_run(run)
+    return all(failures[university] >= RUN_MAX_FAILURES for university in universities)
+
+
+def finish_run():
+    shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
+
+
+class Checkpoint:
+    """One university's progress in a run, loaded from its .jsonl file. Entries from another run are ignored."""
+
+    def __init__(self, university, run_id):
+        self.university = university
+        self.run_id = run_id
+        self.path = os.path.join(CHECKPOINT_DIR, f"{university}.jsonl")
+        self.profiles = {}  # profile URL -> rows written for it
+        self.fingerprints = {}  # profile URL -> fingerprint, see RowSink.fingerprint
+        self.offset = 0  # size of the .part file after the last checkpointed profile
+        self.complete = False
+        self.written = False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+        except (FileNotFoundError, ValueError):
+            lines = []
+        if not lines or lines[0].get("run") != run_id:
+            return
+        for entry in lines[1:]:
+            if "profile" in entry:
+                self.profiles[entry["profile"]] = entry["rows"]
+                self.offset = entry["offset"]
+                self.fingerprints.update(entry.get("fingerprints", {}))
+            elif entry.get("complete"):
+                self.complete = True
+            elif entry.get("written"):
+                self.written = True
+
+    @property
+    def rows(self):
+        return sum(self.profiles.values())
+
+    def _append(self, entry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def reset(self):
+        """Starts the university over within the run."""
+        self.profiles, self.fingerprints, self.offset, self.complete, self.written = {}, {}, 0, False, False
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"run": self.run_id}) + "\n")
+
+    def record(self, profile, rows, offset, fingerprints=None):
+        self.profiles[profile] = rows
+        self.offset = offset
+        entry = {"profile": profile, "rows": rows, "offset": offset}
+        if fingerprints:
+            self.fingerprints.update(fingerprints)
+            entry["fingerprints"] = fingerprints
+        self._append(entry)
+
+    def mark_complete(self, rows):
+        self.complete = True
+        self._append({"complete": True, "rows": rows})
+
+    def mark_written(self):
+        self.written = True
+        self._append({"written": True})
@@ -0,0 +1,97 @@
+import re
+from functools import lru_cache
+
+# The job title taxonomy, shared by the scrapers and util.standardize: which job titles a researcher can
+# have, the level each one maps to, which roles are excluded, and how names are cleaned of titles.
+# A university's rows repeat the same few hundred researchers, so the results are cached per distinct value.
+
+CACHE_SIZE = 4096  # distinct (job title, name) pairs and names remembered
+
+# Scientia Professor = normal professor
+# Emiritus = retired
+# Enhanced pattern to match titles in any order (e.g., "Professor Emeritus" or "Emeritus Professor")
+NAME_TITLE_PATTERN = re.compile(
+    r"^(Dr\.?|Associate Professor|Professor|Ms\.?|Mr\.?|Mrs\.?|Lecturer|Prof\.?|EmPr|AsPr"
+    r"|Scientia Professor|Professor Scientia|Emeritus Professor|Professor Emeritus|Emeritus)\s+",
+    re.IGNORECASE
+)
+# Blacklist certain role keywords
+TITLE_BLACKLIST = ["Education-Focused", "Education Focused", "Education Focussed", "Teaching-Focused", "Teaching Focused", "Teaching Focussed"]
+BLACKLIST_PATTERN = re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in TITLE_BLACKLIST) + r')\b', re.IGNORECASE)
+EXCLUDED = "Exclude"  # stored as the job title of researchers with a blacklisted role
+# All possible forms of the expected role names and their canonical mapping
+TITLE_MAP = {
+    "Associate Lecturer": "Associate Lecturer",
+    "Lecturer (A)": "Associate Lecturer",
+    "Lecturer": "Lecturer",
+    "Fellow": "Fellow",
+    "Senior Lecturer": "Senior Lecturer",
+    "Senior Fellow": "Senior Fellow",
+    "Associate Professor": "Associate Professor",
+    "Associate Prof": "Associate Professor",
+    "AsPr": "Associate Professor",
+    "Professor": "Professor",
+    "Prof": "Professor",
+    "Professorial Fellow": "Professorial Fellow",
+    "Professor Emeritus": "Professor Emeritus",
+    "Emeritus Professor": "Professor Emeritus",
+    "Emeritus": "Professor Emeritus"
+}
+# Sorted by length so longer matches take priority
+TITLE_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(t) for t in sorted(TITLE_MAP.keys(), key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+ROLE_LEVEL_MAP = {
+    "Associate Lecturer": "A",
+    "Lecturer": "B",
+    "Fellow": "B",
+    "Senior Lecturer": "C",
+    "Senior Fellow": "C",
+    "Associate Professor": "D",
+    "Professor": "E",
+    "Professorial Fellow": "E",
+    "Professor Emeritus": "E",
+}
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def classify(job_title, name=""):
+    """
+    (title, level, excluded) for a scraped job title. title is the first TITLE_MAP form in the job title,
+    or failing that in the name (some sites only put it there), mapped to its canonical form; None if
+    neither has one. level is its ROLE_LEVEL_MAP level, or None. excluded is True for blacklisted roles.
+    """
+    excluded = bool(job_title and BLACKLIST_PATTERN.search(job_title))
+    match = TITLE_PATTERN.search(job_title or "") or TITLE_PATTERN.search(name or "")
+    if match is None:
+        return None, None, excluded
+    raw = match.group()
+    title = TITLE_MAP.get(raw, raw)  # map to canonical form
+    return title, ROLE_LEVEL_MAP.get(title), excluded
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def clean_name(name):
+    """The researcher's name without the title in front of it."""
+    return NAME_TITLE_PATTERN.sub("", name).strip() if name else name
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def name_without_nickname(name):
+    """e.g. "Robert (Bob) Smith" -> "Robert Smith"."""
+    # Remove anything inside parentheses including the parentheses themselves
+    cleaned_name = re.sub(r"\s*\(.*?\)\s*", " ", name)
+    # Collapse multiple spaces into one, and strip leading/trailing spaces
+    return re.sub(r"\s+", " ", cleaned_name).strip()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def nickname_with_surname(name):
+    """e.g. "Robert (Bob) Smith" -> "Bob Smith". Names without a nickname are returned as they are."""
+    # Look for "(nickname)" using regex
+    match = re.search(r"\((.*?)\)", name)
+    if match:
+        # nickname inside parentheses, last word is the surname
+        return f"{match.group(1).strip()} {name.split()[-1]}"
+    return name
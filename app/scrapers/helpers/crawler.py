@@ -0,0 +1,137 @@
+import asyncio
+import random
+import time
+import urllib.robotparser
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from app.scrapers.helpers.pure_http import HEADERS, HTTP_TIMEOUT, get_session
+from app.scrapers.helpers import http_cache
+
+# asyncio crawler for the pages the scrapers parse with BeautifulSoup.
+# requests stays the HTTP client (no async client is a dependency), so each request runs on an executor
+# thread with its own keep-alive session, while asyncio schedules them within the limits below.
+
+MAX_CONCURRENCY = 16  # requests in flight across all hosts
+MAX_PER_HOST = 4  # requests in flight to one host
+HOST_DELAY = 0.5  # minimum seconds between two requests starting on one host
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0  # seconds before the first retry, doubled for each one after
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RESPECT_ROBOTS = True  # skip URLs robots.txt disallows, and honour its Crawl-delay if longer than HOST_DELAY
+
+
+def _retry_after(response):
+    try:
+        return max(float(response.headers.get("Retry-After", "")), 0.0)
+    except ValueError:
+        return None
+
+
+class _Crawler:
+    """State for one fetch_many call: the executor, the limits, and what each host's robots.txt said."""
+
+    def __init__(self, max_concurrency, max_per_host, host_delay, retries, backoff, respect_robots):
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.max_per_host = max_per_host
+        self.host_delay = host_delay
+        self.retries = retries
+        self.backoff = backoff
+        self.respect_robots = respect_robots
+        self.host_slots = {}  # host -> asyncio.Semaphore(max_per_host)
+        self.host_next_start = {}  # host -> earliest time the next request may start
+        self.robots = {}  # host -> Task resolving to a RobotFileParser, or None if there are no rules
+
+    def _get(self, url):
+        return get_session().get(url, timeout=HTTP_TIMEOUT)
+
+    async def _request(self, url):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._get, url)
+
+    async def _load_robots(self, scheme, host):
+        try:
+            response = await self._request(f"{scheme}://{host}/robots.txt")
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        rules = urllib.robotparser.RobotFileParser()
+        rules.parse(response.text.splitlines())
+        return rules
+
+    async def _robots_for(self, url):
+        parsed = urlparse(url)
+        if parsed.netloc not in self.robots:
+            self.robots[parsed.netloc] = asyncio.ensure_future(self._load_robots(parsed.scheme, parsed.netloc))
+        return await self.robots[parsed.netloc]
+
+    async def _wait_turn(self, host, delay):
+        now = time.monotonic()
+        start = max(now, self.host_next_start.get(host, now))
+        self.host_next_start[host] = start + delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def fetch(self, url):
+        """The page's text, or None if it is disallowed, isn't a 200, or still fails after the retries."""
+        # Cached pages skip the robots check and the host limits, as they don't touch the host
+        cached = http_cache.cached_response(url)
+        if cached is not None and cached.status_code == 200:
+            return cached.text
+        host = urlparse(url).netloc
+        delay = self.host_delay
+        if self.respect_robots:
+            rules = await self._robots_for(url)
+            if rules is not None:
+                if not rules.can_fetch(HEADERS["User-Agent"], url):
+                    print(f"!!! Skipping {url}: disallowed by robots.txt !!!")
+                    return None
+                delay = max(delay, rules.crawl_delay(HEADERS["User-Agent"]) or 0)
+        host_slots = self.host_slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+
+        error = None
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            # Host slot first: a task queued behind a busy host mustn't hold one of the global slots
+            async with host_slots, self.slots:
+                await self._wait_turn(host, delay)
+                try:
+                    response = await self._request(url)
+                except http_cache.CacheMiss as e:
+                    print(f"!!! Not fetching {url}: {e} !!!")
+                    return None
+                except requests.RequestException as e:
+                    error = str(e)
+                else:
+                    if response.status_code == 200:
+                        return response.text
+                    error = f"HTTP {response.status_code}"
+                    if response.status_code not in RETRY_STATUSES:
+                        break
+                    retry_after = _retry_after(response)
+            if attempt < self.retries:
+                # Back off outside the slots so other URLs keep going meanwhile
+                backoff = self.backoff * 2 ** attempt * random.uniform(1, 1.5)
+                await asyncio.sleep(retry_after if retry_after is not None else backoff)
+        print(f"!!! Failed to fetch {url}: {error} !!!")
+        return None
+
+
+async def fetch_many_async(urls, max_concurrency=MAX_CONCURRENCY, max_per_host=MAX_PER_HOST,
+                           host_delay=HOST_DELAY, retries=MAX_RETRIES, backoff=BACKOFF_BASE,
+                           respect_robots=RESPECT_ROBOTS):
+    """Fetches every URL concurrently and returns their texts in the order given, None where a fetch failed."""
+    urls = list(urls)
+    crawler = _Crawler(max_concurrency, max_per_host, host_delay, retries, backoff, respect_robots)
+    try:
+        unique = list(dict.fromkeys(urls))
+        texts = dict(zip(unique, await asyncio.gather(*(crawler.fetch(url) for url in unique))))
+    finally:
+        crawler.executor.shutdown(wait=False)
+    return [texts[url] for url in urls]
+
+
+def fetch_many(urls, **kwargs):
+    """fetch_many_async for the (synchronous) scrapers. Takes the same keyword arguments."""
+    return asyncio.run(fetch_many_async(urls, **kwargs))
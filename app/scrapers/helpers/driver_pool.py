@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+from urllib.parse import urlparse
+from app.scrapers.helpers.http_cache import offline
+
+DRIVER_POOL_SIZE = 3  # browsers per university scraper
+MAX_PER_HOST = 2  # pages loading from one host at the same time, so one browser of the pool always waits its turn
+HOST_DELAY = 1.0  # minimum seconds between two page loads starting on one host
+
+# undetected_chromedriver patches a shared chromedriver binary when a driver starts,
+# so drivers are started one at a time even when the pool grows in parallel
+_DRIVER_START_LOCK = threading.Lock()
+
+
+class _LazyDriver:
+    """Stands in for a pooled driver and only starts the browser when a job first uses it."""
+
+    def __init__(self, pool, slot):
+        self._pool = pool
+        self._slot = slot
+
+    def __getattr__(self, name):
+        return getattr(self._pool._driver(self._slot), name)
+
+
+class DriverPool:
+    """
+    A pool of WebDrivers working through a queue of jobs, one thread per driver.
+    Jobs are fn(driver, item) calls; results come back in the order the items were given,
+    whatever order the browsers finish in. A failed job is printed and returns None,
+    and its driver is replaced in case the browser itself died.
+    Browsers start the first time a job touches its driver, so jobs that never need one
+    (e.g. plain HTTP fetches) never launch Chrome.
+    """
+
+    def __init__(self, make_driver, size=DRIVER_POOL_SIZE, max_per_host=MAX_PER_HOST, host_delay=HOST_DELAY):
+        self.make_driver = make_driver
+        self.size = max(1, size)
+        self.max_per_host = max(1, max_per_host)
+        self.host_delay = host_delay
+        self.drivers = [None] * self.size
+        self._host_lock = threading.Lock()
+        self._host_slots = {}  # host -> BoundedSemaphore(max_per_host)
+        self._host_next_start = {}  # host -> earliest time the next page load may start
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _driver(self, slot):
+        if self.drivers[slot] is None:
+            with _DRIVER_START_LOCK:
+                self.drivers[slot] = self.make_driver()
+        return self.drivers[slot]
+
+    def _discard_driver(self, slot):
+        driver, self.drivers[slot] = self.drivers[slot], None
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def _host_gate(self, url):
+        """Returns the host's semaphore after waiting out the politeness delay for it."""
+        host = urlparse(url).netloc
+        with self._host_lock:
+            slots = self._host_slots.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        slots.acquire()
+        with self._host_lock:
+            now = time.monotonic()
+            start = max(now, self._host_next_start.get(host, now))
+            self._host_next_start[host] = start + self.host_delay
+        if start > now:
+            time.sleep(start - now)
+        return slots
+
+    def _run(self, slot, fn, item, url):
+        # Offline, jobs only read the HTTP response cache, so there's no host to be polite to
+        slots = self._host_gate(url) if url and not offline() else None
+        try:
+            return fn(_LazyDriver(self, slot), item)
+        except Exception as e:
+            print(f"!!! Driver job failed for {url or item}: {e} !!!")
+            self._discard_driver(slot)
+            return None
+        finally:
+            if slots is not None:
+                slots.release()
+
+    def imap(self, fn, items, url=None):
+        """
+        Runs fn(driver, item) for every item across the pool and yields the results in item order.
+        url(item) names the page a job loads, for the per-host limits.
+        """
+        items = list(items)
+        jobs = queue.Queue()
+        for i, item in enumerate(items):
+            jobs.put((i, item))
+        results = {}
+        done = threading.Condition()
+
+        def worker(slot):
+            while True:
+                try:
+                    i, item = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                result = self._run(slot, fn, item, url(item) if url else None)
+                with done:
+                    results[i] = result
+                    done.notify_all()
+
+        threads = [
+            threading.Thread(target=worker, args=(slot,), daemon=True)
+            for slot in range(min(self.size, len(items)))
+        ]
+        for thread in threads:
+            thread.start()
+        for i in range(len(items)):
+            with done:
+                done.wait_for(lambda: i in results)
+                result = results.pop(i)
+            yield result
+        for thread in threads:
+            thread.join()
+
+    def map(self, fn, items, url=None):
+        return list(self.imap(fn, items, url))
+
+    def run(self, fn, url=None):
+        """Runs fn(driver) on one pooled driver, e.g. to walk an index page."""
+        return self._run(0, lambda driver, _: fn(driver), None, url)
+
+    def close(self):
+        for slot in range(self.size):
+            self._discard_driver(slot)
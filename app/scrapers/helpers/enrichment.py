@@ -0,0 +1,105 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import or_
+from app.database import SessionLocal
+from app.models import Publications, Researchers, OpenAlexLookup
+from app.helpers.cache_funcs import bump_data_version, utcnow
+from app.scrapers.helpers.openalex import LOOKUP_WORKERS, institution_id, author_ids, works_by_authors, find_work, search_work
+
+# OpenAlex enrichment, run once a university's rows are in the database instead of inside its scraper,
+# so the browser never waits on the API: publications scraped without a link get their OpenAlex link.
+# find_publication_urls only reads the database, so it can run while the database stage is still
+# writing other universities; apply_publication_urls writes what it found.
+# Publications OpenAlex has no link for are remembered in OpenAlex_Lookups and left out of the next
+# enrichments, until LOOKUP_RETRY_DAYS have passed.
+LOOKUP_RETRY_DAYS = 30
+QUERY_CHUNK_SIZE = 500
+
+
+def _year(year):
+    year = str(year or "")
+    return year if year.isdigit() and len(year) == 4 else None
+
+
+def match_publication_urls(publications, institution_name, clean_name=lambda name: name, workers=LOOKUP_WORKERS):
+    """
+    {publication id: OpenAlex link, or "" if OpenAlex has none} for publications ({researcher name: [(id, title, year), ...]}).
+    Each researcher's publications are matched against their OpenAlex works; the ones that don't match,
+    and those of researchers OpenAlex can't find, get a title search (by the researcher, when OpenAlex
+    knows them). Publications whose search failed are left out. Lookups run on workers threads.
+    """
+    institution = institution_id(institution_name)
+    names = {name: clean_name(name) for name in publications}
+    authors = author_ids(names.values(), workers=workers)
+    works = works_by_authors(authors.values(), workers=workers)
+    urls = {}
+    searches = []
+    for name, pubs in publications.items():
+        author = authors[names[name]]
+        for pub_id, title, year in pubs:
+            work = find_work(works[author], title, _year(year), institution) if author is not None else None
+            if work is not None:
+                urls[pub_id] = work["id"]
+            else:
+                searches.append((pub_id, title, _year(year), author))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        links = pool.map(lambda search: search_work(search[1], search[2], search[3], institution), searches)
+        for (pub_id, _, _, _), link in zip(searches, links):
+            if link is not None:
+                urls[pub_id] = link
+    return urls
+
+
+def find_publication_urls(university, institution_name, clean_name=lambda name: name, workers=LOOKUP_WORKERS):
+    """
+    match_publication_urls for the university's publications in the database without a publication_url,
+    leaving out the ones OpenAlex had no link for within LOOKUP_RETRY_DAYS.
+    """
+    cutoff = utcnow() - datetime.timedelta(days=LOOKUP_RETRY_DAYS)
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Publications.id, Publications.title, Publications.year, Researchers.name)
+            .join(Researchers, Researchers.id == Publications.researcher_id)
+            .filter(Researchers.university == university,
+                    or_(Publications.publication_url.is_(None), Publications.publication_url == ""),
+                    ~Publications.id.in_(db.query(OpenAlexLookup.publication_id).filter(OpenAlexLookup.checked_at >= cutoff)))
+            .all()
+        )
+    finally:
+        db.close()
+    publications = {}
+    for pub_id, title, year, name in rows:
+        publications.setdefault(name, []).append((pub_id, title, year))
+    if not publications:
+        return {}
+    print(f"Looking up {len(rows)} {university} publication links on OpenAlex")
+    return match_publication_urls(publications, institution_name, clean_name, workers)
+
+
+def apply_publication_urls(university, urls):
+    """
+    Writes the links find_publication_urls found and remembers the publications it found none for,
+    and bumps the data version so the site shows the links.
+    """
+    if not urls:
+        print(f"{university}: no publication links found on OpenAlex")
+        return 0
+    links = {pub_id: url for pub_id, url in urls.items() if url}
+    missing = [pub_id for pub_id, url in urls.items() if not url]
+    db = SessionLocal()
+    try:
+        db.bulk_update_mappings(Publications, [{"id": pub_id, "publication_url": url} for pub_id, url in links.items()])
+        for start in range(0, len(missing), QUERY_CHUNK_SIZE):
+            db.query(OpenAlexLookup).filter(
+                OpenAlexLookup.publication_id.in_(missing[start:start + QUERY_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        now = utcnow()
+        db.bulk_insert_mappings(OpenAlexLookup, [{"publication_id": pub_id, "checked_at": now} for pub_id in missing])
+        if links:
+            bump_data_version(db)
+        db.commit()
+        print(f"{university}: {len(links)} publication links filled from OpenAlex, {len(missing)} publications without one")
+        return len(links)
+    finally:
+        db.close()
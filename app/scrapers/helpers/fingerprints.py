@@ -0,0 +1,59 @@
+import datetime
+import hashlib
+from app.database import SessionLocal
+from app.models import ProfileFingerprint, Researchers
+from app.helpers.cache_funcs import utcnow
+
+# Per-profile fingerprints, so a re-scrape can skip profiles whose publications haven't changed.
+# A scraper fingerprints what it sees first (for the Pure portals, the profile's first publications page;
+# elsewhere, the parsed profile page) and compares it with the fingerprint stored when the profile was last
+# scraped in full. The database writer stores fingerprints alongside the rows (see util.apply_fingerprints),
+# so a stored fingerprint always means that profile's publications are in the database.
+INCREMENTAL = True  # False makes every scrape a full one
+FULL_RESCRAPE_DAYS = 30  # older fingerprints are ignored, so each profile still gets a full scrape now and again
+QUERY_CHUNK_SIZE = 500
+
+
+def profile_fingerprint(publications, *details):
+    """
+    "<publication count>:<latest year>:<hash>" of a profile's publication rows ([Title, Year, ...] lists)
+    and any details written alongside them (job title, field).
+    """
+    years = [int(str(pub[1])[-4:]) for pub in publications if str(pub[1])[-4:].isdigit()]
+    content = repr(([str(detail) for detail in details], [[str(value) for value in pub] for pub in publications]))
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+    return f"{len(publications)}:{max(years, default='')}:{digest}"
+
+
+def load_fingerprints(university):
+    """
+    {profile_url: fingerprint} for the university's profiles that were scraped in full within
+    FULL_RESCRAPE_DAYS and still have a researcher in the database. Empty unless INCREMENTAL.
+    """
+    if not INCREMENTAL:
+        return {}
+    cutoff = utcnow() - datetime.timedelta(days=FULL_RESCRAPE_DAYS)
+    db = SessionLocal()
+    try:
+        rows = db.query(ProfileFingerprint.profile_url, ProfileFingerprint.fingerprint).filter(
+            ProfileFingerprint.university == university,
+            ProfileFingerprint.checked_at >= cutoff,
+            ProfileFingerprint.profile_url.in_(db.query(Researchers.profile_url).filter(Researchers.university == university)),
+        )
+        return dict(rows.all())
+    finally:
+        db.close()
+
+
+def store_fingerprints(db, university, fingerprints):
+    """Writes {profile_url: fingerprint} for profiles just scraped in full, replacing older ones. Caller commits."""
+    urls = list(fingerprints)
+    for start in range(0, len(urls), QUERY_CHUNK_SIZE):
+        db.query(ProfileFingerprint).filter(
+            ProfileFingerprint.profile_url.in_(urls[start:start + QUERY_CHUNK_SIZE])
+        ).delete(synchronize_session=False)
+    now = utcnow()
+    db.bulk_insert_mappings(ProfileFingerprint, [
+        {"profile_url": url, "university": university, "fingerprint": fingerprint, "checked_at": now}
+        for url, fingerprint in fingerprints.items()
+    ])
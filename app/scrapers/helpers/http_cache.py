@@ -0,0 +1,202 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from http.client import responses
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Disk cache for the pages and API responses the scrapers fetch, so development runs and re-runs of a failed
+# scrape don't load the same listing and profile pages again. Entries are keyed by URL and the kind of content
+# asked for: HTTP pages (HTML), browser page sources (RENDERED, what the page looks like once its scripts ran)
+# and OpenAlex responses (JSON). One SQLite file holds them all, shared by the scraper processes.
+# Settings are read from the environment so the spawned scraper processes pick them up:
+#   SCRAPER_CACHE=on       entries younger than SCRAPER_CACHE_TTL seconds are served, everything else is fetched
+#   SCRAPER_CACHE=offline  every entry is served however old, and anything not cached fails instead of being
+#                          fetched, for re-running parsers against the pages of an earlier scrape
+#   SCRAPER_CACHE=off      no cache
+# Expired entries stay on disk (for offline runs) until a fresh copy replaces them or the least recently
+# used entries are evicted to keep the file under SCRAPER_CACHE_MAX_BYTES.
+CACHE_MODE = os.environ.get("SCRAPER_CACHE", "on").lower()
+CACHE_PATH = os.environ.get("SCRAPER_CACHE_PATH", "app/files/cache/http_cache.sqlite3")
+CACHE_TTL = float(os.environ.get("SCRAPER_CACHE_TTL", 6 * 60 * 60))
+CACHE_MAX_BYTES = int(os.environ.get("SCRAPER_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+EVICT_EVERY = 100  # stores between two checks of the cache's size, per process
+
+HTML = "text/html"
+RENDERED = "text/html; rendered"
+JSON = "application/json"
+CACHEABLE_STATUSES = {200, 301, 302, 303, 307, 308}  # redirects too, so a cached URL that redirects replays offline
+
+_local = threading.local()
+_store_lock = threading.Lock()
+_stores_since_evict = 0
+
+
+class CacheMiss(requests.ConnectionError):
+    """Offline, and the response isn't in the cache."""
+
+
+def enabled():
+    return CACHE_MODE in ("on", "offline")
+
+
+def offline():
+    return CACHE_MODE == "offline"
+
+
+def _connection():
+    """One connection per thread; WAL lets the scraper processes read while another one writes."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "url TEXT NOT NULL, content_type TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "status INTEGER NOT NULL, headers TEXT NOT NULL, size INTEGER NOT NULL, body BLOB NOT NULL, "
+            "PRIMARY KEY (url, content_type))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        _local.conn = conn
+    return conn
+
+
+def lookup(url, content_type):
+    """(status, headers, body bytes) of the cached response, or None if there isn't one or it has expired."""
+    if not enabled():
+        return None
+    conn = _connection()
+    row = conn.execute(
+        "SELECT stored_at, status, headers, body FROM entries WHERE url = ? AND content_type = ?", (url, content_type)
+    ).fetchone()
+    if row is None:
+        return None
+    stored_at, status, headers, body = row
+    now = time.time()
+    if not offline() and now - stored_at > CACHE_TTL:
+        return None
+    conn.execute("UPDATE entries SET accessed_at = ? WHERE url = ? AND content_type = ?", (now, url, content_type))
+    return status, _parse_headers(headers), zlib.decompress(body)
+
+
+def store(url, content_type, body, status=200, headers=None):
+    """Caches a response body (bytes or text), replacing any older entry for the same URL and content type."""
+    global _stores_since_evict
+    if not enabled() or offline():
+        return
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    compressed = zlib.compress(body)
+    now = time.time()
+    _connection().execute(
+        "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (url, content_type, now, now, status, _format_headers(headers or {}), len(compressed), compressed),
+    )
+    with _store_lock:
+        _stores_since_evict += 1
+        due = _stores_since_evict >= EVICT_EVERY
+        if due:
+            _stores_since_evict = 0
+    if due:
+        evict()
+
+
+def evict(max_bytes=None):
+    """Drops the least recently used entries until the cached bodies fit in max_bytes (CACHE_MAX_BYTES)."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    removed = _connection().execute(
+        "DELETE FROM entries WHERE rowid IN ("
+        "SELECT rowid FROM (SELECT rowid, SUM(size) OVER (ORDER BY accessed_at DESC, rowid DESC) AS kept FROM entries) "
+        "WHERE kept > ?)",
+        (max_bytes,),
+    ).rowcount
+    if removed:
+        print(f"Evicted {removed} responses from the HTTP cache")
+    return removed
+
+
+def cached_response(url, content_type=HTML):
+    """The cached response for url as a requests.Response, or None, without going near the network."""
+    cached = lookup(url, content_type)
+    return _response(url, *cached) if cached is not None else None
+
+
+def cached_render(url, render, content_type=RENDERED):
+    """
+    The page source render() gets by loading url in the browser, from the cache when it has the page.
+    render() returns the page source, or (page source, complete): a page that didn't finish loading
+    (complete is False, e.g. its wait timed out) is returned but not cached, so the next run renders it again.
+    Offline, a page that isn't cached raises CacheMiss instead of being rendered.
+    """
+    cached = lookup(url, content_type)
+    if cached is not None:
+        return cached[2].decode("utf-8")
+    if offline():
+        raise CacheMiss(f"{url} is not in the HTTP cache")
+    html, complete = render(), True
+    if isinstance(html, tuple):
+        html, complete = html
+    if html and complete:
+        store(url, content_type, html)
+    return html
+
+
+def _response(url, status, headers, body, request=None):
+    response = requests.Response()
+    response.status_code = status
+    response.reason = responses.get(status, "")
+    response.headers = headers
+    response.encoding = get_encoding_from_headers(headers)
+    response._content = body
+    response._content_consumed = True
+    response.url = url
+    response.request = request
+    return response
+
+
+def _format_headers(headers):
+    return "\n".join(f"{name}: {value}" for name, value in headers.items())
+
+
+def _parse_headers(text):
+    return CaseInsensitiveDict(line.split(": ", 1) for line in text.splitlines() if ": " in line)
+
+
+class CachingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that answers GET requests from the cache when it can, and caches the 200s and redirects it
+    fetches. Offline, requests that aren't cached raise CacheMiss (a requests.ConnectionError).
+    """
+
+    KEPT_HEADERS = ("Content-Type", "Location")
+
+    def __init__(self, content_type=HTML, rate_limiter=None, **kwargs):
+        self.content_type = content_type
+        self.rate_limiter = rate_limiter  # acquire()d before every request that reaches the network
+        super().__init__(**kwargs)
+
+    def _fetch(self, request, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return super().send(request, **kwargs)
+
+    def send(self, request, **kwargs):
+        if request.method != "GET" or not enabled():
+            return self._fetch(request, **kwargs)
+        cached = lookup(request.url, self.content_type)
+        if cached is not None:
+            response = _response(request.url, *cached, request=request)
+            response.connection = self
+            return response
+        if offline():
+            raise CacheMiss(f"{request.url} is not in the HTTP cache", request=request)
+        response = self._fetch(request, **kwargs)
+        if response.status_code in CACHEABLE_STATUSES:
+            headers = {name: response.headers[name] for name in self.KEPT_HEADERS if name in response.headers}
+            store(request.url, self.content_type, response.content, response.status_code, headers)
+        return response
@@ -0,0 +1,217 @@
+import re
+import hashlib
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Indel
+from app.models import JournalMatchCache
+from app.helpers.cache_funcs import utcnow
+
+# Same processing as fuzzywuzzy.utils.full_process, which match_journals used to rely on
+NON_WORD_PATTERN = re.compile(r"(?ui)\W")
+LATIN1_TABLE = {i: None for i in range(128, 256)}
+CDIST_CHUNK_SIZE = 500
+CACHE_QUERY_CHUNK_SIZE = 500
+
+
+def _full_process(s, force_ascii=False):
+    if force_ascii:
+        s = s.translate(LATIN1_TABLE)
+    return NON_WORD_PATTERN.sub(" ", s).lower().strip()
+
+
+def normalize_journal_name(name):
+    """Normalises an ABDC journal name the way fuzzywuzzy's extractOne processed each choice."""
+    return _full_process(name or "", force_ascii=True)
+
+
+def normalize_query(name):
+    """Normalises a scraped journal name the way fuzzywuzzy's extractOne processed the query (twice)."""
+    return _full_process(_full_process(name or ""), force_ascii=True)
+
+
+def _intr(n):
+    return int(round(n))
+
+
+def _ratio(a, b):
+    # python-Levenshtein's ratio (used by fuzzywuzzy) is the normalised Indel similarity
+    if a == b:
+        return 100
+    if not a or not b:
+        return 0
+    return _intr(100 * Indel.normalized_similarity(a, b))
+
+
+def _token_sort_ratio(a, b):
+    return _ratio(" ".join(sorted(a.split())), " ".join(sorted(b.split())))
+
+
+def _token_set_ratio(a, b):
+    if a == b:
+        return 100
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    sect = " ".join(sorted(tokens_a & tokens_b))
+    combined_a = (sect + " " + " ".join(sorted(tokens_a - tokens_b))).strip()
+    combined_b = (sect + " " + " ".join(sorted(tokens_b - tokens_a))).strip()
+    return max(_ratio(sect, combined_a), _ratio(sect, combined_b), _ratio(combined_a, combined_b))
+
+
+def score(query, choice):
+    """
+    fuzzywuzzy-compatible WRatio for two normalised strings.
+    fuzzywuzzy rounds every component score before weighting it, so the result can differ
+    from RapidFuzz's unrounded WRatio by up to one point.
+    """
+    if not query or not choice:
+        return 0
+    len_ratio = max(len(query), len(choice)) / min(len(query), len(choice))
+    if len_ratio >= 1.5:
+        # Partial comparisons are scaled to at most 90, well below any useful match threshold
+        return _intr(fuzz.WRatio(query, choice))
+    base = _ratio(query, choice)
+    token_sort = _token_sort_ratio(query, choice) * 0.95
+    token_set = _token_set_ratio(query, choice) * 0.95
+    return _intr(max(base, token_sort, token_set))
+
+
+class JournalIndex:
+    """
+    Precomputed lookup over the Journals table for matching scraped journal names.
+    Names are first looked up by their normalised form, then the leftovers are scored
+    against every journal in one batched RapidFuzz cdist call.
+    """
+
+    def __init__(self, journals):
+        # journals: iterable of (id, name) in Journals table order, which decides ties
+        self.ids = []
+        self.names = []
+        self.exact = {}
+        digest = hashlib.sha1()
+        for journal_id, name in journals:
+            norm = normalize_journal_name(name)
+            self.ids.append(journal_id)
+            self.names.append(norm)
+            self.exact.setdefault(norm, journal_id)
+            digest.update(f"{journal_id}\t{name}\n".encode("utf-8"))
+        # Identifies this exact ABDC list (ids, names and order) for the match cache
+        self.version = digest.hexdigest()[:16]
+
+    def match(self, journal_names, threshold=95):
+        """
+        Matches each distinct journal name against the index.
+        Returns {journal_name: (journal_id, score)}; journal_id is None when the best score is below threshold.
+        """
+        results = {}
+        leftovers = {}
+        for name in set(journal_names):
+            norm = normalize_query(name)
+            if norm and norm in self.exact:
+                results[name] = (self.exact[norm], 100)
+            else:
+                leftovers.setdefault(norm, []).append(name)
+
+        queries = list(leftovers)
+        for start in range(0, len(queries), CDIST_CHUNK_SIZE):
+            chunk = queries[start:start + CDIST_CHUNK_SIZE]
+            best = self._best_matches(chunk, threshold)
+            for norm, (journal_id, best_score) in zip(chunk, best):
+                for name in leftovers[norm]:
+                    results[name] = (journal_id, best_score)
+        return results
+
+    def _best_matches(self, queries, threshold):
+        if not self.names:
+            return [(None, 0)] * len(queries)
+        # RapidFuzz scores stay within one point of the rounded score, so this cutoff keeps every candidate
+        scores = process.cdist(
+            queries, self.names, scorer=fuzz.WRatio,
+            score_cutoff=max(threshold - 1, 0), workers=-1
+        )
+        best = []
+        for query, row in zip(queries, scores):
+            best_idx, best_score = None, 0
+            for idx in row.nonzero()[0]:
+                candidate_score = score(query, self.names[idx])
+                if candidate_score > best_score:
+                    best_idx, best_score = idx, candidate_score
+            if best_idx is not None and best_score >= threshold:
+                best.append((self.ids[best_idx], best_score))
+            else:
+                best.append((None, best_score))
+        return best
+
+
+# ------------------------
+# Persistent match cache
+# ------------------------
+def load_cached_matches(db, journal_names, version, threshold=95):
+    """Returns {journal_name: (journal_id, score)} for names already matched against this ABDC version."""
+    names = list(journal_names)
+    cached = {}
+    for start in range(0, len(names), CACHE_QUERY_CHUNK_SIZE):
+        rows = db.query(JournalMatchCache).filter(
+            JournalMatchCache.journal_name.in_(names[start:start + CACHE_QUERY_CHUNK_SIZE]),
+            JournalMatchCache.abdc_version == version,
+            JournalMatchCache.threshold == threshold,
+        )
+        for row in rows:
+            cached[row.journal_name] = (row.journal_id, row.score)
+    return cached
+
+
+def store_matches(db, matches, version, threshold=95):
+    """Writes freshly scored matches to the cache, replacing entries from older ABDC versions. Caller commits."""
+    names = list(matches)
+    for start in range(0, len(names), CACHE_QUERY_CHUNK_SIZE):
+        db.query(JournalMatchCache).filter(
+            JournalMatchCache.journal_name.in_(names[start:start + CACHE_QUERY_CHUNK_SIZE])
+        ).delete(synchronize_session=False)
+    now = utcnow()
+    db.bulk_insert_mappings(JournalMatchCache, [
+        {
+            "journal_name": name,
+            "journal_id": journal_id,
+            "score": match_score,
+            "threshold": threshold,
+            "matched_at": now,
+            "abdc_version": version,
+        }
+        for name, (journal_id, match_score) in matches.items()
+    ])
+
+
+def carry_over_match_cache(db, old_journals, new_journals):
+    """
+    Moves cache entries from the old ABDC list to the new one instead of discarding them all.
+    old_journals/new_journals: (id, name) pairs in table order, as passed to JournalIndex.
+    An entry is kept when its result cannot change under the new list:
+      - a match survives if its journal is still listed and either the match was exact (score 100)
+        or no new journal names were added that could now score higher;
+      - a non-match survives only if no new journal names were added.
+    Everything else is deleted and will be rescored on the next match_journals run. Caller commits.
+    """
+    old_index = JournalIndex(old_journals)
+    new_index = JournalIndex(new_journals)
+    old_names = {journal_id: name for journal_id, name in old_journals}
+    new_ids = {}
+    for journal_id, name in new_journals:
+        new_ids.setdefault(name, journal_id)
+    added = set(new_index.names) - set(old_index.names)
+
+    kept = dropped = 0
+    for entry in db.query(JournalMatchCache).all():
+        carried_id = None
+        keep = entry.abdc_version == old_index.version
+        if keep and entry.journal_id is not None:
+            name = old_names.get(entry.journal_id)
+            keep = name in new_ids and (entry.score == 100 or not added)
+            carried_id = new_ids.get(name)
+        elif keep:
+            keep = not added
+        if keep:
+            entry.journal_id = carried_id
+            entry.abdc_version = new_index.version
+            kept += 1
+        else:
+            db.delete(entry)
+            dropped += 1
+    print(f"Journal match cache: kept {kept} entries, invalidated {dropped}")
@@ -0,0 +1,220 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from urllib3.util.retry import Retry
+from rapidfuzz import fuzz
+import pyalex
+from pyalex import config
+from app.scrapers.helpers.http_cache import CachingAdapter, JSON
+
+# OpenAlex client for the scrapers. pyalex's entity classes are wrapped so their requests go through the
+# HTTP response cache (see http_cache); import Works, Authors and Institutions from here instead of from pyalex.
+# On top of them: institution and author IDs are looked up once per process, and works are fetched
+# per author, up to OR_FILTER_LIMIT authors per query, so a researcher's publications are matched
+# against their works locally instead of with one search per publication. Lookups for many researchers
+# run on LOOKUP_WORKERS threads, all drawing on one rate limit per process.
+
+PYALEX_URL = "https://api.openalex.org"  # the host pyalex builds its URLs with
+OPENALEX_URL = os.environ.get("OPENALEX_URL", PYALEX_URL)  # e.g. the stub in app/scripts/openalex_stub_server.py
+OR_FILTER_LIMIT = 50  # values OpenAlex accepts in one OR filter
+PER_PAGE = 200  # OpenAlex's largest page
+TITLE_MATCH_SCORE = 90  # token_sort_ratio a work's title needs to be taken for a publication
+# OpenAlex's polite pool allows 10 requests a second. The UM scraper and the enrichment stage
+# (see enrichment.py) can be calling it from two processes at once, so each gets half.
+REQUESTS_PER_SECOND = 5
+RETRIES = 3  # on the statuses in pyalex's config.retry_http_codes (429 included), honouring Retry-After
+LOOKUP_WORKERS = 8
+WORK_FIELDS = ["id", "doi", "display_name", "publication_year", "publication_date", "type", "primary_location", "authorships"]
+
+config.email = os.environ.get("OPENALEX_EMAIL", config.email)  # identifies us for the polite pool
+
+_local = threading.local()
+_institution_ids = {}  # name -> short ID or None
+_author_ids = {}  # (name, institution ID) -> short ID or None
+_author_works = {}  # author ID -> [work, ...]
+
+
+class TokenBucket:
+    """Lets requests through at rate a second on average, in bursts of up to capacity. Shared by threads."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+RATE_LIMIT = TokenBucket(REQUESTS_PER_SECOND)
+
+
+def get_session():
+    """One session per thread, retrying the way pyalex's own session does. Cache hits don't count towards RATE_LIMIT."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        retries = Retry(
+            total=max(config.max_retries, RETRIES),
+            backoff_factor=config.retry_backoff_factor,
+            status_forcelist=config.retry_http_codes,
+            allowed_methods={"GET"},
+        )
+        adapter = CachingAdapter(content_type=JSON, rate_limiter=RATE_LIMIT, max_retries=retries)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+    return session
+
+
+class _Cached:
+    def _get_from_url(self, url, session=None):
+        if OPENALEX_URL != PYALEX_URL and url.startswith(PYALEX_URL):
+            url = OPENALEX_URL + url[len(PYALEX_URL):]
+        # Paginators pass a session of their own; every request uses the caching one instead
+        return super()._get_from_url(url, get_session())
+
+
+class Works(_Cached, pyalex.Works):
+    pass
+
+
+class Authors(_Cached, pyalex.Authors):
+    pass
+
+
+class Institutions(_Cached, pyalex.Institutions):
+    pass
+
+
+# ------------------------
+# Lookups
+# ------------------------
+def short_id(openalex_id):
+    """e.g. https://openalex.org/A5023888391 -> 'A5023888391'"""
+    return openalex_id.rstrip("/").split("/")[-1] if openalex_id else None
+
+
+def institution_id(name):
+    """Short ID of the institution OpenAlex finds first for name, or None. Searched once per process."""
+    if name not in _institution_ids:
+        try:
+            insts = Institutions().search(name).get()
+        except Exception as e:
+            print("Institution lookup error:", e)
+            return None  # not remembered, so the next call tries again
+        print(f"{len(insts)} search result(s) found for the institution {name}")
+        _institution_ids[name] = short_id(insts[0]["id"]) if insts else None
+    return _institution_ids[name]
+
+
+def author_id(name, institution=None):
+    """
+    Short ID of the author OpenAlex finds first for name, only among authors affiliated with the
+    institution ID if one is given, or None. Searched once per process.
+    """
+    key = (name, institution)
+    if key not in _author_ids:
+        query = Authors().search(name)
+        if institution:
+            query = query.filter(affiliations={"institution": {"id": institution}})
+        try:
+            auths = query.get()
+        except Exception as e:
+            print("Author lookup error:", e)
+            return None
+        print(f"{len(auths)} search result(s) found for {name}")
+        _author_ids[key] = short_id(auths[0]["id"]) if auths else None
+    return _author_ids[key]
+
+
+def author_ids(names, institution=None, workers=LOOKUP_WORKERS):
+    """{name: author_id(name, institution)} for many names, looked up concurrently."""
+    names = list(dict.fromkeys(names))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(names, pool.map(lambda name: author_id(name, institution), names)))
+
+
+def _fetch_works(batch):
+    fetched = {a: [] for a in batch}
+    query = Works().filter_or(author={"id": batch}).select(WORK_FIELDS)
+    for page in query.paginate(per_page=PER_PAGE, n_max=None):
+        for work in page:
+            authors = {short_id((a.get("author") or {}).get("id")) for a in work.get("authorships") or []}
+            for a in authors & fetched.keys():
+                fetched[a].append(work)
+    _author_works.update(fetched)
+
+
+def works_by_authors(author_ids, workers=LOOKUP_WORKERS):
+    """
+    {author ID: [work, ...]} with every work of each author, restricted to WORK_FIELDS.
+    Authors not fetched before in this process are fetched OR_FILTER_LIMIT at a time, each batch
+    paged through with one cursor on its own thread, and the works are shared out by their authorships.
+    """
+    author_ids = [a for a in dict.fromkeys(author_ids) if a]
+    missing = [a for a in author_ids if a not in _author_works]
+    batches = [missing[start:start + OR_FILTER_LIMIT] for start in range(0, len(missing), OR_FILTER_LIMIT)]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+        list(pool.map(_fetch_works, batches))  # raises the first batch's error, if any
+    return {a: _author_works[a] for a in author_ids}
+
+
+def _normalise_title(title):
+    return " ".join(re.sub(r"[^\w\s]", " ", (title or "").lower()).split())
+
+
+def find_work(works, title, year=None, institution=None):
+    """
+    The work among works whose title matches title best (at least TITLE_MATCH_SCORE), only counting works
+    published in year and with an author at the institution ID when those are given. None if none match.
+    """
+    wanted = _normalise_title(title)
+    best, best_score = None, 0
+    for work in works:
+        if year and str(work.get("publication_year")) != str(year):
+            continue
+        if institution and not any(
+            short_id(inst.get("id")) == institution
+            for authorship in work.get("authorships") or []
+            for inst in authorship.get("institutions") or []
+        ):
+            continue
+        score = fuzz.token_sort_ratio(wanted, _normalise_title(work.get("display_name")))
+        if score >= TITLE_MATCH_SCORE and score > best_score:
+            best, best_score = work, score
+    return best
+
+
+def search_work(title, year=None, author=None, institution=None):
+    """
+    Link of the work OpenAlex's title search ranks first, among works published in year, by the author ID
+    and with an author at the institution ID when those are given. "" if there is none, None if the search fails.
+    """
+    query = Works().search(re.sub(r"[\"'“”‘’:]", "", title))
+    if year:
+        query = query.filter(from_publication_date=f"{year}-01-01", to_publication_date=f"{year}-12-31")
+    if author:
+        query = query.filter(author={"id": author})
+    if institution:
+        query = query.filter(institution={"id": institution})
+    try:
+        results = query.get()
+    except Exception as e:
+        print("Error:", e)
+        return None
+    return f"https://openalex.org/{short_id(results[0]['id'])}" if results else ""
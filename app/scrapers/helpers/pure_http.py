@@ -0,0 +1,165 @@
+import threading
+from urllib.parse import urljoin
+import requests
+from bs4 import BeautifulSoup
+from app.scrapers.helpers.fingerprints import profile_fingerprint
+from app.scrapers.helpers.http_cache import CachingAdapter
+
+# Plain-HTTP backend for the Pure research portals (ANU, Monash, UWA). Pure renders its person,
+# listing and publication pages on the server, so they can be fetched and parsed without a browser.
+# Anything that doesn't look like a rendered Pure page raises NeedsBrowser so the caller can fall back.
+
+HTTP_TIMEOUT = 30
+POOL_MAXSIZE = 8  # keep-alive connections per host per session
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+PUBLICATION_SELECTOR = "div.rendering_researchoutput_portal-short"
+PERSON_HEADER_SELECTOR = "div.header.person-details"
+JOB_TITLE_FALLBACK_SELECTOR = "div.header.person-details > div.rendering_person_persontitlerendererportal > p"
+
+_local = threading.local()
+
+
+class NeedsBrowser(Exception):
+    """The page couldn't be scraped over plain HTTP (blocked, challenge page, or content rendered by JS)."""
+
+
+def get_session():
+    """
+    One keep-alive session per thread, so driver pool threads don't share connection state.
+    Its GETs go through the HTTP response cache (see http_cache).
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        adapter = CachingAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _local.session = session
+    return session
+
+
+def fetch_soup(url):
+    try:
+        response = get_session().get(url, timeout=HTTP_TIMEOUT)
+    except requests.RequestException as e:
+        raise NeedsBrowser(f"request failed: {e}")
+    if response.status_code != 200:
+        # 403/429/503 are how the portals' bot protection answers a plain client
+        raise NeedsBrowser(f"HTTP {response.status_code}")
+    return BeautifulSoup(response.text, "lxml")
+
+
+def _text(el):
+    # Collapse whitespace the way WebElement.text reports rendered text
+    return " ".join(el.get_text().split()) if el is not None else ""
+
+
+# ------------------------
+# Parsers (shared with the browser backend via page_source)
+# ------------------------
+def parse_profile_links(soup, page_url, base):
+    """Absolute person URLs on a listing page, in page order."""
+    links = []
+    for a in soup.find_all("a", href=True):
+        href = urljoin(page_url, a["href"])
+        if href.startswith(f"{base}/en/persons/") and href not in links:
+            links.append(href)
+    return links
+
+
+def name_from_profile_url(profile_url):
+    """e.g. https://research.monash.edu/en/persons/viet-nga-cao -> 'Viet Nga Cao'"""
+    name_part = profile_url.rstrip('/').split('/')[-1]
+    return ' '.join(word.capitalize() for word in name_part.split('-'))
+
+
+def parse_job_title(soup):
+    titles = [_text(e) for e in soup.select("span.job-title") if _text(e)]
+    job_title = " ".join(dict.fromkeys(titles)) if titles else ""
+    if job_title == "":
+        job_title = _text(soup.select_one(JOB_TITLE_FALLBACK_SELECTOR))
+    return job_title
+
+
+def parse_publications(soup, page_url):
+    """[Title, Year, Type, Journal, Article URL] for each publication on a Pure publications page."""
+    publications_info = []
+    for div in soup.select(PUBLICATION_SELECTOR):
+        a_tag = div.select_one("h3.title a")
+        title_span = a_tag.select_one("span") if a_tag else None
+        if title_span is not None:
+            pub_title = _text(title_span)
+            publication_url = urljoin(page_url, a_tag.get("href", ""))
+        else:
+            pub_title = ""
+            publication_url = ""
+        date_span = div.select_one("span.date")
+        year = _text(date_span)[-4:] if date_span else ""
+        type_val = _text(div.select_one("span.type_classification_parent"))
+        if type_val[-2:] == ' ›':
+            type_val = type_val[:-2]
+        journal = ""
+        if "Contribution to journal" in type_val:
+            journal_span = div.select_one("span.journal a span")
+            if journal_span is not None:
+                journal = _text(journal_span)[:-1]  # Remove trailing full stop
+        publications_info.append([pub_title, year, type_val, journal, publication_url])
+    return publications_info
+
+
+# ------------------------
+# HTTP scrapers
+# ------------------------
+def find_profile_urls_http(page_url, base):
+    """Same as big3_functions.find_profile_urls, over HTTP. Raises NeedsBrowser if the first page has no person links."""
+    profile_urls = []
+    page = 0
+    while True:
+        paged_url = f"{page_url}?page={page}"
+        links = [u for u in parse_profile_links(fetch_soup(paged_url), paged_url, base) if u not in profile_urls]
+        if not links:
+            if page == 0:
+                raise NeedsBrowser("no person links on the first listing page")
+            break
+        for href in links:
+            print(f"Found profile URL: {href}")
+        profile_urls.extend(links)
+        page += 1
+    return profile_urls
+
+
+def scrape_publications_http(profile_url, known_fingerprint=None, details=()):
+    """Same as big3_functions.scrape_publications, over HTTP. Raises NeedsBrowser if a page isn't a rendered Pure person page."""
+    soup = fetch_soup(profile_url)
+    if soup.select_one(PERSON_HEADER_SELECTOR) is None:
+        raise NeedsBrowser("no person header on the profile page")
+    name = name_from_profile_url(profile_url)
+    job_title = parse_job_title(soup)
+
+    publications_info = []
+    page = 0
+    while True:
+        page_url = f"{profile_url}/publications/" if page == 0 else f"{profile_url}/publications/?page={page}"
+        soup = fetch_soup(page_url)
+        if soup.select_one(PERSON_HEADER_SELECTOR) is None:
+            raise NeedsBrowser(f"no person header on {page_url}")
+        found = parse_publications(soup, page_url)
+        if page == 0:
+            fingerprint = profile_fingerprint(found, job_title, *details)
+            if fingerprint == known_fingerprint:
+                return name, job_title, None, fingerprint
+        if not found:
+            break
+        for pub in found:
+            print(f"Found publication: {pub[0]}")
+        publications_info.extend(found)
+        page += 1
+    return name, job_title, publications_info, fingerprint
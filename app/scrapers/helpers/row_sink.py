@@ -0,0 +1,221 @@
+import csv
+import json
+import os
+import time
+from app.scrapers.helpers import checkpoints
+
+TEMP_DIR = "app/files/temp"
+CSV_HEADER = ["Title", "Year", "Type", "Journal Name", "Article URL", "Researcher Name", "Profile URL", "Job Title", "Field"]
+FLUSH_EVERY_ROWS = 500
+FLUSH_EVERY_SECONDS = 5.0
+STREAM_BATCH_ROWS = 200  # rows per batch sent to the stream queue
+
+_stream = None  # see stream_to
+
+
+def temp_csv_path(university):
+    return os.path.join(TEMP_DIR, f"{university}_data.csv")
+
+
+def fingerprints_path(university):
+    """JSON {profile_url: fingerprint} of the profiles scraped in full into the university's temp CSV."""
+    return os.path.join(TEMP_DIR, f"{university}_fingerprints.json")
+
+
+def stream_to(row_queue):
+    """
+    Makes every RowSink opened afterwards in this process also send its rows to row_queue, as
+    ("rows", university, [rows in CSV_HEADER order]) batches, ("fingerprints", university, {profile_url: fingerprint})
+    once all of those profiles' rows have been sent, and a final ("end", university, row count).
+    update_all sets this in its scraper processes so the rows reach the database while scraping runs.
+    """
+    global _stream
+    _stream = row_queue
+
+
+def as_csv_row(row):
+    """The row as it reads back from the CSV: None becomes "" and everything else a string."""
+    return ["" if value is None else str(value) for value in row]
+
+
+class RowSink:
+    """
+    Where a scraper's rows go, opened once per scrape and used as a context manager.
+
+    By default rows stream through one open handle into app/files/temp/<university>_data.csv.part,
+    flushed every FLUSH_EVERY_ROWS rows or FLUSH_EVERY_SECONDS, and the file is renamed over
+    <university>_data.csv only when the scrape finishes. If the scraper raises, the previous complete
+    CSV is left untouched and the partial one stays next to it as .part.
+
+    With direct_to_db=True no file is written: the rows are kept and handed to write_to_db on close.
+    With a stream set (see stream_to) rows are also sent on in batches as they come.
+
+    While a scraper run is in progress (see checkpoints.start_run) the CSV sink also checkpoints each
+    profile the scraper reports with done(). If the university stopped part-way through the run, the
+    .part file is cut back to the last checkpoint and appended to, the rows kept are sent to the stream
+    again (the database stage may not have got them), and pending() leaves out the profiles already done.
+
+    Scrapers that skip unchanged profiles (see fingerprints.py) report each profile they scraped in full
+    with fingerprint(), after writing its rows. The fingerprints go to <university>_fingerprints.json
+    next to the CSV, or along with the rows, and tell write_to_db which profiles' publications are complete.
+    """
+
+    def __init__(self, university, header=CSV_HEADER, direct_to_db=False):
+        self.university = university
+        self.header = header
+        self.direct_to_db = direct_to_db
+        self.path = temp_csv_path(university)
+        self.rows_written = 0
+        self.rows = []  # direct_to_db only
+        self._file = None
+        self._writer = None
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._columns = [header.index(column) for column in CSV_HEADER]
+        self._stream = _stream
+        self._batch = []
+        self.fingerprints = {}
+        self._unsent_fingerprints = {}  # stream only
+        self._unchecked_fingerprints = {}  # recorded since the last checkpoint
+        self.checkpoint = None
+        self._checkpointed_rows = 0
+        if direct_to_db:
+            return  # nothing survives a failure to resume from
+        run = checkpoints.active_run()
+        if run is not None and university in run["universities"]:
+            self.checkpoint = checkpoints.Checkpoint(university, run["run_id"])
+        if self.checkpoint is not None and self.checkpoint.profiles and self._resume():
+            return
+        if self.checkpoint is not None:
+            self.checkpoint.reset()
+        self._file = open(self.path + ".part", mode="w", newline='', encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(header)
+
+    def _resume(self):
+        part = self.path + ".part"
+        if not os.path.exists(part) or os.path.getsize(part) < self.checkpoint.offset:
+            print(f"!!! {part} doesn't match the checkpoints, scraping {self.university} from the start !!!")
+            return False
+        self._file = open(part, mode="r+", newline='', encoding="utf-8")
+        self._file.truncate(self.checkpoint.offset)  # drops rows of a profile that was cut off
+        if self._stream is not None:
+            for row in list(csv.reader(self._file))[1:]:
+                self._batch.append(self._db_row(row))
+                if len(self._batch) >= STREAM_BATCH_ROWS:
+                    self._send_batch()
+        self.fingerprints = dict(self.checkpoint.fingerprints)
+        if self._stream is not None:
+            self._unsent_fingerprints = dict(self.fingerprints)
+            self._send_batch()
+        self._file.seek(0, os.SEEK_END)
+        self._writer = csv.writer(self._file)
+        self.rows_written = self._checkpointed_rows = self.checkpoint.rows
+        print(f"Resuming {self.university}: {len(self.checkpoint.profiles)} profiles "
+              f"({self.rows_written} rows) were scraped before the run stopped")
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _db_row(self, row):
+        row = as_csv_row(row)
+        return [row[i] for i in self._columns]
+
+    def _send_batch(self):
+        if self._batch:
+            self._stream.put(("rows", self.university, self._batch))
+            self._batch = []
+        if self._unsent_fingerprints:
+            # Only sent after the rows, so the database stage has each of these profiles in full
+            self._stream.put(("fingerprints", self.university, self._unsent_fingerprints))
+            self._unsent_fingerprints = {}
+
+    def write(self, row):
+        self.rows_written += 1
+        if self._stream is not None:
+            self._batch.append(self._db_row(row))
+            if len(self._batch) >= STREAM_BATCH_ROWS:
+                self._send_batch()  # blocks while the queue is full, which holds back the scraper
+        if self.direct_to_db:
+            self.rows.append(self._db_row(row))
+            return
+        self._writer.writerow(row)
+        self._unflushed += 1
+        if self._unflushed >= FLUSH_EVERY_ROWS or time.monotonic() - self._last_flush >= FLUSH_EVERY_SECONDS:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def pending(self, items, key=lambda item: item):
+        """The items whose profile (key(item), its URL by default) isn't checkpointed as done in this run."""
+        if self.checkpoint is None:
+            return list(items)
+        return [item for item in items if key(item) not in self.checkpoint.profiles]
+
+    def fingerprint(self, profile_url, fingerprint):
+        """
+        Records that every row of profile_url's publications has been written, and the fingerprint they had.
+        A fingerprint of None means the scrape may have missed some of them (a page didn't load, or a section
+        didn't expand): nothing is recorded, so the profile's stored publications are kept and the next run
+        scrapes it in full.
+        """
+        if fingerprint is None:
+            print(f"Incomplete scrape of {profile_url}: its stored publications are kept")
+            return
+        self.fingerprints[profile_url] = fingerprint
+        self._unchecked_fingerprints[profile_url] = fingerprint
+        if self._stream is not None:
+            self._unsent_fingerprints[profile_url] = fingerprint
+
+    def done(self, profile):
+        """Checkpoints profile: every row written since the last checkpoint belongs to it."""
+        if self.checkpoint is None:
+            return
+        self.flush()
+        self.checkpoint.record(profile, self.rows_written - self._checkpointed_rows, os.fstat(self._file.fileno()).st_size,
+                               self._unchecked_fingerprints)
+        self._checkpointed_rows = self.rows_written
+        self._unchecked_fingerprints = {}
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """Publishes the rows: renames the finished CSV into place, or writes them to the database."""
+        if self._stream is not None:
+            self._send_batch()
+            self._stream.put(("end", self.university, self.rows_written))
+        if self.direct_to_db:
+            from app.scrapers.helpers.util import write_to_db  # util imports this module
+            write_to_db(self.university, self.rows, self.fingerprints)
+            self.rows = []
+            return
+        self._file.close()
+        with open(fingerprints_path(self.university) + ".part", mode="w", encoding="utf-8") as f:
+            json.dump(self.fingerprints, f)
+        # The fingerprints go first: a CSV next to an older fingerprints file could lose publications
+        os.replace(fingerprints_path(self.university) + ".part", fingerprints_path(self.university))
+        os.replace(self.path + ".part", self.path)
+        if self.checkpoint is not None:
+            self.checkpoint.mark_complete(self.rows_written)
+        print(f"Wrote {self.rows_written} rows to {self.path}")
+
+    def abort(self):
+        if self._stream is not None:
+            self._send_batch()  # what was scraped before the failure is still worth keeping
+        if self._file is not None:
+            self._file.close()
+            print(f"!!! Scrape failed, kept the last complete {self.path}; partial rows are in {self.path}.part !!!")
+        self.rows = []
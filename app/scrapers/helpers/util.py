@@ -1,53 +1,78 @@
 from app.database import SessionLocal
 from app.models import Researchers, Publications
 import csv
-import re
+import json
 import os
-from app.models import Researchers, Publications, Journals
-from fuzzywuzzy import process
+from app.models import Researchers, Publications, Journals, Researcher_Publication, OpenAlexLookup
+from app.scrapers.helpers.journal_matching import JournalIndex, load_cached_matches, store_matches
+from app.scrapers.helpers.row_sink import CSV_HEADER, temp_csv_path, fingerprints_path
+from app.scrapers.helpers.fingerprints import store_fingerprints
+from app.scrapers.helpers.classifier import classify, clean_name, EXCLUDED
+from app.helpers.stats_funcs import refresh_stats
 import csv
 
+QUERY_CHUNK_SIZE = 500  # ids per IN (...) query
+
+def match_pending(db, index, pending, threshold=95):
+    """
+    Sets journal_id on pending [(pub_id, journal_name, researcher_id)] publications. Caller commits.
+    Returns ({pub_id: (journal_id, researcher_id)} for the matched ones, every name's match, the newly scored names).
+    """
+    # Score each distinct journal name once, and only if it isn't cached for this ABDC list
+    journal_names = {journal_name for _, journal_name, _ in pending}
+    matches = load_cached_matches(db, journal_names, index.version, threshold)
+    unseen = journal_names - matches.keys()
+    scored = index.match(unseen, threshold=threshold)
+    store_matches(db, scored, index.version, threshold)
+    matches.update(scored)
+    updates = []
+    new_journal_ids = {}
+    for pub_id, journal_name, researcher_id in pending:
+        journal_id, _ = matches[journal_name]
+        if journal_id:
+            updates.append({"id": pub_id, "journal_id": journal_id})
+            new_journal_ids[pub_id] = (journal_id, researcher_id)
+    db.bulk_update_mappings(Publications, updates)
+    return new_journal_ids, matches, scored
+
 def match_journals(threshold=95, force=False, university="all"):
     print("Matching Journal Names With ABDC Rankings")
     db = SessionLocal()
     try:
-        journals = db.query(Journals).all()
-        journal_names = [j.name for j in journals]
-        journal_dict = {j.name: j for j in journals}
-        query = db.query(Publications)
-        if university != "all":
-            query = query.join(Researchers).filter(Researchers.university == university)
-        publications = query.all()
-        total = len(publications)
-        print(f"Total publications to process: {total}")
-        progress_bar_len = 40
+        index = JournalIndex(db.query(Journals.id, Journals.name).all())
 
-        # If force=True, reset all Publications.journal_id to None
+        # If force=True, reset all Publications.journal_id to None, remembering the old links
+        # so only publications whose journal actually changes mark their researcher dirty
+        previous = {}
         if force:
             print("Resetting all Publications.journal_id to None")
+            previous = {
+                pub_id: (journal_id, researcher_id)
+                for pub_id, journal_id, researcher_id in db.query(
+                    Publications.id, Publications.journal_id, Publications.researcher_id
+                ).filter(Publications.journal_id.isnot(None))
+            }
             db.query(Publications).update({Publications.journal_id: None})
             db.commit()
 
-        def print_progress(count, total):
-            filled_len = int(progress_bar_len * count // total)
-            bar = '=' * filled_len + '-' * (progress_bar_len - filled_len)
-            print(f"\r[{bar}] {count}/{total}", end='', flush=True)
-
-        for idx, pub in enumerate(publications, 1):
-            if pub.journal_id:
-                print_progress(idx, total)
-                continue
-            if not pub.journal_name:
-                print_progress(idx, total)
-                continue
-            match, score = process.extractOne(pub.journal_name, journal_names)
-            if score >= threshold:
-                matched_journal = journal_dict.get(match)
-                if matched_journal:
-                    pub.journal_id = matched_journal.id
-            print_progress(idx, total)
+        query = db.query(Publications.id, Publications.journal_name, Publications.researcher_id).filter(
+            Publications.journal_id.is_(None), Publications.journal_name.isnot(None)
+        )
+        if university != "all":
+            query = query.join(Researchers).filter(Researchers.university == university)
+        pending = [(pub_id, journal_name, researcher_id) for pub_id, journal_name, researcher_id in query.all() if journal_name]
+        print(f"Total publications to process: {len(pending)}")
+
+        new_journal_ids, matches, scored = match_pending(db, index, pending, threshold)
+
+        dirty = {researcher_id for pub_id, (journal_id, researcher_id) in new_journal_ids.items()
+                 if previous.get(pub_id, (None,))[0] != journal_id}
+        dirty.update(researcher_id for pub_id, (journal_id, researcher_id) in previous.items()
+                     if pub_id not in new_journal_ids)
+        refresh_stats(db, dirty)
         db.commit()
-        print()  # Move to next line after progress bar
+        print(f"Matched {len(new_journal_ids)}/{len(pending)} unmatched publications "
+              f"({len(matches)} distinct journal names, {len(scored)} newly scored)")
     finally:
         db.close()
 
@@ -71,170 +96,329 @@ def match_journals(threshold=95, force=False, university="all"):
 #             return ranks[i]
 #     return None
 
-def write_to_db(university):
+def write_to_db(university, rows=None, fingerprints=None):
+    """
+    Writes a university's scraped rows (lists in CSV_HEADER order) to the database,
+    reading them from its temp CSV unless they are passed in directly.
+    fingerprints ({profile_url: fingerprint}, read from next to the CSV likewise) names the profiles scraped
+    in full: their publications that weren't scraped again are removed (see apply_fingerprints).
+    Profiles skipped as unchanged have no rows, and are left as they are.
+    """
     print(f"Writing {university} data to database")
-    csv_path = f"app/files/temp/{university}_data.csv"
-    all_data = []
-    with open(csv_path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            all_data.append([
-                row["Title"],
-                row["Year"],
-                row["Type"],
-                row["Journal Name"],
-                row["Article URL"],
-                row["Researcher Name"],
-                row["Profile URL"],
-                row["Job Title"],
-                row["Field"]
-            ])
+    if rows is not None:
+        all_data = [list(row) for row in rows]
+    else:
+        all_data = []
+        with open(temp_csv_path(university), newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                all_data.append([row[column] for column in CSV_HEADER])
+        if fingerprints is None and os.path.exists(fingerprints_path(university)):
+            with open(fingerprints_path(university), encoding='utf-8') as f:
+                fingerprints = json.load(f)
 
     standardize(all_data) #standardize adds the Level field at index 9
     db = SessionLocal()
     try:
-        for row in all_data:
+        stats, researcher_ids, _ = write_rows(db, university, all_data)
+        stats["publications_removed"] = 0
+        if fingerprints:
+            stats["publications_removed"], _ = apply_fingerprints(db, university, fingerprints, scraped_titles(all_data))
+
+        # Only this university's researchers (and anyone whose rows were touched) can have changed
+        dirty = set(researcher_ids.values())
+        dirty.update(r_id for (r_id,) in db.query(Researchers.id).filter(Researchers.university == university))
+        refresh_stats(db, dirty)
+        db.commit()
+        print(
+            f"Researchers: {stats['researchers_inserted']} inserted, {stats['researchers_updated']} updated | "
+            f"Publications: {stats['publications_inserted']} inserted, {stats['publications_removed']} removed, "
+            f"{stats['links_inserted']} links added | "
+            f"Rows skipped: {stats['rows_skipped']}"
+        )
+        return stats
+    finally:
+        db.close()
+        print("Completed writing to database")
+
+def write_rows(db, university, all_data):
+    """
+    Inserts/updates the researchers, publications and links for standardized rows. Caller refreshes stats and commits.
+    Returns (stats, {(name, profile_url): researcher_id} for every researcher in the rows, the new publications' mappings).
+    """
+    stats = {
+        "researchers_inserted": 0,
+        "researchers_updated": 0,
+        "publications_inserted": 0,
+        "links_inserted": 0,
+        "rows_skipped": 0,
+    }
 
-            pub_title, year, type_val, journal, publication_url, name, profile_url, job_title, field, job_level = row
-            
-            # Don't add researcher if title is "Exclude"
-            if job_title == "Exclude":
-                continue
+    # Don't add researcher if title is "Exclude"
+    rows = []
+    for row in all_data:
+        if row[7] == "Exclude":
+            stats["rows_skipped"] += 1
+        else:
+            rows.append(row)
 
-            # Don't add researcher if same Name and Profile URL
-            researcher = db.query(Researchers).filter_by(name=name, profile_url=profile_url).first()
-            if not researcher:
-                researcher = Researchers(name=name, university=university, job_title=job_title, profile_url=profile_url, level=job_level, field=field)
+    # Resolve existing researchers by (Name, Profile URL) in one query
+    researcher_keys = {(row[5], row[6]) for row in rows}
+    researchers = {}
+    existing_researchers = (
+        db.query(Researchers.id, Researchers.name, Researchers.profile_url,
+                 Researchers.job_title, Researchers.level, Researchers.field)
+        .filter(Researchers.profile_url.in_({profile_url for _, profile_url in researcher_keys}))
+        .order_by(Researchers.id)
+    )
+    for r in existing_researchers:
+        if (r.name, r.profile_url) in researcher_keys:
+            researchers.setdefault((r.name, r.profile_url), r)
 
-                db.add(researcher)
-                db.commit()
-                db.refresh(researcher)
-            else:
-                # Update existing researcher with job title if it's not empty
-                if researcher.job_title != job_title or researcher.field != field:
-                    researcher.job_title = job_title
-                    researcher.level = job_level
-                    researcher.field = field
+    # The last row seen for a researcher decides their job title, level and field
+    latest = {}
+    for row in rows:
+        latest[(row[5], row[6])] = {"job_title": row[7], "level": row[9], "field": row[8]}
+
+    new_researchers = []
+    updated_researchers = []
+    for key, values in latest.items():
+        existing = researchers.get(key)
+        if existing is None:
+            new_researchers.append({"name": key[0], "profile_url": key[1], "university": university, **values})
+        elif existing.job_title != values["job_title"] or existing.field != values["field"]:
+            updated_researchers.append({"id": existing.id, **values})
+    db.bulk_insert_mappings(Researchers, new_researchers, return_defaults=True)
+    db.bulk_update_mappings(Researchers, updated_researchers)
+    researcher_ids = {key: r.id for key, r in researchers.items()}
+    researcher_ids.update({(r["name"], r["profile_url"]): r["id"] for r in new_researchers})
+    stats["researchers_inserted"] = len(new_researchers)
+    stats["researchers_updated"] = len(updated_researchers)
+
+    # Resolve existing publications by (Title, Researcher) in one query
+    publication_ids = {}
+    existing_publications = (
+        db.query(Publications.id, Publications.title, Publications.researcher_id)
+        .filter(Publications.researcher_id.in_(set(researcher_ids.values())))
+        .order_by(Publications.id)
+    )
+    for p in existing_publications:
+        publication_ids.setdefault((p.title, p.researcher_id), p.id)
+
+    # Don't add publication if same Title and Researcher
+    new_publications = {}
+    touched_publications = set()
+    for row in rows:
+        pub_title, year, type_val, journal, publication_url, name, profile_url = row[:7]
+        key = (pub_title, researcher_ids[(name, profile_url)])
+        if key in publication_ids:
+            touched_publications.add(key)
+            stats["rows_skipped"] += 1
+        elif key in new_publications:
+            stats["rows_skipped"] += 1
+        else:
+            new_publications[key] = {
+                "title": pub_title,
+                "year": year,
+                "publication_type": type_val,
+                "journal_name": journal,
+                "publication_url": publication_url,
+                "researcher_id": key[1],
+            }
+    db.bulk_insert_mappings(Publications, list(new_publications.values()), return_defaults=True)
+    publication_ids.update({key: p["id"] for key, p in new_publications.items()})
+    touched_publications.update(new_publications)
+    stats["publications_inserted"] = len(new_publications)
+
+    # Link researcher and publication (if not already linked)
+    existing_links = set(
+        db.query(Researcher_Publication.c.researcher_id, Researcher_Publication.c.publication_id)
+        .filter(Researcher_Publication.c.researcher_id.in_(set(researcher_ids.values())))
+    )
+    new_links = []
+    for key in touched_publications:
+        link = (key[1], publication_ids[key])
+        if link not in existing_links:
+            new_links.append({"researcher_id": link[0], "publication_id": link[1]})
+    if new_links:
+        db.execute(Researcher_Publication.insert(), new_links)
+    stats["links_inserted"] = len(new_links)
+    return stats, researcher_ids, list(new_publications.values())
+
+def scraped_titles(all_data):
+    """{profile_url: titles} of standardized rows."""
+    titles = {}
+    for row in all_data:
+        titles.setdefault(row[6], set()).add(row[0])
+    return titles
+
+def apply_fingerprints(db, university, fingerprints, titles):
+    """
+    For profiles scraped in full ({profile_url: fingerprint}), removes their researchers' publications that
+    weren't among the titles scraped for them ({profile_url: titles}), then stores the fingerprints.
+    Caller refreshes stats and commits. Returns (publications removed, ids of the researchers who lost some).
+    """
+    # A profile that came back empty is more likely a page that failed to load than a researcher whose
+    # publications all went, so it keeps what it has and no fingerprint, and is scraped in full next time
+    fingerprints = {url: fingerprint for url, fingerprint in fingerprints.items() if titles.get(url)}
+    urls = list(fingerprints)
+    removed = []
+    dirty = set()
+    for start in range(0, len(urls), QUERY_CHUNK_SIZE):
+        publications = (
+            db.query(Publications.id, Publications.title, Researchers.id, Researchers.profile_url)
+            .join(Researchers, Researchers.id == Publications.researcher_id)
+            .filter(Researchers.university == university, Researchers.profile_url.in_(urls[start:start + QUERY_CHUNK_SIZE]))
+        )
+        for pub_id, title, researcher_id, profile_url in publications:
+            if title not in titles[profile_url]:
+                removed.append(pub_id)
+                dirty.add(researcher_id)
+    for start in range(0, len(removed), QUERY_CHUNK_SIZE):
+        chunk = removed[start:start + QUERY_CHUNK_SIZE]
+        db.execute(Researcher_Publication.delete().where(Researcher_Publication.c.publication_id.in_(chunk)))
+        db.query(OpenAlexLookup).filter(OpenAlexLookup.publication_id.in_(chunk)).delete(synchronize_session=False)
+        db.query(Publications).filter(Publications.id.in_(chunk)).delete(synchronize_session=False)
+    store_fingerprints(db, university, fingerprints)
+    return len(removed), dirty
+
+def write_stream(row_queue, match=True, threshold=95, on_end=None):
+    """
+    Database stage of update_all's pipeline. Takes ("rows", university, rows) batches off row_queue until it
+    gets None; each batch is written, its new publications are matched to journals and the stats of the
+    researchers it touched are refreshed, all in one commit, so results show up while scraping is still running.
+    ("end", university, row_count) calls on_end(university, totals). Runs in a single thread, so it stays
+    the only writer to the database.
+    The scrapers block once row_queue is full, so whatever goes wrong here is printed and the queue is still
+    drained until None; if the database can't be opened at all, every batch is counted as failed.
+    """
+    db = None
+    index = None
+    broken = False  # the database couldn't be opened, so batches are only taken off the queue
+    try:
+        db = SessionLocal()
+        index = JournalIndex(db.query(Journals.id, Journals.name).all()) if match else None
+    except Exception as e:
+        broken = True
+        print(f"!!! Database stage failed to start, the scraped rows will be discarded: {e} !!!")
+    totals = {}
+    titles = {}  # university -> {profile_url: titles} of the rows committed so far, for apply_fingerprints
+    failed = {}  # university -> profile URLs with a batch that failed, whose fingerprints are dropped
+
+    def handle(kind, university, payload, total):
+        if kind == "end":
+            # As in write_to_db, the rest of the university's researchers are refreshed once it is all in
+            if not broken:
+                try:
+                    refresh_stats(db, {r_id for (r_id,) in db.query(Researchers.id).filter(Researchers.university == university)})
                     db.commit()
-            # Don't add publication if same Title and Researcher
-            db_publication = db.query(Publications).filter_by(title=pub_title, researcher_id=researcher.id).first()
-            if not db_publication:
-                db_publication = Publications(
-                    title=pub_title,
-                    year=year,
-                    publication_type=type_val,
-                    journal_name=journal,
-                    publication_url=publication_url,
-                    researcher_id=researcher.id
-                )
-                db.add(db_publication)
-                db.commit()
-                db.refresh(db_publication)
-            # Link researcher and publication (if not already linked)
-            if db_publication not in researcher.publication:
-                researcher.publication.append(db_publication)
+                except Exception as e:
+                    db.rollback()
+                    total["batches_failed"] += 1
+                    print(f"!!! Failed to refresh {university} stats: {e} !!!")
+            titles.pop(university, None)
+            failed.pop(university, None)
+            print(
+                f"{university}: {total['rows']} rows written, {total['publications_inserted']} publications inserted, "
+                f"{total['publications_removed']} removed, "
+                f"{total['journals_matched']} matched to journals, {total['batches_failed']} batches failed"
+            )
+            if on_end:
+                try:
+                    on_end(university, total)
+                except Exception as e:
+                    print(f"!!! Failed to finish {university} after writing it: {e} !!!")
+            return
+        if broken:
+            if kind == "rows":
+                total["batches_failed"] += 1
+            return
+        if kind == "fingerprints":
+            # A profile with rows that didn't make it in isn't complete in the database, so it gets no fingerprint
+            dropped = failed.get(university, set()) & payload.keys()
+            if dropped:
+                print(f"!!! Not fingerprinting {len(dropped)} {university} profiles whose rows failed to write !!!")
+                payload = {url: fp for url, fp in payload.items() if url not in dropped}
+            try:
+                removed, dirty = apply_fingerprints(db, university, payload, titles.get(university, {}))
+                refresh_stats(db, dirty)
                 db.commit()
+                total["publications_removed"] += removed
+            except Exception as e:
+                db.rollback()
+                total["batches_failed"] += 1
+                print(f"!!! Failed to apply {len(payload)} {university} fingerprints: {e} !!!")
+            return
+
+        try:
+            all_data = [list(row) for row in payload]
+            standardize(all_data)
+            stats, researcher_ids, new_publications = write_rows(db, university, all_data)
+            matched = {}
+            if index is not None:
+                pending = [(p["id"], p["journal_name"], p["researcher_id"]) for p in new_publications if p["journal_name"]]
+                matched, _, _ = match_pending(db, index, pending, threshold)
+            refresh_stats(db, set(researcher_ids.values()))
+            db.commit()
+            for profile_url, profile_titles in scraped_titles(all_data).items():
+                titles.setdefault(university, {}).setdefault(profile_url, set()).update(profile_titles)
+            total["rows"] += len(payload)
+            total["publications_inserted"] += stats["publications_inserted"]
+            total["journals_matched"] += len(matched)
+        except Exception as e:
+            db.rollback()
+            total["batches_failed"] += 1
+            failed.setdefault(university, set()).update(row[6] for row in payload)
+            print(f"!!! Failed to write a batch of {len(payload)} {university} rows: {e} !!!")
+
+    try:
+        while True:
+            item = row_queue.get()
+            if item is None:
+                break
+            try:
+                kind, university, payload = item
+                total = totals.setdefault(university, {
+                    "rows": 0, "publications_inserted": 0, "publications_removed": 0, "journals_matched": 0, "batches_failed": 0,
+                })
+                handle(kind, university, payload, total)
+            except Exception as e:
+                # Never lets the thread die with scrapers still waiting to put their rows
+                print(f"!!! Database stage failed on a queued message: {e} !!!")
     finally:
-        db.close()
-        print("Completed writing to database")
+        if db is not None:
+            db.close()
 
-# Scientia Professor = normal professor
-# Emiritus = retired
-# 
 def standardize(data):
-    # Enhanced pattern to match titles in any order (e.g., "Professor Emeritus" or "Emeritus Professor")
-    title_pattern = re.compile(
-        r"^(Dr\.?|Associate Professor|Professor|Ms\.?|Mr\.?|Mrs\.?|Lecturer|Prof\.?|EmPr|AsPr"
-        r"|Scientia Professor|Professor Scientia|Emeritus Professor|Professor Emeritus|Emeritus)\s+",
-        re.IGNORECASE
-    )
+    """
+    Standardizes scraped rows (lists in CSV_HEADER order) in place, and inserts each row's Level at index 9.
+    Job titles and names go through the classifier, which caches them per distinct value.
+    """
+    # Check required fields
     for row in data:
-        # Check required fields
         if row[0] == "" or row[2] == "" or row[5] == "" or row[6] == "":
             print(row)
             raise ValueError(f"Missing required field in row: {row}")
 
+    for row in data:
         # Ensure NULL fields are set to None
         for i in [1, 3, 4]:
             if row[i] == "":
                 row[i] = None
 
         # Remove unwanted characters from publication type for big 3 universities
-        if len(row) > 2 and row[2]:
-            type_val = row[2]
-            if type_val[-2:] == ' ›':
-                type_val = type_val[:-2]
-            row[2] = type_val
+        if row[2] and row[2][-2:] == ' ›':
+            row[2] = row[2][:-2]
 
         # Ensure year is numeric & set to integer
         if row[1] and row[1].isnumeric():
             row[1] = int(row[1])
 
-        # Blacklist certain role keywords
-        title_blacklist = ["Education-Focused", "Education Focused", "Education Focussed", "Teaching-Focused", "Teaching Focused", "Teaching Focussed"]
-        blacklist_pattern = re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in title_blacklist) + r')\b', re.IGNORECASE)
-        if row[7] and blacklist_pattern.search(row[7]):
-            row[7] = "Exclude"
-        else:
-            # Ensure role names are expected
-            # Define all possible forms and their canonical mapping
-            title_map = {
-                "Associate Lecturer": "Associate Lecturer",
-                "Lecturer (A)": "Associate Lecturer",
-                "Lecturer": "Lecturer",
-                "Fellow": "Fellow",
-                "Senior Lecturer": "Senior Lecturer",
-                "Senior Fellow": "Senior Fellow",
-                "Associate Professor": "Associate Professor",
-                "Associate Prof": "Associate Professor",
-                "AsPr": "Associate Professor",
-                "Professor": "Professor",
-                "Prof": "Professor",
-                "Professorial Fellow": "Professorial Fellow",
-                "Professor Emeritus": "Professor Emeritus",
-                "Emeritus Professor": "Professor Emeritus",
-                "Emeritus": "Professor Emeritus"
-            }
-            # Sort by length so longer matches take priority
-            titles = sorted(title_map.keys(), key=len, reverse=True)
-            pattern = r"\b(" + "|".join(re.escape(t) for t in titles) + r")\b"
-            match = re.search(pattern, row[7], flags=re.IGNORECASE)
-            if match:
-                raw = match.group()
-                row[7] = title_map.get(raw, raw)  # map to canonical form
-            else:
-                match = re.search(pattern, row[5], flags=re.IGNORECASE)
-                if match:
-                    raw = match.group()
-                    row[7] = title_map.get(raw, raw)
-                else:
-                    row[7] = None
-
-        # Clean researcher name
-        if len(row) > 5 and row[5]:
-            row[5] = title_pattern.sub("", row[5]).strip()
-
+        title, level, excluded = classify(row[7], row[5])
+        row[7] = EXCLUDED if excluded else title
+        row[5] = clean_name(row[5])
         # Add role levels
-        role_level_map = {
-            "Associate Lecturer": "A",
-            "Lecturer": "B",
-            "Fellow": "B",
-            "Senior Lecturer": "C",
-            "Senior Fellow": "C",
-            "Associate Professor": "D",
-            "Professor": "E",
-            "Professorial Fellow": "E",
-            "Professor Emeritus": "E",
-            "Exclude": None
-        }
-        if row[7] is None:
-            role_level = None
-        else:
-            try:
-                role_level = role_level_map[row[7]]
-            except KeyError:
-                role_level = None
-        row.insert(9, role_level)
+        row.insert(9, None if excluded else level)
 
         # TODO: standardize "Type" e.g. journal article, contribution to journal etc. --> journal article
 
@@ -1,87 +1,281 @@
 from app.scrapers.UWA_Scraper import scrape_UWA
 from app.scrapers.MU_Scraper import scrape_MU
 from app.scrapers.ANU_Scraper import scrape_ANU
-from app.scrapers.UNSW_Scraper import scrape_UNSW
+from app.scrapers.UNSW_Scraper import scrape_UNSW, find_UNSW_links
 from app.scrapers.UA_Scraper import scrape_UA
 from app.scrapers.UQ_Scraper import scrape_UQ
 from app.scrapers.UM_Scraper import scrape_UM
 from app.scrapers.USYD_Scraper import scrape_USYD
-from app.scrapers.helpers.util import write_to_db, match_journals
+from app.scrapers.helpers.util import write_to_db, match_journals, write_stream
+from app.scrapers.helpers.row_sink import stream_to
+from app.scrapers.helpers.checkpoints import Checkpoint, RUN_MAX_FAILURES, start_run, finish_run, record_failures
+from app.scrapers.helpers.enrichment import apply_publication_urls
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import io
+import multiprocessing
+import sys
+import threading
 
-def update_all(db=True, match=True, progress_callback=None):
+# Scraped in this order; universities are independent, so they run in parallel
+UNIVERSITY_SCRAPERS = {
+    "UNSW": scrape_UNSW,
+    "UA": scrape_UA,
+    "UQ": scrape_UQ,
+    "UM": scrape_UM,
+    "USYD": scrape_USYD,
+    "UWA": scrape_UWA,
+    "MU": scrape_MU,
+    "ANU": scrape_ANU,
+}
+# Universities whose publication links are looked up on OpenAlex once their rows are in the database
+UNIVERSITY_ENRICHERS = {
+    "UNSW": find_UNSW_links,
+}
+MAX_PARALLEL_SCRAPERS = 4  # each scraper drives its own Chrome instance
+ROW_QUEUE_BATCHES = 32  # row batches waiting for the database before the scrapers are held back
+# Share of a university's progress for each stage; the rest of the bar is the DB write and matching
+STAGE_PROGRESS = {"queued": 0, "scraping": 10, "writing": 80, "matching": 90, "enriching": 95, "done": 100, "failed": 100}
+
+
+class _QueueWriter(io.TextIOBase):
+    """stdout replacement in a pool process: forwards each printed line to the parent through a queue."""
+
+    def __init__(self, university, log_queue):
+        self.university = university
+        self.log_queue = log_queue
+        self.pending = ""
+        self.lock = threading.Lock()  # driver pool threads print concurrently
+
+    def write(self, s):
+        with self.lock:
+            self.pending += s
+            *lines, self.pending = self.pending.split("\n")
+        for line in lines:
+            if line.strip():
+                self.log_queue.put((self.university, "log", line))
+        return len(s)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, ""
+        if pending.strip():
+            self.log_queue.put((self.university, "log", pending))
+
+
+def _run_scraper(university, log_queue, row_queue=None):
+    """
+    Pool process entry point: runs one university's scraper, which writes app/files/temp/<university>_data.csv
+    and, given a row_queue, streams its rows there for the database stage as well.
+    """
+    sys.stdout = _QueueWriter(university, log_queue)
+    stream_to(row_queue)
+    log_queue.put((university, "start", None))
+    try:
+        UNIVERSITY_SCRAPERS[university]()
+    finally:
+        sys.stdout.flush()
+
+
+def enrich(university):
+    """Fills the publication links the university's scraper left for the OpenAlex enrichment stage, if it has one."""
+    if university in UNIVERSITY_ENRICHERS:
+        apply_publication_urls(university, UNIVERSITY_ENRICHERS[university]())
+
+
+def update_all(db=True, match=True, progress_callback=None, max_workers=MAX_PARALLEL_SCRAPERS, resume=True):
     """
-    Runs all university scrapers sequentially and calls a callback function 
-    to report progress after each one.
+    Runs the university scrapers in parallel in a pool of up to max_workers processes, as a pipeline:
+    the scrapers stream their rows through a bounded queue to a database stage in this process, which writes
+    each batch, matches its journals and refreshes its stats as it arrives (see write_stream). That stage
+    is the only writer SQLite ever sees, and a full queue holds the scrapers back instead of growing.
+    progress_callback(progress, scrapers) receives the overall percentage and each university's
+    {"stage", "progress"} after every change.
+
+    Once a university is written, its OpenAlex enrichment (UNIVERSITY_ENRICHERS) looks up publication links
+    on a thread while the other scrapers carry on; the links are written after the database stage finishes.
+
+    Runs are checkpointed (see checkpoints.py): if the last one stopped before every university was done,
+    it is resumed unless resume=False or it is older than RUN_MAX_AGE. Universities it finished are skipped,
+    and the others carry on from the last profile they checkpointed. The checkpoints are cleared once a run
+    gets every university done, or once every university still left has failed RUN_MAX_FAILURES times.
     """
-    scrapers = [
-        update_UNSW,
-        update_UA,
-        update_UQ,
-        update_UM,
-        update_USYD,
-        update_UWA, # Temporarily ignored as requested due to issues
-        update_MU,
-        update_ANU
-    ]
-    total_scrapers = len(scrapers)
-    
+    universities = list(UNIVERSITY_SCRAPERS)
+
     # Handle case where no scrapers are listed
-    if total_scrapers == 0 and progress_callback:
-        progress_callback(100)
+    if not universities:
+        if progress_callback:
+            progress_callback(100, {})
         return
 
-    for i, scraper_func in enumerate(scrapers):
+    status = {university: {"stage": "queued", "progress": 0} for university in universities}
+    status_lock = threading.Lock()
+
+    def set_stage(university, stage, unless=()):
+        with status_lock:
+            if status[university]["stage"] in unless:
+                return
+            status[university] = {"stage": stage, "progress": STAGE_PROGRESS[stage]}
+            snapshot = {u: dict(s) for u, s in status.items()}
+        if progress_callback:
+            overall = int(sum(s["progress"] for s in snapshot.values()) / len(snapshot))
+            progress_callback(overall, snapshot)
+
+    def forward_logs(log_queue):
+        # Re-prints the pool processes' output here, so it reaches whatever stdout the caller captures
+        while True:
+            item = log_queue.get()
+            if item is None:
+                break
+            university, kind, line = item
+            if kind == "start":
+                print(f"--- Running scraper: {university} ---")
+                # Logs can lag behind the database stage on a quick scrape
+                set_stage(university, "scraping", unless=("writing", "enriching", "done", "failed"))
+            else:
+                print(f"[{university}] {line}")
+
+    def written(university, totals):
+        # The database stage has every row of a finished scrape
+        if totals["batches_failed"]:
+            set_stage(university, "failed", unless=("failed",))
+            return
         try:
-            print(f"--- Running scraper: {scraper_func.__name__} ---")
-            scraper_func(db, match)
+            Checkpoint(university, run["run_id"]).mark_written()
+            if university in UNIVERSITY_ENRICHERS:
+                set_stage(university, "enriching", unless=("failed",))
+                enrichments[university] = enrich_pool.submit(UNIVERSITY_ENRICHERS[university])
+            else:
+                set_stage(university, "done", unless=("failed",))
         except Exception as e:
-            # Print error but continue to the next scraper
-            print(f"!!! Error in {scraper_func.__name__}: {e} !!!")
+            # Not checkpointed as written, so it mustn't count as done either
+            print(f"!!! Failed to finish {university} after writing it: {e} !!!")
+            set_stage(university, "failed")
+
+    def apply_enrichments():
+        # Only runs once the database stage has stopped, so it is still the only writer at any time
+        for university, future in enrichments.items():
+            try:
+                apply_publication_urls(university, future.result())
+            except Exception as e:
+                print(f"!!! OpenAlex enrichment failed for {university}: {e} !!!")
+            set_stage(university, "done", unless=("failed",))
+
+    enrichments = {}  # university -> Future of its {publication id: link}
+    enrich_pool = ThreadPoolExecutor(max_workers=max(1, len(UNIVERSITY_ENRICHERS)))
+    run = start_run(universities, resume)
+    to_scrape = []
+    for university in universities:
+        checkpoint = Checkpoint(university, run["run_id"])
+        if not checkpoint.complete:
+            to_scrape.append(university)
+        elif checkpoint.written or not db:
+            print(f"--- {university} was already done in this run, skipping ---")
+            set_stage(university, "done")
+        else:
+            # Scraped before the run stopped, but its rows may not all have reached the database
+            print(f"--- {university} was already scraped in this run, writing its CSV ---")
+            set_stage(university, "writing")
+            write_to_db(university)
+            if match:
+                set_stage(university, "matching")
+                match_journals(university=university)
+            checkpoint.mark_written()
+            if university in UNIVERSITY_ENRICHERS:
+                set_stage(university, "enriching")
+                enrichments[university] = enrich_pool.submit(UNIVERSITY_ENRICHERS[university])
+            else:
+                set_stage(university, "done")
+
+    ctx = multiprocessing.get_context("spawn")  # don't fork the web server's threads into the scrapers
+    with ctx.Manager() as manager:
+        log_queue = manager.Queue()
+        forwarder = threading.Thread(target=forward_logs, args=(log_queue,), daemon=True)
+        forwarder.start()
+        row_queue = None
+        writer = None
+        if db:
+            row_queue = manager.Queue(ROW_QUEUE_BATCHES)
+            writer = threading.Thread(target=write_stream, args=(row_queue, match), kwargs={"on_end": written}, daemon=True)
+            writer.start()
+        try:
+            with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(to_scrape))), mp_context=ctx) as pool:
+                futures = {
+                    pool.submit(_run_scraper, university, log_queue, row_queue): university
+                    for university in to_scrape
+                }
+                for future in as_completed(futures):
+                    university = futures[future]
+                    try:
+                        future.result()
+                        if db:
+                            # Rows may still be queued; the database stage marks the university done
+                            set_stage(university, "writing", unless=("enriching", "done", "failed"))
+                        else:
+                            if match:
+                                set_stage(university, "matching")
+                                match_journals(university=university)
+                            set_stage(university, "done")
+                    except Exception as e:
+                        # Print error but continue with the other scrapers
+                        print(f"!!! Error in update_{university}: {e} !!!")
+                        set_stage(university, "failed")
         finally:
-            # This block is GUARANTEED to run, ensuring progress is always updated.
-            if progress_callback:
-                progress = int(((i + 1) / total_scrapers) * 100)
-                progress_callback(progress)
-
-def update_UWA(db=True, match=True):
-    scrape_UWA()
-    if db: write_to_db("UWA")
-    if match: match_journals(university="UWA")
-
-def update_MU(db=True, match=True):
-    scrape_MU()
-    if db: write_to_db("MU")
-    if match: match_journals(university="MU")
-
-def update_ANU(db=True, match=True):
-    scrape_ANU()
-    if db: write_to_db("ANU")
-    if match: match_journals(university="ANU")
-
-def update_UNSW(db=True, match=True):
-    scrape_UNSW()
-    if db: write_to_db("UNSW")
-    if match: match_journals(university="UNSW")
-
-def update_UA(db=True, match=True):
-    scrape_UA()
-    if db: write_to_db("UA")
-    if match: match_journals(university="UA")
-
-def update_UQ(db=True, match=True):
-    scrape_UQ()
-    if db: write_to_db("UQ")
-    if match: match_journals(university="UQ")
-    
-def update_UM(db=True, match=True):
-    scrape_UM()
-    if db: write_to_db("UM")
-    if match: match_journals(university="UM")
-
-def update_USYD(db=True, match=True):
-    scrape_USYD()
-    if db: write_to_db("USYD")
-    if match: match_journals(university="USYD")
+            if writer is not None:
+                row_queue.put(None)
+                writer.join()
+                for university in universities:
+                    set_stage(university, "done", unless=("queued", "scraping", "enriching", "done", "failed"))
+            apply_enrichments()
+            enrich_pool.shutdown()
+            log_queue.put(None)
+            forwarder.join()
+
+    unfinished = [university for university, s in status.items() if s["stage"] != "done"]
+    if not unfinished:
+        finish_run()
+    elif record_failures(run, unfinished):
+        print(f"!!! {', '.join(unfinished)} failed {RUN_MAX_FAILURES} times; the next update starts a new run !!!")
+        finish_run()
+    else:
+        print("!!! Not every university finished; running the update again resumes this run !!!")
+
+def update_university(university, db=True, match=True, direct=False):
+    """
+    Scrapes one university, then writes it to the database, matches its journals and fills in the
+    publication links its OpenAlex enrichment finds.
+    With direct=True the scraper hands its rows straight to write_to_db instead of going through the temp CSV.
+    """
+    if db and direct:
+        UNIVERSITY_SCRAPERS[university](direct_to_db=True)
+    else:
+        UNIVERSITY_SCRAPERS[university]()
+        if db: write_to_db(university)
+    if match: match_journals(university=university)
+    if db: enrich(university)
+
+def update_UWA(db=True, match=True, direct=False):
+    update_university("UWA", db, match, direct)
+
+def update_MU(db=True, match=True, direct=False):
+    update_university("MU", db, match, direct)
+
+def update_ANU(db=True, match=True, direct=False):
+    update_university("ANU", db, match, direct)
+
+def update_UNSW(db=True, match=True, direct=False):
+    update_university("UNSW", db, match, direct)
+
+def update_UA(db=True, match=True, direct=False):
+    update_university("UA", db, match, direct)
+
+def update_UQ(db=True, match=True, direct=False):
+    update_university("UQ", db, match, direct)
+
+def update_UM(db=True, match=True, direct=False):
+    update_university("UM", db, match, direct)
+
+def update_USYD(db=True, match=True, direct=False):
+    update_university("USYD", db, match, direct)
 
 if __name__ == "__main__":
     update_UNSW()
@@ -1,6 +1,7 @@
 import pandas as pd
 from app.models import Journals
 from app.database import SessionLocal
+from app.helpers.stats_funcs import refresh_stats
 import csv
 import os
 import fnmatch
@@ -89,6 +90,7 @@ def import_jif_csv(jif_csv_path):
                     journal.JIF = jif
                     journal.JIF_5_year = jif_5
                     journal.citation_percentage = citation_pct
+        refresh_stats(session)
         session.commit()
     finally:
         session.close()
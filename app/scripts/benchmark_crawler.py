@@ -0,0 +1,115 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import requests
+from app.scrapers.helpers import http_cache
+from app.scrapers.helpers.crawler import fetch_many
+
+# Benchmarks the asyncio crawler against one-page-at-a-time fetching on a local mock server.
+# Every page answers after LATENCY seconds and every FLAKY_EVERY-th page fails once with a 503,
+# so the runs also show what the retries recover. Two ports stand in for two university hosts.
+# The HTTP cache is off for the benchmark, so every run really fetches and the scrapers' cache is left alone.
+# Run from the project root: python -m app.scripts.benchmark_crawler
+
+LATENCY = 0.1
+FLAKY_EVERY = 10
+PAGES_PER_HOST = 60
+RETRY_BACKOFF = 0.05
+RUNS = [
+    # (label, fetch_many keyword arguments)
+    ("crawler, 1 per host", {"max_per_host": 1, "host_delay": 0}),
+    ("crawler, 4 per host", {"max_per_host": 4, "host_delay": 0}),
+    ("crawler, 8 per host", {"max_per_host": 8, "host_delay": 0}),
+    ("crawler, 8 per host, 0.05s delay", {"max_per_host": 8, "host_delay": 0.05}),
+]
+
+_attempts = {}
+_attempts_lock = threading.Lock()
+
+
+def page_body(path):
+    return f"<html><body><h1>{path}</h1></body></html>"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real sites
+
+    def do_GET(self):
+        if self.path == "/robots.txt":
+            self._reply(200, "User-agent: *\nDisallow: /private/\n")
+            return
+        time.sleep(LATENCY)
+        key = (self.server.server_address[1], self.path)
+        with _attempts_lock:
+            _attempts[key] = _attempts.get(key, 0) + 1
+            first_try = _attempts[key] == 1
+        page = int(self.path.rsplit("/", 1)[-1])
+        if page % FLAKY_EVERY == 0 and first_try:
+            self._reply(503, "busy")
+        else:
+            self._reply(200, page_body(self.path))
+
+    def _reply(self, status, body):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fetch_sequential(urls):
+    """What the scrapers did before: one connection, one page at a time, no retries."""
+    session = requests.Session()
+    texts = []
+    for url in urls:
+        response = session.get(url, timeout=30)
+        texts.append(response.text if response.status_code == 200 else None)
+    return texts
+
+
+def timed(label, fetch, urls, expected):
+    with _attempts_lock:
+        _attempts.clear()
+    start = time.perf_counter()
+    texts = fetch(urls)
+    elapsed = time.perf_counter() - start
+    ok = sum(text == body for text, body in zip(texts, expected))
+    print(f"{label:<34} {elapsed:>7.2f}s {len(urls) / elapsed:>9.1f} {ok:>5}/{len(urls)}")
+    return elapsed
+
+
+def main():
+    http_cache.CACHE_MODE = "off"
+    servers = [start_server() for _ in range(2)]
+    try:
+        urls = [
+            f"http://127.0.0.1:{server.server_address[1]}/profile/{page}"
+            for page in range(1, PAGES_PER_HOST + 1)
+            for server in servers
+        ]
+        expected = [page_body("/profile/" + url.rsplit("/", 1)[-1]) for url in urls]
+        print(f"{len(urls)} pages over 2 hosts, {LATENCY * 1000:.0f}ms per response, "
+              f"every {FLAKY_EVERY}th page fails once with a 503")
+        print(f"{'':<34} {'time':>8} {'pages/s':>9} {'ok':>11}")
+        baseline = timed("sequential (before)", fetch_sequential, urls, expected)
+        for label, kwargs in RUNS:
+            elapsed = timed(label, lambda u: fetch_many(u, backoff=RETRY_BACKOFF, **kwargs), urls, expected)
+            print(f"{'':<34} {baseline / elapsed:>7.1f}x faster than sequential")
+    finally:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
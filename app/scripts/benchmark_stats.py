@@ -0,0 +1,81 @@
+import random
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Researchers, Publications, Journals
+from app.helpers.stats_funcs import researcher_stats, university_stats
+
+# Benchmarks the grouped stats queries against synthetic in-memory databases of increasing size.
+# Run from the project root: python -m app.scripts.benchmark_stats
+
+UNIVERSITIES = ["ANU", "MU", "UA", "UM", "UNSW", "UQ", "USYD", "UWA"]
+NUM_JOURNALS = 2700
+PUBLICATIONS_PER_RESEARCHER = 25
+SIZES = [10_000, 50_000, 100_000, 200_000]
+
+
+def build_session(num_publications, seed=0):
+    rng = random.Random(seed)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.bulk_insert_mappings(Journals, [
+        {
+            "id": i,
+            "name": f"Journal {i}",
+            "abdc_rank": rng.choice(["A*", "A", "B", "C"]),
+            "JIF": round(rng.uniform(0, 15), 2) if rng.random() < 0.6 else None,
+            "JIF_5_year": round(rng.uniform(0, 15), 2) if rng.random() < 0.6 else None,
+            "citation_percentage": round(rng.uniform(0, 100), 2) if rng.random() < 0.6 else None,
+        }
+        for i in range(1, NUM_JOURNALS + 1)
+    ])
+    num_researchers = max(1, num_publications // PUBLICATIONS_PER_RESEARCHER)
+    db.bulk_insert_mappings(Researchers, [
+        {
+            "id": i,
+            "name": f"Researcher {i}",
+            "university": rng.choice(UNIVERSITIES),
+            "level": rng.choice("ABCDE"),
+            "field": rng.choice(["Accounting", "Finance", None]),
+        }
+        for i in range(1, num_researchers + 1)
+    ])
+    db.bulk_insert_mappings(Publications, [
+        {
+            "id": i,
+            "title": f"Publication {i}",
+            "researcher_id": rng.randint(1, num_researchers),
+            "journal_id": rng.randint(1, NUM_JOURNALS) if rng.random() < 0.6 else None,
+        }
+        for i in range(1, num_publications + 1)
+    ])
+    db.commit()
+    return db
+
+
+def time_call(func, db, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(db)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'publications':>12} {'researchers':>12} {'researcher_stats':>17} {'university_stats':>17}")
+    for size in SIZES:
+        db = build_session(size)
+        try:
+            researchers = db.query(Researchers).count()
+            r_time = time_call(researcher_stats, db)
+            u_time = time_call(university_stats, db)
+            print(f"{size:>12} {researchers:>12} {r_time * 1000:>15.1f}ms {u_time * 1000:>15.1f}ms")
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
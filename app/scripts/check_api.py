@@ -0,0 +1,76 @@
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from urllib.error import HTTPError
+import uvicorn
+
+# Checks the JSON API's conditional responses against the database DB_URL points at,
+# with the app served by uvicorn on a free local port.
+# Run from the project root: python -m app.scripts.check_api
+
+MISSING_RESEARCHER_ID = 10 ** 9
+
+
+def start_server():
+    from app.main import app  # imported here, so DB_URL is read when the check runs
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def get(url, headers=None):
+    """(status, headers) of a GET."""
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+            return response.status, response.headers
+    except HTTPError as e:
+        return e.code, e.headers
+
+
+def check(base):
+    from app.database import SessionLocal
+    from app.models import Researchers
+    db = SessionLocal()
+    try:
+        researcher_id = db.query(Researchers.id).order_by(Researchers.id).limit(1).scalar()
+    finally:
+        db.close()
+    failures = 0
+
+    def expect(label, actual, expected):
+        nonlocal failures
+        ok = actual == expected
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}: {label}" + ("" if ok else f"\n  expected {expected!r}\n  got      {actual!r}"))
+
+    status, headers = get(f"{base}/api/researchers")
+    etag = headers.get("ETag")
+    expect("the researcher list is tagged with the data version", (status, etag is not None), (200, True))
+    expect("an unchanged researcher list is answered with 304",
+           get(f"{base}/api/researchers", {"If-None-Match": etag})[0], 304)
+    if researcher_id is not None:
+        expect("a researcher's profile", get(f"{base}/api/researchers/{researcher_id}")[0], 200)
+        expect("an unchanged profile is answered with 304",
+               get(f"{base}/api/researchers/{researcher_id}", {"If-None-Match": etag})[0], 304)
+    expect("a researcher that doesn't exist is 404", get(f"{base}/api/researchers/{MISSING_RESEARCHER_ID}")[0], 404)
+    expect("even with the current ETag",
+           get(f"{base}/api/researchers/{MISSING_RESEARCHER_ID}", {"If-None-Match": etag})[0], 404)
+    expect("or If-None-Match: *", get(f"{base}/api/researchers/{MISSING_RESEARCHER_ID}", {"If-None-Match": "*"})[0], 404)
+    return failures
+
+
+if __name__ == "__main__":
+    server, base = start_server()
+    try:
+        failures = check(base)
+    finally:
+        server.should_exit = True
+    print("All API checks passed" if not failures else f"{failures} API checks failed")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,93 @@
+import csv
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from app.scrapers.helpers.row_sink import CSV_HEADER
+from app.scrapers.helpers.util import standardize
+
+# Golden check for util.standardize over the scraped CSVs in app/files/temp.
+# standardize_golden.json holds, per CSV, a hash of every standardized row and what each distinct
+# (job title, name) pair became, so a change to standardize that alters its output shows up here.
+# Run from the project root:
+#   python -m app.scripts.check_standardize           # compare against the golden file
+#   python -m app.scripts.check_standardize --update  # rewrite it (only when the output is meant to change)
+
+CSV_GLOB = "app/files/temp/*_data.csv"
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "standardize_golden.json")
+# (job title, name) pairs the CSVs may not have, checked alongside them
+EDGE_CASES = [
+    ("", "Professor Jane Doe"), ("professor", "Jane Doe"), ("Senior Lecturer in Finance", "Dr. Jane Doe"),
+    ("Lecturer (A)", "Ms Jane Doe"), ("Associate Prof", "Jane Doe"), ("Teaching-Focused Lecturer", "Dr Jane Doe"),
+    ("Education focussed Professor", "Jane Doe"), ("Honorary", "Emeritus Professor Jane Doe"),
+    ("Professorial Fellow", "Scientia Professor Jane Doe"), ("Research Fellow", "AsPr Jane Doe"), ("", "Jane Doe"),
+    # Researchers are identified by (name, profile URL), so these prefixes stay in the stored name
+    ("Adjunct Professor", "Adjunct Professor Jane Doe"), ("Associate Professor", "A/Prof Jane Doe"),
+]
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [[row[column] for column in CSV_HEADER] for row in csv.DictReader(f)]
+
+
+def edge_rows():
+    return [["Title", "2020", "Journal Article ›", "", "", name, "https://example.org", job_title, "Finance"]
+            for job_title, name in EDGE_CASES]
+
+
+def summarise(rows):
+    """{"rows", "sha256", "researchers"} for rows, read from a CSV and standardized."""
+    raw = [(row[7], row[5]) for row in rows]
+    start = time.perf_counter()
+    standardize(rows)
+    seconds = time.perf_counter() - start
+    researchers = {}
+    for (job_title, name), row in zip(raw, rows):
+        researchers[f"{job_title}\t{name}"] = [row[7], row[9], row[5]]
+    digest = hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return {"rows": len(rows), "sha256": digest, "researchers": researchers}, seconds
+
+
+def main(update=False):
+    summaries = {}
+    total_rows, total_seconds = 0, 0.0
+    for path in sorted(glob.glob(CSV_GLOB)):
+        summary, seconds = summarise(read_rows(path))
+        summaries[os.path.basename(path)] = summary
+        total_rows += summary["rows"]
+        total_seconds += seconds
+    print(f"Standardized {total_rows} rows from {len(summaries)} CSVs in {total_seconds * 1000:.1f}ms")
+    summaries["edge cases"], _ = summarise(edge_rows())
+
+    if update:
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print(f"Wrote {GOLDEN_PATH}")
+        return 0
+
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        golden = json.load(f)
+    failures = 0
+    for name in sorted(golden.keys() | summaries.keys()):
+        expected, actual = golden.get(name), summaries.get(name)
+        if expected is None or actual is None:
+            failures += 1
+            print(f"FAIL: {name} is {'not in the golden file' if expected is None else 'missing'}")
+            continue
+        ok = expected["sha256"] == actual["sha256"]
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}: {name} ({actual['rows']} rows)")
+        if not ok:
+            for key in sorted(expected["researchers"].keys() | actual["researchers"].keys()):
+                before, after = expected["researchers"].get(key), actual["researchers"].get(key)
+                if before != after:
+                    print(f"  {key!r}: expected {before!r}, got {after!r}")
+    print("All standardize checks passed" if not failures else f"{failures} standardize checks failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(update="--update" in sys.argv))
@@ -0,0 +1,77 @@
+import sys
+from app.database import SessionLocal
+from app.models import Researchers, Publications, Journals
+from app.helpers.stats_funcs import researcher_stats, university_stats
+
+# Checks the grouped stats queries against the ranking pages' original get_researcher_data and
+# get_university_data, which computed every stat in Python, over the database DB_URL points at.
+# Run from the project root: python -m app.scripts.check_stats
+
+PARTIAL_SAMPLE = 50  # researchers recomputed on their own, as a partial refresh does
+
+
+def baseline_stats(db):
+    """({researcher id: stats}, {university: stats}) the way the original ranking pages computed them."""
+    researchers = db.query(Researchers).all()
+    journals = {j.id: j for j in db.query(Journals).all()}
+    by_id = {r.id: r for r in researchers}
+    pubs_by_researcher = {}
+    jifs = {}  # university -> ([JIF], [5-year JIF])
+    for pub in db.query(Publications).all():
+        pubs_by_researcher.setdefault(pub.researcher_id, []).append(pub)
+        journal = journals.get(pub.journal_id)
+        if journal and pub.researcher_id in by_id:
+            jif_list, jif5_list = jifs.setdefault(by_id[pub.researcher_id].university or "Unknown", ([], []))
+            if journal.JIF is not None:
+                jif_list.append(journal.JIF)
+            if journal.JIF_5_year is not None:
+                jif5_list.append(journal.JIF_5_year)
+
+    def average(values):
+        return round(sum(values)/len(values), 2) if values else 0
+
+    researcher_rows = {}
+    for r in researchers:
+        found = [journals[p.journal_id] for p in pubs_by_researcher.get(r.id, []) if p.journal_id in journals]
+        researcher_rows[r.id] = (
+            r.id, r.name, r.field, r.level, r.university, len(pubs_by_researcher.get(r.id, [])),
+            sum(j.abdc_rank in ["A*", "A"] for j in found),
+            average([j.JIF for j in found if j.JIF is not None]),
+            average([j.JIF_5_year for j in found if j.JIF_5_year is not None]),
+            average([j.citation_percentage for j in found if j.citation_percentage is not None]),
+        )
+    university_rows = {uni: (average(jif_list), average(jif5_list)) for uni, (jif_list, jif5_list) in jifs.items()}
+    return researcher_rows, university_rows
+
+
+def main():
+    db = SessionLocal()
+    try:
+        expected_researchers, expected_universities = baseline_stats(db)
+        researchers = {row[0]: row for row in researcher_stats(db)}
+        universities = {row[0]: tuple(row[-2:]) for row in university_stats(db)}
+        sample = sorted(researchers)[::max(1, len(researchers) // PARTIAL_SAMPLE)]
+        partial = {row[0]: row for row in researcher_stats(db, sample)}
+    finally:
+        db.close()
+
+    failures = 0
+
+    def expect(label, actual, expected):
+        nonlocal failures
+        wrong = sorted(key for key in expected.keys() | actual.keys() if actual.get(key) != expected.get(key))
+        failures += bool(wrong)
+        print(f"{'PASS' if not wrong else 'FAIL'}: {label} ({len(expected)} rows)")
+        for key in wrong[:10]:
+            print(f"  {key!r}: expected {expected.get(key)!r}, got {actual.get(key)!r}")
+
+    expect("researcher stats match the original ranking page", researchers, expected_researchers)
+    expect("university averages match the original ranking page", universities,
+           {uni: expected_universities.get(uni, (0, 0)) for uni in universities})
+    expect("a partial refresh computes the same researcher stats", partial, {r_id: researchers[r_id] for r_id in sample})
+    print("All stats checks passed" if not failures else f"{failures} stats checks failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ import random
 from app.database import SessionLocal
 from app.models import Researchers, Publications, Journals
 from app.scrapers.helpers.util import standardize
+from app.helpers.stats_funcs import refresh_stats
 
 # Columns to fill with test data: 
     # Researchers: job_title (Research Fellow, Lecturer, Senior Lecturer, Associate Professor, Professor), level (A, B, C, D, E), field (Accounting, Finance)
@@ -37,6 +38,7 @@ def fill_test_columns():
         publications = db.query(Publications).all()
         for p in publications:
             p.num_authors = random.randint(1, 10)
+        refresh_stats(db)
         db.commit()
         print("Filled test columns with random values.")
     finally:
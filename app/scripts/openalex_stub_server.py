@@ -0,0 +1,186 @@
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from app.scrapers.helpers import http_cache, openalex, enrichment
+from app.scrapers.UNSW_Scraper import clean_name
+
+# Local stand-in for the OpenAlex API, with just the queries the scrapers make.
+# Run from the project root:
+#   python -m app.scripts.openalex_stub_server          # check the OpenAlex client against the stub
+#   python -m app.scripts.openalex_stub_server --serve  # just serve it on http://127.0.0.1:8998
+#                                                       # (point the scrapers at it with OPENALEX_URL)
+
+INSTITUTIONS = {"I1": "UNSW Sydney", "I2": "University of Melbourne"}
+# author ID -> (name, institution ID)
+AUTHORS = {f"A{n}": (f"Researcher {n}", "I1" if n % 2 else "I2") for n in range(1, 61)}
+AUTHORS["A1"] = ("Jane Doe", "I1")
+AUTHORS["A2"] = ("John Smith", "I2")
+# work ID -> (title, year, type, source, author IDs)
+WORKS = {
+    "W1": ("Earnings Management: A Survey", 2020, "article", "The Accounting Review", ["A1"]),
+    "W2": ("Dividends and Taxes", 2020, "article", "Journal of Finance", ["A1", "A2"]),
+    "W3": ("Dividends and Taxes", 2018, "article", "SSRN Electronic Journal", ["A2"]),
+    **{f"W{n}": (f"Paper {n}", 2015 + n % 8, "article", "Abacus", [f"A{n - 100}"]) for n in range(103, 161)},
+}
+REQUESTS = []  # paths the stub was asked for
+
+
+def _openalex_id(short):
+    return f"https://openalex.org/{short}"
+
+
+def _work(work_id):
+    title, year, type_val, source, authors = WORKS[work_id]
+    return {
+        "id": _openalex_id(work_id), "doi": f"https://doi.org/10.1/{work_id.lower()}", "display_name": title,
+        "publication_year": year, "publication_date": f"{year}-06-01", "type": type_val,
+        "primary_location": {"source": {"display_name": source}},
+        "authorships": [
+            {"author": {"id": _openalex_id(a)}, "institutions": [{"id": _openalex_id(AUTHORS[a][1])}]} for a in authors
+        ],
+    }
+
+
+def _filters(query):
+    """{"author.id": ["A1", "A2"], ...} from an OpenAlex filter parameter."""
+    filters = {}
+    for part in query.get("filter", [""])[0].split(","):
+        if ":" in part:
+            key, value = part.split(":", 1)
+            filters[key] = value.split("|")
+    return filters
+
+
+def _results(resource, query):
+    search = query.get("search", [""])[0].lower()
+    filters = _filters(query)
+    if resource == "institutions":
+        return [{"id": _openalex_id(i), "display_name": name} for i, name in INSTITUTIONS.items() if search in name.lower()]
+    if resource == "authors":
+        institution = filters.get("affiliations.institution.id", [None])[0]
+        return [
+            {"id": _openalex_id(a), "display_name": name} for a, (name, inst) in AUTHORS.items()
+            if search == name.lower() and institution in (None, inst)
+        ]
+    if resource == "works":
+        authors = set(filters.get("author.id", []))
+        return [_work(w) for w, work in WORKS.items() if authors & set(work[4]) and search in work[0].lower()]
+    return []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        REQUESTS.append(self.path)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+        if len(parts) == 2 and parts[0] == "works" and parts[1] in WORKS:
+            status, body = 200, _work(parts[1])
+        elif len(parts) == 1:
+            results = _results(parts[0], query)
+            per_page = int(query.get("per-page", ["25"])[0])
+            start = int(query.get("cursor", ["*"])[0].replace("*", "0"))
+            next_start = start + per_page
+            body = {
+                "meta": {"count": len(results), "page": None, "per_page": per_page,
+                         "next_cursor": str(next_start) if next_start < len(results) else None},
+                "results": results[start:next_start],
+            }
+            status = 200
+        else:
+            status, body = 404, {"error": "not found", "message": self.path}
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def check():
+    from app.scrapers import UM_Scraper  # imported here, after OPENALEX_URL is set
+    failures = 0
+
+    def expect(label, actual, expected):
+        nonlocal failures
+        ok = actual == expected
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}: {label}" + ("" if ok else f"\n  expected {expected!r}\n  got      {actual!r}"))
+
+    def requests_for(call):
+        REQUESTS.clear()
+        result = call()
+        return result, list(REQUESTS)
+
+    expect("institution ID", openalex.institution_id("UNSW Sydney"), "I1")
+    expect("institution ID is looked up once", requests_for(lambda: openalex.institution_id("UNSW Sydney"))[1], [])
+    expect("author ID within an institution", openalex.author_id("John Smith", "I2"), "A2")
+    expect("author ID at another institution", openalex.author_id("John Smith", "I1"), None)
+
+    authors = [f"A{n}" for n in range(3, 61)]
+    works, requests = requests_for(lambda: openalex.works_by_authors(authors))
+    expect("works of 58 authors take two queries", len(requests), 2)
+    expect("works are shared out by author", [w["id"] for w in works["A7"]], [_openalex_id("W107")])
+    expect("works are fetched once per author", requests_for(lambda: openalex.works_by_authors(authors[:5]))[1], [])
+
+    jane = openalex.works_by_authors(["A1"])["A1"]
+    expect("title match ignores punctuation and case",
+           openalex.find_work(jane, "earnings management a survey", "2020")["id"], _openalex_id("W1"))
+    expect("title match respects the year", openalex.find_work(jane, "Earnings Management: A Survey", "2019"), None)
+    expect("title match respects the institution", openalex.find_work(jane, "Dividends and Taxes", None, "I2")["id"],
+           _openalex_id("W2"))
+
+    publications = {"Professor Jane Doe": [(1, "Earnings Management A Survey", 2020), (2, "Dividends and Taxes", None),
+                                           (3, "Not On OpenAlex", 2021), (6, "Earnings Management", 2020)],
+                    "Researcher 5": [(4, "Paper 105", 2016)],
+                    "Dr Unknown Person": [(5, "Dividends and Taxes", 2020)]}
+    urls, requests = requests_for(lambda: enrichment.match_publication_urls(publications, "UNSW Sydney", clean_name))
+    expect("UNSW links come from the researchers' works, or a search if none of them match", urls,
+           {1: _openalex_id("W1"), 2: _openalex_id("W2"), 3: "", 4: _openalex_id("W105"), 5: "", 6: _openalex_id("W1")})
+    expect("UNSW searches only for publications their researchers' works don't match",
+           sorted(path.split("?")[0] for path in requests), ["/authors", "/authors", "/authors", "/works", "/works", "/works"])
+
+    bucket = openalex.TokenBucket(20, capacity=2)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    expect("token bucket holds requests to its rate after the burst", round(time.monotonic() - start, 1), 0.2)
+
+    academics = [{"name": "John Smith", "url": "u", "role": "Lecturer", "field": "Finance", "scraped": False},
+                 {"name": "Nobody", "url": "v", "role": "", "field": "Finance", "scraped": False}]
+    rows, requests = requests_for(lambda: UM_Scraper.get_works_openalex(academics))
+    expect("UM keeps one row per title, preferring a non-SSRN source", sorted((r[0], r[1], r[3]) for r in rows),
+           [("Dividends and Taxes", "2020", "Journal of Finance")])
+    expect("UM reuses the paginated works instead of fetching each one",
+           [path.split("?")[0] for path in requests], ["/institutions", "/authors", "/works"])
+    return failures
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        server, base = start_server(8998)
+        print(f"Serving the OpenAlex stub on {base} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        server, base = start_server()
+        openalex.OPENALEX_URL = base
+        http_cache.CACHE_MODE = "off"  # every lookup has to reach the stub for the request counts
+        try:
+            failures = check()
+        finally:
+            server.shutdown()
+        print("All OpenAlex stub checks passed" if not failures else f"{failures} OpenAlex stub checks failed")
+        sys.exit(1 if failures else 0)
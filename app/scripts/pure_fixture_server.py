@@ -0,0 +1,222 @@
+import os
+import sys
+import tempfile
+import threading
+import urllib.request
+from bs4 import BeautifulSoup
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from app.scrapers.helpers import big3_functions, http_cache
+from app.scrapers.helpers.pure_http import NeedsBrowser, find_profile_urls_http, scrape_publications_http
+
+# Local stand-in for a Pure research portal, with the markup the HTTP backend parses.
+# Run from the project root:
+#   python -m app.scripts.pure_fixture_server          # check the HTTP backend against the fixtures
+#   python -m app.scripts.pure_fixture_server --serve  # just serve them on http://127.0.0.1:8999
+
+PERSONS = {
+    "jane-doe": ("Professor", [
+        [("An Article", "2021", "Contribution to journal › Article", "Journal of Finance"),
+         ("A Chapter", "2019", "Chapter in Book/Report/Conference proceeding › Chapter", "")],
+        [("Older Article", "2015", "Contribution to journal › Article", "The Accounting Review")],
+    ]),
+    "john-smith": ("Senior Lecturer", [[("Only Paper", "2023", "Contribution to journal › Article", "Abacus")]]),
+    "bob-lee": ("", []),
+}
+LISTING_PAGES = [["jane-doe", "john-smith"], ["bob-lee"]]
+REQUESTS = []  # paths the server was asked for, to tell cache hits from fetches
+
+
+def _page(body):
+    return f"<html><head><title>Fixture</title></head><body>{body}</body></html>"
+
+
+def _person_header(slug):
+    job_title = PERSONS[slug][0]
+    title = f'<span class="job-title">{job_title}</span>' if job_title else ""
+    return f'<div class="header person-details"><h1>{slug}</h1>{title}</div>'
+
+
+def _publication(title, date, type_val, journal):
+    journal_html = f'<span class="journal"><a href="/en/journals/x"><span>{journal}.</span></a></span>' if journal else ""
+    return (
+        '<div class="rendering_researchoutput_portal-short">'
+        f'<h3 class="title"><a href="/en/publications/{title.lower().replace(" ", "-")}"><span>{title}</span></a></h3>'
+        f'<span class="date">1 Jan {date}</span>'
+        f'<span class="type_classification_parent">{type_val.split(" › ")[0]} ›</span>'
+        f'{journal_html}</div>'
+    )
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        REQUESTS.append(self.path)
+        url = urlparse(self.path)
+        page = int(parse_qs(url.query).get("page", ["0"])[0])
+        parts = [p for p in url.path.split("/") if p]
+        status, body = 404, "not found"
+        if parts[:2] == ["en", "organisations"] and parts[2] == "js-only":
+            status, body = 200, _page('<div id="app"></div><script>/* persons rendered client-side */</script>')
+        elif parts[:2] == ["en", "organisations"]:
+            slugs = LISTING_PAGES[page] if page < len(LISTING_PAGES) else []
+            header = f'<div class="header organisation-details"><h1>{parts[2]}</h1></div>'
+            status, body = 200, _page(header + "".join(f'<a href="/en/persons/{slug}">{slug}</a>' for slug in slugs))
+        elif parts[:2] == ["en", "persons"] and parts[2] == "blocked":
+            status, body = 403, "Just a moment..."
+        elif parts[:2] == ["en", "persons"] and parts[2] in PERSONS:
+            slug = parts[2]
+            if len(parts) == 3:
+                status, body = 200, _page(_person_header(slug))
+            elif parts[3] == "publications":
+                pages = PERSONS[slug][1]
+                pubs = pages[page] if page < len(pages) else []
+                status, body = 200, _page(_person_header(slug) + "".join(_publication(*p) for p in pubs))
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class UnusedDriver:
+    """Fails the check if the browser fallback is used when plain HTTP should have sufficed."""
+
+    def __getattr__(self, name):
+        raise AssertionError("browser used for a page that plain HTTP can scrape")
+
+
+class FixtureDriver:
+    """Just enough of a browser for the Pure browser path: pages whose URL contains stall never finish rendering."""
+
+    def __init__(self, stall=None):
+        self.stall = stall
+        self.url = None
+        self.page_source = ""
+
+    def get(self, url):
+        self.url = url
+        if self.stall and self.stall in url:
+            self.page_source = "<html><body></body></html>"
+            return
+        with urllib.request.urlopen(url) as response:
+            self.page_source = response.read().decode("utf-8")
+
+    def find_elements(self, by, selector):
+        return BeautifulSoup(self.page_source, "lxml").select(selector)
+
+
+def check(base):
+    failures = 0
+
+    def expect(label, actual, expected):
+        nonlocal failures
+        ok = actual == expected
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}: {label}" + ("" if ok else f"\n  expected {expected!r}\n  got      {actual!r}"))
+
+    expect("listing pages are followed until an empty page",
+           find_profile_urls_http(f"{base}/en/organisations/acc/persons/", base),
+           [f"{base}/en/persons/{slug}" for page in LISTING_PAGES for slug in page])
+
+    name, job_title, pubs, fingerprint = scrape_publications_http(f"{base}/en/persons/jane-doe")
+    expect("name comes from the profile URL", name, "Jane Doe")
+    expect("job title", job_title, "Professor")
+    expect("publications across pages", pubs, [
+        ["An Article", "2021", "Contribution to journal", "Journal of Finance", f"{base}/en/publications/an-article"],
+        ["A Chapter", "2019", "Chapter in Book/Report/Conference proceeding", "", f"{base}/en/publications/a-chapter"],
+        ["Older Article", "2015", "Contribution to journal", "The Accounting Review", f"{base}/en/publications/older-article"],
+    ])
+    expect("unchanged profile skips its publication pages",
+           scrape_publications_http(f"{base}/en/persons/jane-doe", fingerprint)[2], None)
+    expect("a different field changes the fingerprint",
+           scrape_publications_http(f"{base}/en/persons/jane-doe", fingerprint, details=("Finance",))[2] is None, False)
+    expect("researcher without publications", scrape_publications_http(f"{base}/en/persons/bob-lee")[:3], ("Bob Lee", "", []))
+    expect("big3 scrape_publications stays on HTTP",
+           big3_functions.scrape_publications(f"{base}/en/persons/john-smith", UnusedDriver())[2][0][0], "Only Paper")
+
+    for label, call in [
+        ("JS-rendered listing needs the browser", lambda: find_profile_urls_http(f"{base}/en/organisations/js-only/persons/", base)),
+        ("blocked profile needs the browser", lambda: scrape_publications_http(f"{base}/en/persons/blocked")),
+    ]:
+        try:
+            call()
+            expect(label, "no NeedsBrowser", "NeedsBrowser")
+        except NeedsBrowser:
+            expect(label, "NeedsBrowser", "NeedsBrowser")
+
+    # HTTP response cache (check() runs with it pointed at an empty file)
+    john = f"{base}/en/persons/john-smith"
+    REQUESTS.clear()
+    scrape_publications_http(john)
+    expect("cached pages aren't fetched again", REQUESTS, [])
+    http_cache.CACHE_TTL = 0
+    scrape_publications_http(john)
+    expect("expired pages are fetched again", len(REQUESTS), 3)
+    http_cache.CACHE_TTL = 60
+    http_cache.store(f"{john}/publications/?page=1", http_cache.RENDERED, _page(_person_header("john-smith")))
+    for path in ["", "/publications/"]:
+        cached = http_cache.lookup(f"{john}{path}", http_cache.HTML)
+        http_cache.store(f"{john}{path}", http_cache.RENDERED, cached[2])
+    http_cache.CACHE_MODE = "offline"
+    try:
+        REQUESTS.clear()
+        expect("offline replay parses cached pages",
+               scrape_publications_http(f"{base}/en/persons/jane-doe")[2][2][0], "Older Article")
+        expect("cached page sources don't start the browser",
+               big3_functions._scrape_publications_browser(john, UnusedDriver())[2][0][0], "Only Paper")
+        try:
+            scrape_publications_http(f"{base}/en/persons/not-cached")
+            expect("offline, uncached pages aren't fetched", "fetched", "NeedsBrowser")
+        except NeedsBrowser:
+            expect("offline, uncached pages aren't fetched", REQUESTS, [])
+    finally:
+        http_cache.CACHE_MODE = "on"
+    big3_functions.WAIT_LOG.clear()
+    expect("the browser listing ends on the empty page past the last one",
+           big3_functions._find_profile_urls_browser(f"{base}/en/organisations/acc/persons/", base, FixtureDriver()),
+           [f"{base}/en/persons/{slug}" for page in LISTING_PAGES for slug in page])
+    expect("without waiting for it to time out", [outcome for _, _, _, outcome in big3_functions.WAIT_LOG],
+           ["content", "content", "empty"])
+    jane = f"{base}/en/persons/jane-doe"
+    http_fingerprint = scrape_publications_http(jane)[3]
+    big3_functions.WAIT_TIMEOUT = 0.5
+    stalled = big3_functions._scrape_publications_browser(jane, FixtureDriver(stall="page=1"))
+    expect("a page that times out leaves the scrape without a fingerprint", (len(stalled[2]), stalled[3]), (2, None))
+    expect("a browser scrape that loads every page is fingerprinted",
+           big3_functions._scrape_publications_browser(jane, FixtureDriver())[3], http_fingerprint)
+    timed_out = f"{base}/en/persons/timed-out"
+    html = http_cache.cached_render(timed_out, lambda: ("<html>still loading</html>", False))
+    expect("timed-out renders are returned but not cached", (html, http_cache.lookup(timed_out, http_cache.RENDERED)),
+           ("<html>still loading</html>", None))
+    http_cache.evict(0)
+    expect("eviction down to a size", http_cache.lookup(john, http_cache.HTML), None)
+    return failures
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        server, base = start_server(8999)
+        print(f"Serving Pure fixtures on {base} (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        server, base = start_server()
+        cache_dir = tempfile.TemporaryDirectory()
+        http_cache.CACHE_PATH = os.path.join(cache_dir.name, "http_cache.sqlite3")
+        http_cache.CACHE_MODE = "on"
+        try:
+            failures = check(base)
+        finally:
+            server.shutdown()
+        print("All fixture checks passed" if not failures else f"{failures} fixture checks failed")
+        sys.exit(1 if failures else 0)